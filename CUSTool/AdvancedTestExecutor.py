@@ -10,6 +10,9 @@ Key Features:
 - Real-time false negative detection
 - Test result analysis and reporting
 - Continuous monitoring and feedback
+- Parallel scheduling of independent tests, serialized by declared preconditions
+- Crash-safe JSON Lines execution log; reports are rendered from it on demand
+- Runs a selected subset of the suite (see TestImpactAnalyzer)
 
 Author: Generated for CUS Enhancement Project
 Date: July 7, 2025
@@ -22,15 +25,17 @@ import subprocess
 import re
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from enum import Enum
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
 
 from EnhancedTestCaseGenerator import (
     TestCase, TestCaseStatus, FalseNegativeDetection,
     EnhancedTestCaseGenerator
 )
+from FalseNegativeRules import FalseNegativeRule, get_rule_engine
 
 class TestExecutionResult(Enum):
     """Test execution results"""
@@ -57,46 +62,52 @@ class AdvancedTestExecutor:
     Advanced test executor with real-time false negative detection
     """
     
-    def __init__(self, test_case_generator: EnhancedTestCaseGenerator):
+    # Preconditions that put a shared component into a required state, e.g.
+    # "ExtP is in a state where configuration might be bypassed". Tests declaring
+    # state on the same component are serialized.
+    STATE_PRECONDITION = re.compile(
+        r"^\s*(?P<subject>.+?)\s+(?:is in|is set to|contains|shows|has been|must be in)\b",
+        re.IGNORECASE
+    )
+    TEST_ID_REFERENCE = re.compile(r"\bTC-[A-Z]+-[\w-]+\b")
+    
+    def __init__(self, test_case_generator: EnhancedTestCaseGenerator,
+                 max_workers: int = 4, session_settle_seconds: float = 2.0):
         self.generator = test_case_generator
         self.executions: Dict[str, TestExecution] = {}
-        self.execution_queue = queue.Queue()
+        self.execution_queue = queue.Queue()  # Completed executions, drained by the scheduler
         self.monitoring_active = False
         self.results_dir = "TestResults"
+        self.execution_log_path = os.path.join(self.results_dir, "execution_log.jsonl")
+        
+        # Parallel execution settings
+        self.max_workers = max_workers
+        self.session_settle_seconds = session_settle_seconds
+        # There is a single ExtP instance (one process, config and working
+        # directory), so tests that drive it run one at a time
+        self._extp_lock = threading.Lock()
         
         # Create results directory
         os.makedirs(self.results_dir, exist_ok=True)
         
-        # False negative detection patterns
-        self.false_negative_patterns = [
-            {
-                "id": "FN-001",
-                "pattern": r"Trading system is already configured",
-                "context": "configuration_menu",
-                "description": "ExtP bypasses configuration without showing interface",
-                "severity": "critical",
-                "auto_fix": True
-            },
-            {
-                "id": "FN-002", 
-                "pattern": r"Configuration completed.*without.*input",
-                "context": "user_interaction",
-                "description": "Configuration completes without user input",
-                "severity": "high",
-                "auto_fix": False
-            },
-            {
-                "id": "FN-003",
-                "pattern": r"Menu option.*selected.*no.*change",
-                "context": "interface_state",
-                "description": "Menu selection doesn't change interface state",
-                "severity": "medium",
-                "auto_fix": False
-            }
-        ]
+        # False negative detection rules (shared with remediation and test generation)
+        self.rule_engine = get_rule_engine()
+        self.false_negative_patterns = self.rule_engine.rules_for("output")
     
-    def execute_all_tests(self) -> Dict[str, TestExecution]:
-        """Execute all test cases with false negative detection"""
+    def execute_all_tests(self, max_workers: Optional[int] = None,
+                          test_ids: Optional[List[str]] = None) -> Dict[str, TestExecution]:
+        """
+        Execute all test cases with false negative detection.
+        
+        test_ids restricts the run to a subset of the suite, e.g. the tests
+        selected by TestImpactAnalyzer; None runs everything.
+        
+        Independent tests run concurrently on a worker pool. A test waits for any
+        test it references in its preconditions, and tests declaring state on the
+        same component are never run at the same time. Tests that need ExtP run
+        serially, since they share its process state. Each result is appended to the JSON Lines
+        execution log as it completes; the report is rendered from that log.
+        """
         print("🚀 Starting Advanced Test Execution with False Negative Detection")
         print("=" * 70)
         
@@ -106,21 +117,67 @@ class AdvancedTestExecutor:
             print("⚠️  No test cases found. Generating test suite first...")
             test_cases = self.generator.generate_comprehensive_test_suite()
         
-        print(f"📋 Found {len(test_cases)} test cases to execute")
-        
-        # Execute each test case
-        for test_id, test_case in test_cases.items():
-            print(f"\n🔄 Executing: {test_id}")
-            print(f"   Title: {test_case.title}")
-            
-            execution = self._execute_single_test(test_case)
-            self.executions[test_id] = execution
-            
-            # Analyze results for false negatives
-            self._analyze_execution_for_false_negatives(execution)
-            
-            # Brief pause between tests
-            time.sleep(2)
+        suite_size = len(test_cases)
+        if test_ids is not None:
+            test_cases = {test_id: test_cases[test_id] for test_id in test_ids if test_id in test_cases}
+            print(f"🎯 Running {len(test_cases)} of {suite_size} test cases")
+        
+        workers = max_workers or self.max_workers
+        print(f"📋 Found {len(test_cases)} test cases to execute ({workers} workers, "
+              f"ExtP tests serialized)")
+        
+        dependencies, state_locks = self._build_schedule(test_cases)
+        pending = dict(test_cases)
+        completed = set()
+        held_locks = set()
+        running = 0
+        suite_start = time.time()
+        test_durations = {}
+        
+        self._start_execution_log(list(test_cases), workers, suite_size)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                # Start every pending test whose dependencies are done and whose state is free
+                for test_id, test_case in list(pending.items()):
+                    if running >= workers:
+                        break
+                    if not dependencies[test_id] <= completed:
+                        continue
+                    if state_locks[test_id] & held_locks:
+                        continue
+                    held_locks |= state_locks[test_id]
+                    del pending[test_id]
+                    running += 1
+                    print(f"\n🔄 Executing: {test_id}")
+                    print(f"   Title: {test_case.title}")
+                    pool.submit(self._run_scheduled_test, test_id, test_case)
+                
+                if not running:
+                    # Remaining tests can never become ready (cycle or missing dependency)
+                    for test_id in list(pending):
+                        dependencies[test_id] &= completed
+                    continue
+                
+                test_id, execution, duration = self.execution_queue.get()
+                running -= 1
+                completed.add(test_id)
+                held_locks -= state_locks[test_id]
+                test_durations[test_id] = duration
+                self.executions[test_id] = execution
+                self._stream_execution_result(test_id, execution)
+        
+        # Return executions in suite order (the log is in completion order)
+        self.executions = {test_id: self.executions[test_id] for test_id in test_cases if test_id in self.executions}
+        
+        wall_time = time.time() - suite_start
+        print(f"\n⏱️  Suite wall time: {wall_time:.1f}s (sum of test times: {sum(test_durations.values()):.1f}s)")
+        self._append_log_record({
+            "type": "suite_end",
+            "timestamp": datetime.now().isoformat(),
+            "wall_time": wall_time,
+            "test_time": sum(test_durations.values())
+        })
         
         # Generate execution report
         self._generate_execution_report()
@@ -130,7 +187,89 @@ class AdvancedTestExecutor:
         
         return self.executions
     
-    def _execute_single_test(self, test_case: TestCase) -> TestExecution:
+    def _build_schedule(self, test_cases: Dict[str, TestCase]):
+        """
+        Derive ordering and exclusion from declared preconditions: referenced
+        test IDs become dependencies, state preconditions become exclusive locks
+        """
+        dependencies = {}
+        state_locks = {}
+        for test_id, test_case in test_cases.items():
+            depends_on = set()
+            locks = set()
+            for precondition in test_case.preconditions:
+                depends_on.update(ref for ref in self.TEST_ID_REFERENCE.findall(precondition)
+                                  if ref in test_cases and ref != test_id)
+                match = self.STATE_PRECONDITION.match(precondition)
+                if match:
+                    locks.add(" ".join(match.group("subject").lower().split()))
+            dependencies[test_id] = depends_on
+            state_locks[test_id] = locks
+        return dependencies, state_locks
+    
+    def _needs_extp(self, test_case: TestCase) -> bool:
+        """Whether a test drives the target program, and so must not overlap other ExtP tests"""
+        return any("extp" in precondition.lower() for precondition in test_case.preconditions)
+    
+    def _run_scheduled_test(self, test_id: str, test_case: TestCase):
+        """Worker: run one test (holding the ExtP lock if it drives ExtP) and hand the result back"""
+        started = time.time()
+        uses_extp = self._needs_extp(test_case)
+        if uses_extp:
+            self._extp_lock.acquire()
+        try:
+            execution = self._execute_single_test(test_case, uses_extp)
+            
+            # Analyze results for false negatives
+            self._analyze_execution_for_false_negatives(execution)
+            
+            if uses_extp:
+                # Let ExtP settle before the next test drives it
+                time.sleep(self.session_settle_seconds)
+        except Exception as e:
+            execution = TestExecution(test_case_id=test_id, start_time=datetime.now().isoformat(),
+                                      end_time=datetime.now().isoformat(), result=TestExecutionResult.ERROR)
+            execution.logs.append(f"[{datetime.now().isoformat()}] Scheduler error: {str(e)}")
+        finally:
+            if uses_extp:
+                self._extp_lock.release()
+            self.execution_queue.put((test_id, execution, time.time() - started))
+    
+    def _append_log_record(self, record: Dict[str, Any]):
+        """Append one record to the execution log and force it to disk"""
+        with open(self.execution_log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _start_execution_log(self, test_ids: List[str], workers: int, suite_size: Optional[int] = None):
+        """Start a fresh execution log for this suite run, recording the suite order for the report"""
+        open(self.execution_log_path, "w", encoding="utf-8").close()
+        self._append_log_record({
+            "type": "suite_start",
+            "timestamp": datetime.now().isoformat(),
+            "total_tests": len(test_ids),
+            "suite_size": suite_size if suite_size is not None else len(test_ids),
+            "workers": workers,
+            "test_order": test_ids
+        })
+    
+    def _stream_execution_result(self, test_id: str, execution: TestExecution):
+        """Print one completed test and append it to the execution log"""
+        result = execution.result.value if execution.result else None
+        print(f"   ✔ {test_id}: {result or 'Unknown'} ({len(execution.false_negatives_detected)} false negatives)")
+        self._append_log_record({
+            "type": "execution",
+            "test_case_id": execution.test_case_id,
+            "start_time": execution.start_time,
+            "end_time": execution.end_time,
+            "result": result,
+            "logs": execution.logs,
+            "false_negatives": [asdict(fn) for fn in execution.false_negatives_detected],
+            "execution_context": execution.execution_context
+        })
+    
+    def _execute_single_test(self, test_case: TestCase, uses_extp: bool = False) -> TestExecution:
         """Execute a single test case"""
         execution = TestExecution(
             test_case_id=test_case.id,
@@ -140,6 +279,9 @@ class AdvancedTestExecutor:
         try:
             # Log test start
             execution.logs.append(f"[{datetime.now().isoformat()}] Starting test: {test_case.title}")
+            if uses_extp:
+                execution.execution_context["extp_exclusive"] = True
+                execution.logs.append("Running with exclusive access to ExtP")
             
             # Execute test based on test case type
             if test_case.id.startswith("TC-FN-"):
@@ -269,161 +411,244 @@ class AdvancedTestExecutor:
     def _detect_false_negatives_in_output(self, output: str) -> List[FalseNegativeDetection]:
         """Detect false negatives in output text"""
         false_negatives = []
+        output_lower = output.lower()
+        
+        # Report grouped by rule in rule-file order, then by position, as the per-pattern scans did
+        rule_order = {rule.id: index for index, rule in enumerate(self.rule_engine.rules)}
+        matches = sorted(self.rule_engine.scan(output, scope="output"),
+                         key=lambda match: (rule_order[match.rule.id], match.start))
         
-        for pattern_info in self.false_negative_patterns:
-            matches = re.findall(pattern_info["pattern"], output, re.IGNORECASE)
+        for match in matches:
+            rule = match.rule
             
-            for match in matches:
-                # Calculate confidence based on pattern complexity and context
-                confidence = self._calculate_confidence(pattern_info, match, output)
-                
-                fn_detection = FalseNegativeDetection(
-                    test_case_id="AUTO_DETECTED",
-                    trigger_pattern=pattern_info["pattern"],
-                    expected_response=f"Should show {pattern_info['context']} interface",
-                    actual_response=match,
-                    confidence_level=confidence,
-                    detection_method=f"pattern_matching_{pattern_info['id']}"
-                )
-                
-                false_negatives.append(fn_detection)
+            # Calculate confidence based on pattern complexity and context
+            confidence = self._calculate_confidence(rule, match.text, output_lower)
+            
+            fn_detection = FalseNegativeDetection(
+                test_case_id="AUTO_DETECTED",
+                trigger_pattern=rule.pattern,
+                expected_response=f"Should show {rule.context} interface",
+                actual_response=match.text,
+                confidence_level=confidence,
+                detection_method=f"pattern_matching_{rule.id}"
+            )
+            
+            false_negatives.append(fn_detection)
         
         return false_negatives
     
-    def _calculate_confidence(self, pattern_info: Dict, match: str, context: str) -> float:
+    def _calculate_confidence(self, rule: FalseNegativeRule, match: str, context: str) -> float:
         """Calculate confidence level for false negative detection"""
         base_confidence = 0.8
         
         # Adjust based on pattern specificity
-        if len(pattern_info["pattern"]) > 20:  # More specific patterns are more reliable
+        if len(rule.pattern) > 20:  # More specific patterns are more reliable
             base_confidence += 0.1
         
         # Adjust based on context
-        if pattern_info["context"] in context.lower():
+        if rule.context in context.lower():
             base_confidence += 0.05
         
         # Adjust based on severity
-        if pattern_info["severity"] == "critical":
+        if rule.severity == "critical":
             base_confidence += 0.05
         
         return min(base_confidence, 1.0)
     
     def _analyze_execution_for_false_negatives(self, execution: TestExecution):
         """Analyze execution logs for additional false negative patterns"""
-        full_log = "\n".join(execution.logs)
-        
-        # Look for additional false negative indicators
-        additional_patterns = [
-            r"completed.*without.*expected.*interface",
-            r"bypass.*configuration.*steps",
-            r"auto.*complete.*without.*validation"
-        ]
-        
-        for pattern in additional_patterns:
-            matches = re.findall(pattern, full_log, re.IGNORECASE)
-            for match in matches:
-                fn_detection = FalseNegativeDetection(
-                    test_case_id=execution.test_case_id,
-                    trigger_pattern=pattern,
-                    expected_response="Proper user interaction flow",
-                    actual_response=match,
-                    confidence_level=0.7,
-                    detection_method="log_analysis"
-                )
-                execution.false_negatives_detected.append(fn_detection)
+        # Stream the log lines through the log-scope rules instead of joining them
+        scanner = self.rule_engine.stream(scope="log")
+        matches = []
+        for line in execution.logs:
+            matches.extend(scanner.feed_line(line))
+        matches.extend(scanner.close())
+        
+        for match in matches:
+            fn_detection = FalseNegativeDetection(
+                test_case_id=execution.test_case_id,
+                trigger_pattern=match.rule.pattern,
+                expected_response=match.rule.expected_response,
+                actual_response=match.text,
+                confidence_level=match.rule.confidence,
+                detection_method=match.rule.method
+            )
+            execution.false_negatives_detected.append(fn_detection)
     
     def _generate_execution_report(self):
-        """Generate comprehensive execution report"""
-        report = []
-        report.append("# Test Execution Report")
-        report.append(f"Generated: {datetime.now().isoformat()}")
-        report.append("")
-        
-        # Summary statistics
-        total_tests = len(self.executions)
-        passed_tests = sum(1 for e in self.executions.values() if e.result == TestExecutionResult.SUCCESS)
-        failed_tests = sum(1 for e in self.executions.values() if e.result == TestExecutionResult.FAILURE)
-        false_negative_tests = sum(1 for e in self.executions.values() if e.result == TestExecutionResult.FALSE_NEGATIVE)
-        
-        report.append("## Executive Summary")
-        report.append(f"- Total Tests: {total_tests}")
-        report.append(f"- Passed: {passed_tests}")
-        report.append(f"- Failed: {failed_tests}")
-        report.append(f"- False Negatives Detected: {false_negative_tests}")
-        report.append(f"- Success Rate: {(passed_tests/total_tests)*100:.1f}%")
-        report.append("")
-        
-        # False negative analysis
-        all_false_negatives = []
-        for execution in self.executions.values():
-            all_false_negatives.extend(execution.false_negatives_detected)
-        
-        if all_false_negatives:
-            report.append("## False Negative Detection Results")
-            report.append(f"Total False Negatives Detected: {len(all_false_negatives)}")
-            report.append("")
+        """Generate comprehensive execution report from the execution log"""
+        render_execution_report(self.execution_log_path, self.results_dir)
+
+def iter_execution_log(log_path: str, record_type: Optional[str] = None):
+    """
+    Yield records from a JSON Lines execution log. A truncated last line from
+    an interrupted run is skipped.
+    """
+    if not os.path.exists(log_path):
+        return
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record_type is None or record.get("type") == record_type:
+                yield record
+
+def iter_executions_in_suite_order(log_path: str, test_order: List[str]):
+    """
+    Yield the execution records of a log in suite order rather than completion
+    order. Only the file offset of each record is kept; records are re-read one
+    at a time. Executions missing from test_order follow in log order.
+    """
+    if not os.path.exists(log_path):
+        return
+    offsets = {}
+    with open(log_path, "rb") as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if record.get("type") == "execution":
+                offsets[record["test_case_id"]] = offset
+        
+        ordered = [test_id for test_id in dict.fromkeys(test_order) if test_id in offsets]
+        ordered_ids = set(ordered)
+        ordered += [test_id for test_id in offsets if test_id not in ordered_ids]
+        for test_id in ordered:
+            f.seek(offsets[test_id])
+            yield json.loads(f.readline())
+
+def render_execution_report(log_path: str, results_dir: str) -> str:
+    """
+    Render execution_report.md and execution_results.json from an execution log.
+    Works on partial logs and streams over the log, so memory use does not grow
+    with the suite. Returns the markdown report path.
+    """
+    # Pass 1: summary statistics
+    total_tests = passed_tests = failed_tests = false_negative_tests = total_false_negatives = 0
+    suite_start = suite_end = None
+    for record in iter_execution_log(log_path):
+        if record["type"] == "suite_start":
+            suite_start = record
+        elif record["type"] == "suite_end":
+            suite_end = record
+        elif record["type"] == "execution":
+            total_tests += 1
+            passed_tests += record["result"] == TestExecutionResult.SUCCESS.value
+            failed_tests += record["result"] == TestExecutionResult.FAILURE.value
+            false_negative_tests += record["result"] == TestExecutionResult.FALSE_NEGATIVE.value
+            total_false_negatives += len(record["false_negatives"])
+    success_rate = (passed_tests/total_tests)*100 if total_tests > 0 else 0
+    # Tests are listed in suite order; logs from before test_order was recorded stay in completion order
+    test_order = suite_start.get("test_order", []) if suite_start else []
+    
+    report_path = os.path.join(results_dir, "execution_report.md")
+    with open(report_path, "w", encoding="utf-8") as report:
+        report.write("# Test Execution Report\n")
+        report.write(f"Generated: {datetime.now().isoformat()}\n")
+        if suite_end is None:
+            scheduled = suite_start["total_tests"] if suite_start else "unknown"
+            report.write(f"Status: PARTIAL RUN - {total_tests} of {scheduled} tests recorded\n")
+        else:
+            report.write(f"Wall Time: {suite_end['wall_time']:.1f}s (sum of test times: {suite_end['test_time']:.1f}s)\n")
+        if suite_start and suite_start.get("suite_size", suite_start["total_tests"]) > suite_start["total_tests"]:
+            report.write(f"Selection: {suite_start['total_tests']} of {suite_start['suite_size']} test cases "
+                         f"(test impact analysis)\n")
+        report.write("\n")
+        
+        report.write("## Executive Summary\n")
+        report.write(f"- Total Tests: {total_tests}\n")
+        report.write(f"- Passed: {passed_tests}\n")
+        report.write(f"- Failed: {failed_tests}\n")
+        report.write(f"- False Negatives Detected: {false_negative_tests}\n")
+        report.write(f"- Success Rate: {success_rate:.1f}%\n")
+        report.write("\n")
+        
+        # Pass 2: false negative analysis
+        if total_false_negatives:
+            report.write("## False Negative Detection Results\n")
+            report.write(f"Total False Negatives Detected: {total_false_negatives}\n\n")
             
-            for i, fn in enumerate(all_false_negatives, 1):
-                report.append(f"### False Negative #{i}")
-                report.append(f"- **Test Case**: {fn.test_case_id}")
-                report.append(f"- **Detection Method**: {fn.detection_method}")
-                report.append(f"- **Trigger Pattern**: `{fn.trigger_pattern}`")
-                report.append(f"- **Expected Response**: {fn.expected_response}")
-                report.append(f"- **Actual Response**: {fn.actual_response}")
-                report.append(f"- **Confidence Level**: {fn.confidence_level:.1%}")
-                report.append(f"- **Timestamp**: {fn.timestamp}")
-                report.append("")
-        
-        # Detailed test results
-        report.append("## Detailed Test Results")
-        for test_id, execution in self.executions.items():
-            report.append(f"### {test_id}")
-            report.append(f"- **Result**: {execution.result.value if execution.result else 'Unknown'}")
-            report.append(f"- **Duration**: {execution.start_time} to {execution.end_time}")
-            report.append(f"- **False Negatives**: {len(execution.false_negatives_detected)}")
-            report.append("")
+            i = 0
+            for record in iter_executions_in_suite_order(log_path, test_order):
+                for fn in record["false_negatives"]:
+                    i += 1
+                    report.write(f"### False Negative #{i}\n")
+                    report.write(f"- **Test Case**: {fn['test_case_id']}\n")
+                    report.write(f"- **Detection Method**: {fn['detection_method']}\n")
+                    report.write(f"- **Trigger Pattern**: `{fn['trigger_pattern']}`\n")
+                    report.write(f"- **Expected Response**: {fn['expected_response']}\n")
+                    report.write(f"- **Actual Response**: {fn['actual_response']}\n")
+                    report.write(f"- **Confidence Level**: {fn['confidence_level']:.1%}\n")
+                    report.write(f"- **Timestamp**: {fn['timestamp']}\n\n")
+        
+        # Pass 3: detailed test results
+        report.write("## Detailed Test Results\n")
+        for record in iter_executions_in_suite_order(log_path, test_order):
+            report.write(f"### {record['test_case_id']}\n")
+            report.write(f"- **Result**: {record['result'] or 'Unknown'}\n")
+            report.write(f"- **Duration**: {record['start_time']} to {record['end_time']}\n")
+            report.write(f"- **False Negatives**: {len(record['false_negatives'])}\n\n")
             
-            if execution.logs:
-                report.append("**Execution Log:**")
-                for log_entry in execution.logs[-5:]:  # Last 5 log entries
-                    report.append(f"  - {log_entry}")
-                report.append("")
-        
-        # Save report
-        report_path = os.path.join(self.results_dir, "execution_report.md")
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(report))
-        
-        # Save detailed results as JSON
-        results_data = {
-            "summary": {
-                "total_tests": total_tests,
-                "passed": passed_tests,
-                "failed": failed_tests,
-                "false_negatives": false_negative_tests,
-                "success_rate": (passed_tests/total_tests)*100 if total_tests > 0 else 0
-            },
-            "executions": {
-                test_id: {
-                    "test_case_id": execution.test_case_id,
-                    "start_time": execution.start_time,
-                    "end_time": execution.end_time,
-                    "result": execution.result.value if execution.result else None,
-                    "logs": execution.logs,
-                    "false_negatives_count": len(execution.false_negatives_detected),
-                    "execution_context": execution.execution_context
-                }
-                for test_id, execution in self.executions.items()
+            if record["logs"]:
+                report.write("**Execution Log:**\n")
+                for log_entry in record["logs"][-5:]:  # Last 5 log entries
+                    report.write(f"  - {log_entry}\n")
+                report.write("\n")
+    
+    # Save detailed results as JSON, one execution at a time
+    summary = {
+        "total_tests": total_tests,
+        "passed": passed_tests,
+        "failed": failed_tests,
+        "false_negatives": false_negative_tests,
+        "success_rate": success_rate,
+        "complete": suite_end is not None
+    }
+    results_json_path = os.path.join(results_dir, "execution_results.json")
+    with open(results_json_path, "w", encoding="utf-8") as f:
+        f.write('{\n  "summary": ' + json.dumps(summary, indent=2).replace("\n", "\n  ") + ',\n  "executions": {')
+        separator = "\n"
+        for record in iter_executions_in_suite_order(log_path, test_order):
+            entry = {
+                "test_case_id": record["test_case_id"],
+                "start_time": record["start_time"],
+                "end_time": record["end_time"],
+                "result": record["result"],
+                "logs": record["logs"],
+                "false_negatives_count": len(record["false_negatives"]),
+                "execution_context": record["execution_context"]
             }
-        }
-        
-        results_json_path = os.path.join(self.results_dir, "execution_results.json")
-        with open(results_json_path, "w", encoding="utf-8") as f:
-            json.dump(results_data, f, indent=2)
-
+            f.write(separator + "    " + json.dumps(record["test_case_id"]) + ": "
+                    + json.dumps(entry, indent=2).replace("\n", "\n    "))
+            separator = ",\n"
+        f.write("\n  }\n}\n")
+    
+    return report_path
 
 def main():
     """Main execution for standalone testing"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Advanced Test Executor with False Negative Detection")
+    parser.add_argument("--report-only", action="store_true",
+                        help="Re-render the report from TestResults/execution_log.jsonl (e.g. after an interrupted run)")
+    args = parser.parse_args()
+    
+    if args.report_only:
+        report_path = render_execution_report(os.path.join("TestResults", "execution_log.jsonl"), "TestResults")
+        print(f"📄 Report rendered from execution log: {report_path}")
+        return
+    
     print("🚀 Advanced Test Executor with False Negative Detection")
     print("=" * 60)
     
@@ -20,12 +20,13 @@ Date: July 7, 2025
 import json
 import os
 import time
-import re
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 
+from FalseNegativeRules import get_rule_engine
+
 class RemediationStrategy(Enum):
     """Types of remediation strategies"""
     SIMULATION_DICTIONARY_UPDATE = "simulation_dictionary_update"
@@ -84,29 +85,17 @@ class AutomatedRemediationSystem:
         # Load simulation dictionary
         self._load_simulation_dictionary()
         
-        # Define known false negative patterns and their remediations
+        # Known false negative patterns and their remediations, from the shared rule file
+        self.rule_engine = get_rule_engine()
         self.false_negative_patterns = {
-            "trading_system_already_configured": FalseNegativeCase(
-                pattern=r"Trading system is already configured",
-                context="configuration_menu",
-                expected_behavior="Show configuration interface for user input",
-                actual_behavior="Bypass configuration with generic message",
-                severity="critical"
-            ),
-            "configuration_bypass": FalseNegativeCase(
-                pattern=r"Configuration completed.*without.*input",
-                context="user_interaction",
-                expected_behavior="Request user configuration input",
-                actual_behavior="Auto-complete configuration without user involvement",
-                severity="high"
-            ),
-            "interface_state_mismatch": FalseNegativeCase(
-                pattern=r"Menu option.*selected.*no.*change",
-                context="interface_state",
-                expected_behavior="Interface state changes after menu selection",
-                actual_behavior="Menu selection with no visible state change",
-                severity="medium"
+            rule.case_id: FalseNegativeCase(
+                pattern=rule.pattern,
+                context=rule.context,
+                expected_behavior=rule.expected_behavior,
+                actual_behavior=rule.actual_behavior,
+                severity=rule.severity
             )
+            for rule in self.rule_engine.rules_for("output") if rule.case_id
         }
     
     def _load_simulation_dictionary(self):
@@ -136,8 +125,14 @@ class AutomatedRemediationSystem:
         
         detected_actions = []
         
+        # One scan over the output, grouped by remediation case
+        matches_by_case: Dict[str, List[str]] = {}
+        for match in self.rule_engine.scan(test_output, scope="output"):
+            if match.rule.case_id in self.false_negative_patterns:
+                matches_by_case.setdefault(match.rule.case_id, []).append(match.text)
+        
         for case_id, fn_case in self.false_negative_patterns.items():
-            matches = re.findall(fn_case.pattern, test_output, re.IGNORECASE)
+            matches = matches_by_case.get(case_id, [])
             
             if matches:
                 print(f"🚨 False negative detected: {case_id}")
@@ -530,8 +530,12 @@ def perform_action(action):
     safe_print(f"✅ ACTION COMPLETED: '{action}' - Waiting for screen response...")
     time.sleep(1)  # Give time for the action to take effect
 
-def process_screen_content(simulation_dictionary, current_text, previous_text):
-    """Process screen content for triggers - ENHANCED with validation from EnhancedCUS.py"""
+def process_screen_content(simulation_dictionary, current_text, previous_text, frame=None, frame_path=None):
+    """Process screen content for triggers - ENHANCED with validation from EnhancedCUS.py
+
+    frame/frame_path are the screenshot current_text was read from; defect
+    prompts reuse them instead of grabbing the screen again.
+    """
     global last_action_time, last_action_type, action_repeat_count
     
     if not current_text:
@@ -568,7 +572,7 @@ def process_screen_content(simulation_dictionary, current_text, previous_text):
                 if action_repeat_count >= 3:  # 3 repetitions indicate failure
                     safe_print(f"🚨 ACTION FAILURE DETECTED: '{action}' repeated {action_repeat_count} times")
                     safe_print(f"🔥 GENERATING DEFECT PROMPT FOR ACTION FAILURE")
-                    generate_action_failure_prompt(trigger, action, text_to_process)
+                    generate_action_failure_prompt(trigger, action, text_to_process, frame, frame_path)
                     action_repeat_count = 0  # Reset counter
                     return
             else:
@@ -591,12 +595,14 @@ def process_screen_content(simulation_dictionary, current_text, previous_text):
             screenshot_after, screenshot_path_after = capture_screen()
             if screenshot_after:
                 screen_after_action = extract_text_from_image(screenshot_after)
+                if issue_prompt_generator:
+                    issue_prompt_generator.record_frame(screenshot_after, screen_after_action, screenshot_path_after)
                 if screen_after_action:
                     # Check if the action was effective
                     if trigger.lower() in screen_after_action.lower():
                         safe_print(f"⚠️  ACTION EFFECTIVENESS WARNING: Same trigger '{trigger}' still present after action")
                         safe_print(f"📸 CAPTURING SCREENSHOT FOR ANALYSIS: {screenshot_path_after}")
-                        generate_ineffective_action_prompt(trigger, action, screen_before_action, screen_after_action, screenshot_path_after)
+                        generate_ineffective_action_prompt(trigger, action, screen_before_action, screen_after_action, screenshot_path_after, screenshot_after)
                     else:
                         safe_print(f"✅ ACTION APPEARS EFFECTIVE: Trigger '{trigger}' no longer present")
                     # --- Requirements-driven screen progression validation ---
@@ -641,7 +647,9 @@ def process_screen_content(simulation_dictionary, current_text, previous_text):
                                 }
                                 prompt_obj = issue_prompt_generator.generate_issue_prompt(
                                     test_case_context=test_context,
-                                    error_context=error_context
+                                    error_context=error_context,
+                                    frame=screenshot_after,
+                                    frame_path=screenshot_path_after
                                 )
                                 saved_path = issue_prompt_generator.save_issue_prompt(prompt_obj)
                                 safe_print(f"💾 DEFECT PROMPT (REQUIREMENTS) SAVED: {prompt_obj.issue_id} at {saved_path}")
@@ -748,8 +756,11 @@ def process_screen_content(simulation_dictionary, current_text, previous_text):
             if not is_false_positive:
                 safe_print(f"🚨 ERROR DETECTED: '{error}' found in screen content")
                 
-                # Capture screenshot for error documentation
-                screenshot, screenshot_path = capture_screen()
+                # Use the frame the error was read from; capture only if unavailable
+                if frame is not None and frame_path:
+                    screenshot, screenshot_path = frame, frame_path
+                else:
+                    screenshot, screenshot_path = capture_screen()
                 if screenshot_path:
                     safe_print(f"📸 ERROR SCREENSHOT CAPTURED: {screenshot_path}")
                     
@@ -761,7 +772,7 @@ def process_screen_content(simulation_dictionary, current_text, previous_text):
                     log_error_event(error, text_to_process, error_id, screenshot_path)
                     
                     # Generate defect prompt for error
-                    generate_error_defect_prompt(error, text_to_process, error_id, screenshot_path)
+                    generate_error_defect_prompt(error, text_to_process, error_id, screenshot_path, screenshot)
                 else:
                     safe_print(f"❌ FAILED TO CAPTURE ERROR SCREENSHOT")
                 
@@ -828,6 +839,10 @@ def capture_and_process_screen(simulation_dictionary, previous_text=""):
     # Extract text from screenshot
     current_text = extract_text_from_image(screenshot)
     
+    # Keep the frame for before/after and sequence evidence in defect prompts
+    if issue_prompt_generator:
+        issue_prompt_generator.record_frame(screenshot, current_text, screenshot_path)
+    
     # If OCR failed, inform user but continue
     if not current_text and screenshot:
         safe_print("OCR text extraction failed - screenshots saved for manual review")
@@ -836,7 +851,7 @@ def capture_and_process_screen(simulation_dictionary, previous_text=""):
     
     # Process the extracted text
     if current_text:
-        process_screen_content(simulation_dictionary, current_text, previous_text)
+        process_screen_content(simulation_dictionary, current_text, previous_text, screenshot, screenshot_path)
     
     return current_text
 
@@ -856,6 +871,10 @@ def initialize_issue_prompt_generator(external_program_path=""):
                 "annotate_screenshots": True,
                 "capture_before_after": False,
                 "capture_sequence": False,
+                "sequence_length": 5,
+                "background_rendering": False,
+                "render_workers": 2,
+                "render_queue_size": 64,
                 "severity_mapping": {
                     "external_crash": IssueSeverity.CRITICAL,
                     "external_error": IssueSeverity.ERROR,
@@ -867,7 +886,12 @@ def initialize_issue_prompt_generator(external_program_path=""):
                     "save_original": True,
                     "save_annotated": True,
                     "annotation_color": "red",
-                    "annotation_width": 3
+                    "annotation_width": 3,
+                    "crop_region": SCREEN_REGION,
+                    "max_width": 1600,
+                    "image_format": "png",
+                    "palette_colors": 256,
+                    "vector_annotations": True
                 }
             }
             issue_prompt_generator = IssuePromptGenerator(issue_config)
@@ -878,7 +902,7 @@ def initialize_issue_prompt_generator(external_program_path=""):
     else:
         safe_print("IssuePromptGenerator not available")
 
-def generate_action_failure_prompt(trigger, action, screen_content):
+def generate_action_failure_prompt(trigger, action, screen_content, frame=None, frame_path=None):
     """Generate defect prompt for action failures"""
     if issue_prompt_generator:
         try:
@@ -918,7 +942,9 @@ def generate_action_failure_prompt(trigger, action, screen_content):
                     "action": action,
                     "repeat_count": action_repeat_count,
                     "screen_content": screen_content[:1000]
-                }
+                },
+                frame=frame,
+                frame_path=frame_path
             )
             
             saved_path = issue_prompt_generator.save_issue_prompt(prompt_obj)
@@ -927,7 +953,7 @@ def generate_action_failure_prompt(trigger, action, screen_content):
         except Exception as e:
             safe_print(f"❌ ERROR GENERATING ACTION FAILURE PROMPT: {e}")
 
-def generate_error_defect_prompt(error, screen_content, error_id, screenshot_path):
+def generate_error_defect_prompt(error, screen_content, error_id, screenshot_path, frame=None):
     """Generate defect prompt for detected errors"""
     if issue_prompt_generator:
         try:
@@ -966,7 +992,8 @@ def generate_error_defect_prompt(error, screen_content, error_id, screenshot_pat
                     "error_id": error_id,
                     "screen_content": screen_content[:1000],
                     "screenshot_path": screenshot_path
-                }
+                },
+                frame=frame
             )
             
             saved_path = issue_prompt_generator.save_issue_prompt(prompt_obj)
@@ -975,7 +1002,7 @@ def generate_error_defect_prompt(error, screen_content, error_id, screenshot_pat
         except Exception as e:
             safe_print(f"❌ ERROR GENERATING ERROR DEFECT PROMPT: {e}")
 
-def generate_ineffective_action_prompt(trigger, action, screen_before, screen_after, screenshot_path):
+def generate_ineffective_action_prompt(trigger, action, screen_before, screen_after, screenshot_path, frame=None):
     """Generate defect prompt when action appears ineffective"""
     if issue_prompt_generator:
         try:
@@ -1015,7 +1042,8 @@ def generate_ineffective_action_prompt(trigger, action, screen_before, screen_af
                     "screen_before": screen_before[:300],
                     "screen_after": screen_after[:300],
                     "screenshot_path": screenshot_path
-                }
+                },
+                frame=frame
             )
             
             saved_path = issue_prompt_generator.save_issue_prompt(prompt_obj)
@@ -1196,6 +1224,9 @@ def main():
         except KeyboardInterrupt:
             safe_print("Interrupted by user. Stopping CUS...")
         finally:
+            if issue_prompt_generator:
+                safe_print("💾 Flushing pending defect reports...")
+                issue_prompt_generator.close()
             if process and process != "dummy_process":
                 safe_print("Terminating external program...")
                 process.terminate()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+DefectStore - Indexed SQLite store for CUS defect reports
+
+Keeps one row per issue written by IssuePromptGenerator, next to the per-issue
+markdown in UserSimulator/DefectPrompts, so triage questions such as
+"how many OCR_Mismatch warnings in test run X" are a single indexed query
+instead of a scan over every metadata file.
+
+Features:
+- Indexed by test run, severity, failure type, fingerprint and time
+- Counts grouped by any indexed column
+- Run-to-run comparison of defect fingerprints (new / resolved / persisting)
+- Markdown export of a filtered issue set for LLM hand-off
+- Small query CLI (python DefectStore.py --help)
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+DEFAULT_DB_NAME = "defects.db"
+
+class DefectStore:
+    """
+    SQLite-backed store of defect issues, safe to share between render threads
+    """
+
+    # Columns that may be used for filtering and grouping (case-insensitive)
+    INDEXED_COLUMNS = ("test_run_id", "severity", "failure_type", "fingerprint", "test_case_name")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.db_connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.db_connection.row_factory = sqlite3.Row
+        self._init_database()
+
+    def _init_database(self):
+        """Create tables and indexes"""
+        cursor = self.db_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS issues (
+                issue_id TEXT PRIMARY KEY,
+                test_run_id TEXT NOT NULL COLLATE NOCASE,
+                fingerprint TEXT COLLATE NOCASE,
+                severity TEXT NOT NULL COLLATE NOCASE,
+                failure_type TEXT NOT NULL COLLATE NOCASE,
+                test_case_name TEXT COLLATE NOCASE,
+                test_sequence_id TEXT,
+                failure_step INTEGER,
+                error_message TEXT,
+                occurrence_count INTEGER NOT NULL DEFAULT 1,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                markdown_path TEXT,
+                metadata_json TEXT
+            )
+        ''')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_run ON issues(test_run_id, failure_type, severity)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_severity ON issues(severity)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_failure_type ON issues(failure_type)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_fingerprint ON issues(fingerprint)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_first_seen ON issues(first_seen)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_last_seen ON issues(last_seen)')
+
+        self.db_connection.commit()
+
+    def upsert_issue(self, metadata: Dict[str, Any], markdown_path: str = "") -> None:
+        """
+        Insert or update an issue from IssuePromptGenerator's JSON metadata
+        """
+        occurrences = metadata.get("occurrences") or {}
+        timestamp = metadata.get("timestamp", datetime.now().isoformat())
+        row = (
+            metadata["issue_id"],
+            metadata.get("test_run_id", ""),
+            metadata.get("fingerprint", ""),
+            metadata.get("severity", ""),
+            metadata.get("failure_type", ""),
+            metadata.get("test_case_name", ""),
+            metadata.get("test_sequence_id", ""),
+            metadata.get("failure_step"),
+            str((metadata.get("error_details") or {}).get("error_message", "")),
+            occurrences.get("count", 1),
+            occurrences.get("first_seen") or timestamp,
+            occurrences.get("last_seen") or timestamp,
+            markdown_path,
+            json.dumps(metadata, default=str)
+        )
+
+        with self._lock:
+            self.db_connection.execute('''
+                INSERT INTO issues (issue_id, test_run_id, fingerprint, severity, failure_type,
+                                    test_case_name, test_sequence_id, failure_step, error_message,
+                                    occurrence_count, first_seen, last_seen, markdown_path, metadata_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(issue_id) DO UPDATE SET
+                    occurrence_count = excluded.occurrence_count,
+                    last_seen = excluded.last_seen,
+                    markdown_path = excluded.markdown_path,
+                    metadata_json = excluded.metadata_json
+            ''', row)
+            self.db_connection.commit()
+
+    def _where(self, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """Build a WHERE clause from column filters plus since/until time bounds"""
+        clauses = []
+        params = []
+        for column in self.INDEXED_COLUMNS:
+            value = filters.get(column)
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if filters.get("since"):
+            clauses.append("last_seen >= ?")
+            params.append(filters["since"])
+        if filters.get("until"):
+            clauses.append("first_seen <= ?")
+            params.append(filters["until"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        """
+        Issues matching the filters (test_run_id, severity, failure_type,
+        fingerprint, test_case_name, since, until), most recent first
+        """
+        where, params = self._where(filters)
+        sql = ("SELECT issue_id, test_run_id, fingerprint, severity, failure_type, test_case_name, "
+               "test_sequence_id, failure_step, error_message, occurrence_count, first_seen, last_seen, "
+               f"markdown_path FROM issues{where} ORDER BY last_seen DESC")
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self.db_connection.execute(sql, params)]
+
+    def count_by(self, group_by: str, **filters) -> List[Dict[str, Any]]:
+        """Issue and occurrence totals grouped by one of INDEXED_COLUMNS"""
+        if group_by not in self.INDEXED_COLUMNS:
+            raise ValueError(f"Cannot group by '{group_by}', expected one of {', '.join(self.INDEXED_COLUMNS)}")
+        where, params = self._where(filters)
+        sql = (f"SELECT {group_by} AS value, COUNT(*) AS issues, SUM(occurrence_count) AS occurrences "
+               f"FROM issues{where} GROUP BY {group_by} ORDER BY issues DESC")
+        with self._lock:
+            return [dict(row) for row in self.db_connection.execute(sql, params)]
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        """Test runs with their issue counts and time span"""
+        sql = ("SELECT test_run_id, COUNT(*) AS issues, SUM(occurrence_count) AS occurrences, "
+               "MIN(first_seen) AS started, MAX(last_seen) AS ended "
+               "FROM issues GROUP BY test_run_id ORDER BY started DESC")
+        with self._lock:
+            return [dict(row) for row in self.db_connection.execute(sql)]
+
+    def compare_runs(self, baseline_run: str, current_run: str) -> Dict[str, List[str]]:
+        """
+        Compare defect fingerprints between two test runs.
+        Returns fingerprints that are new, resolved and persisting in current_run.
+        """
+        with self._lock:
+            baseline = {row[0] for row in self.db_connection.execute(
+                "SELECT DISTINCT fingerprint FROM issues WHERE test_run_id = ?", (baseline_run,))}
+            current = {row[0] for row in self.db_connection.execute(
+                "SELECT DISTINCT fingerprint FROM issues WHERE test_run_id = ?", (current_run,))}
+        return {
+            "new": sorted(current - baseline),
+            "resolved": sorted(baseline - current),
+            "persisting": sorted(current & baseline)
+        }
+
+    def export_markdown(self, issues: List[Dict[str, Any]], include_reports: bool = False) -> str:
+        """
+        Render a set of issues as one markdown document for LLM hand-off.
+        With include_reports the full per-issue markdown is appended when present.
+        """
+        content_parts = [
+            f"# CUS Defect Summary",
+            f"",
+            f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Issues: {len(issues)}",
+            f"",
+            f"| Issue | Severity | Failure Type | Occurrences | Last Seen | Test Case |",
+            f"|-------|----------|--------------|-------------|-----------|-----------|"
+        ]
+        for issue in issues:
+            content_parts.append(
+                f"| {issue['issue_id']} | {issue['severity']} | {issue['failure_type'].replace('_', ' ')} | "
+                f"{issue['occurrence_count']} | {issue['last_seen'][:19]} | {issue['test_case_name']} |"
+            )
+
+        for issue in issues:
+            content_parts.extend([
+                f"",
+                f"## {issue['issue_id']}",
+                f"- **Test Run ID**: {issue['test_run_id']}",
+                f"- **Fingerprint**: {issue['fingerprint']}",
+                f"- **First Seen**: {issue['first_seen'][:19]}",
+                f"- **Error**: {issue['error_message']}",
+                f"- **Report**: `{issue['markdown_path']}`"
+            ])
+            report_path = issue.get("markdown_path")
+            if include_reports and report_path and os.path.exists(report_path):
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    content_parts.extend([f"", f.read()])
+
+        return "\n".join(content_parts)
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.db_connection.close()
+
+def _print_rows(rows: List[Dict[str, Any]], columns: List[str]):
+    """Print rows as an aligned text table"""
+    if not rows:
+        print("No matching issues")
+        return
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the CUS defect store")
+    parser.add_argument("--db", default=os.path.join("UserSimulator", "DefectPrompts", DEFAULT_DB_NAME),
+                        help="Defect store database path")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--run", dest="test_run_id", help="Test run ID")
+    filters.add_argument("--severity", help="Critical, Error, Warning or Info")
+    filters.add_argument("--type", dest="failure_type", help="Failure type, e.g. OCR_Mismatch")
+    filters.add_argument("--fingerprint", help="Defect fingerprint")
+    filters.add_argument("--test-case", dest="test_case_name", help="Test case name")
+    filters.add_argument("--since", help="ISO time lower bound on last seen")
+    filters.add_argument("--until", help="ISO time upper bound on first seen")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("runs", help="List test runs")
+    query_parser = subparsers.add_parser("query", parents=[filters], help="List matching issues")
+    query_parser.add_argument("--limit", type=int, help="Maximum number of issues")
+    counts_parser = subparsers.add_parser("counts", parents=[filters], help="Count issues by a column")
+    counts_parser.add_argument("--by", default="failure_type", choices=DefectStore.INDEXED_COLUMNS)
+    compare_parser = subparsers.add_parser("compare", help="Compare fingerprints between two runs")
+    compare_parser.add_argument("baseline_run")
+    compare_parser.add_argument("current_run")
+    export_parser = subparsers.add_parser("export", parents=[filters], help="Export matching issues to markdown")
+    export_parser.add_argument("--limit", type=int, help="Maximum number of issues")
+    export_parser.add_argument("--full", action="store_true", help="Append each issue's full report")
+    export_parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Defect store not found: {args.db}")
+        sys.exit(1)
+
+    store = DefectStore(args.db)
+    try:
+        selected = {name: getattr(args, name, None) for name in DefectStore.INDEXED_COLUMNS + ("since", "until")}
+        if args.command == "runs":
+            _print_rows(store.list_runs(), ["test_run_id", "issues", "occurrences", "started", "ended"])
+        elif args.command == "query":
+            _print_rows(store.query(limit=args.limit, **selected),
+                        ["issue_id", "severity", "failure_type", "occurrence_count", "last_seen", "fingerprint"])
+        elif args.command == "counts":
+            _print_rows(store.count_by(args.by, **selected), ["value", "issues", "occurrences"])
+        elif args.command == "compare":
+            comparison = store.compare_runs(args.baseline_run, args.current_run)
+            for status, fingerprints in comparison.items():
+                print(f"{status.title()} ({len(fingerprints)}): {', '.join(fingerprints) or '-'}")
+        elif args.command == "export":
+            markdown = store.export_markdown(store.query(limit=args.limit, **selected), include_reports=args.full)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(markdown)
+                print(f"Exported to {args.output}")
+            else:
+                print(markdown)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
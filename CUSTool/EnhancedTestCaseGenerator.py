@@ -20,12 +20,13 @@ Date: July 7, 2025
 import json
 import os
 import time
-import re
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
 
+from FalseNegativeRules import get_rule_engine
+
 class TestAnchorType(Enum):
     """Multi-dimensional test anchoring types"""
     REQUIREMENT = "requirement"
@@ -358,40 +359,17 @@ class EnhancedTestCaseGenerator:
         """
         false_negatives = []
         
-        # Pattern-based false negative detection
-        fn_patterns = [
-            {
-                "pattern": r"Trading system is already configured",
-                "expected": "Configuration interface displayed",
-                "method": "pattern_matching",
-                "confidence": 0.95
-            },
-            {
-                "pattern": r"Configuration completed.*without user input",
-                "expected": "User configuration input captured",
-                "method": "behavioral_analysis", 
-                "confidence": 0.85
-            },
-            {
-                "pattern": r"Menu option selected.*no interface change",
-                "expected": "Interface state change after selection",
-                "method": "state_tracking",
-                "confidence": 0.90
-            }
-        ]
-        
-        for pattern_info in fn_patterns:
-            matches = re.findall(pattern_info["pattern"], test_execution_log, re.IGNORECASE)
-            for match in matches:
-                fn_detection = FalseNegativeDetection(
-                    test_case_id="AUTO_DETECTED",
-                    trigger_pattern=pattern_info["pattern"],
-                    expected_response=pattern_info["expected"],
-                    actual_response=match,
-                    confidence_level=pattern_info["confidence"],
-                    detection_method=pattern_info["method"]
-                )
-                false_negatives.append(fn_detection)
+        # Pattern-based false negative detection using the shared rule set
+        for match in get_rule_engine().scan(test_execution_log, scope="output"):
+            fn_detection = FalseNegativeDetection(
+                test_case_id="AUTO_DETECTED",
+                trigger_pattern=match.rule.pattern,
+                expected_response=match.rule.expected_response,
+                actual_response=match.text,
+                confidence_level=match.rule.confidence,
+                detection_method=match.rule.method
+            )
+            false_negatives.append(fn_detection)
         
         self.false_negatives.extend(false_negatives)
         return false_negatives
@@ -8,16 +8,30 @@ import sqlite3
 import hashlib
 import ast
 import re
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 from dataclasses import dataclass, asdict
 
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
 @dataclass
 class IndexedItem:
     """Represents an indexed item from ExtP"""
     id: str
-    type: str  # 'function', 'class', 'config', 'requirement', 'menu', 'prompt', 'state_var'
+    type: str  # 'module', 'function', 'class', 'config', 'requirement', 'menu', 'prompt', 'state_var'
     name: str
     source_file: str
     line_number: int
@@ -26,21 +40,98 @@ class IndexedItem:
     metadata: Dict[str, Any]
     hash: str
     last_modified: str
+    blob_hash: Optional[str] = None  # Compressed source text that the ranges below point into
+    content_range: Optional[Tuple[int, int]] = None  # Character offsets of content in the blob
+    context_range: Optional[Tuple[int, int]] = None  # Character offsets of context in the blob
+
+class _BlobBackedItem(IndexedItem):
+    """IndexedItem read from the database whose content/context are sliced
+    out of the file's compressed blob on first access"""
+    
+    def _resolve(self, attr: str, range_attr: str) -> str:
+        value = self.__dict__.get(attr)
+        if value is None and getattr(self, range_attr) is not None:
+            start, end = getattr(self, range_attr)
+            value = self._blob_loader(self.blob_hash)[start:end]
+            self.__dict__[attr] = value
+        return value
+    
+    content = property(lambda self: self._resolve('_content', 'content_range'),
+                       lambda self, value: self.__dict__.__setitem__('_content', value))
+    context = property(lambda self: self._resolve('_context', 'context_range'),
+                       lambda self, value: self.__dict__.__setitem__('_context', value))
+
+@dataclass
+class ParsedFile:
+    """Result of parsing one ExtP file, produced by (possibly parallel) parsing and applied by the writer"""
+    rel_path: str
+    items: List[IndexedItem]
+    references: List[tuple]
+    stats: Dict[str, int]
+    manifest_entry: Optional[tuple]
+    blob: Optional[Tuple[str, bytes, int]] = None  # (hash, compressed text, uncompressed size)
 
 class ExtPIndexer:
     """Comprehensive indexing system for ExtP analysis"""
     
-    def __init__(self, extP_path: str, cache_path: str = "extP_index.db"):
+    INDEXED_SUFFIXES = ('.py', '.json', '.md', '.txt')
+    # Structured requirement IDs such as APP-12 or DATA-3.1; bare section numbers are too common to count
+    REQUIREMENT_ID_PATTERN = re.compile(r'\b[A-Z]+-\d+(?:\.\d+)*\b')
+    SKIPPED_DIRS = {'.git', '__pycache__', '.venv', 'venv', 'node_modules', '.pytest_cache'}
+    PARALLEL_THRESHOLD = 16  # Below this many files a process pool costs more than it saves
+    WRITE_BATCH_SIZE = 5000  # Items written per transaction
+    FTS_WEIGHTS = "0.0, 10.0, 5.0, 1.0"  # bm25 weights: item_id, name, content, context
+    # Classification of print()/input() string literals found in the AST
+    MENU_TEXT = re.compile(r'menu|option|choice|select|\d+[.)]', re.IGNORECASE)
+    PROMPT_TEXT = re.compile(r'enter|input|type', re.IGNORECASE)
+    # Line scanner for files that do not parse; one alternation, group name = element type
+    UI_LINE_PATTERN = re.compile(
+        r'(?P<prompt_input>input\s*\(\s*["\'].*["\'])'
+        r'|(?P<menu>print\s*\(\s*["\'].*(?:menu|option|choice|select|\d+[.)]).*["\'])'
+        r'|(?P<prompt>print\s*\(\s*["\'].*(?:enter|input|type).*["\'])'
+        r'|(?-i:^\s*(?P<config_constant>[A-Z][A-Z0-9_]*)\s*=(?!=).*)'  # Constants, case-sensitive
+        r'|(?P<config>config\[.*?\]|\.config\.)',
+        re.IGNORECASE
+    )
+    UI_STATS_KEYS = {'menu': 'menus', 'prompt': 'prompts', 'config': 'configs'}
+    MAX_AMBIGUOUS_TARGETS = 5  # Unqualified call names matching more items than this are not linked
+    BLOB_CACHE_SIZE = 64  # Decompressed file blobs kept in memory for lazy content reads
+    ITEM_COLUMNS = ("i.id, i.type, i.name, i.source_file, i.line_number, i.content, "
+                    "i.context, i.metadata, i.hash, i.last_modified, i.blob_hash, "
+                    "i.content_start, i.content_end, i.context_start, i.context_end")
+    
+    def __init__(self, extP_path: str, cache_path: Optional[str] = "extP_index.db"):
+        """Create an indexer for extP_path.
+        
+        Passing cache_path=None creates a parse-only instance without a
+        database, as used by the worker processes of build_full_index.
+        """
         self.extP_path = Path(extP_path)
         self.cache_path = cache_path
         self.db_connection = None
-        self.initialize_database()
+        self.fts_enabled = False
+        self._pending_items: List[IndexedItem] = []
+        self._pending_references: List[tuple] = []
+        self._id_occurrences: Dict[str, int] = {}
+        self._pending_blob: Optional[Tuple[str, str]] = None
+        self._blob_cache: OrderedDict = OrderedDict()
+        self._adjacency = None  # Lazily loaded (outgoing, incoming) relationship maps
+        if cache_path is not None:
+            self.initialize_database()
     
     def initialize_database(self):
         """Initialize SQLite database for indexing"""
         self.db_connection = sqlite3.connect(self.cache_path)
         cursor = self.db_connection.cursor()
         
+        # WAL lets readers (CUS, prompt generators) query while the index is rebuilt
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA cache_size=-65536')  # 64 MB page cache
+        # INSERT OR REPLACE only fires the delete triggers that keep extP_fts in sync with this on
+        cursor.execute('PRAGMA recursive_triggers=ON')
+        
         # Create main index table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS extP_index (
@@ -58,7 +149,26 @@ class ExtPIndexer:
             )
         ''')
         
+        # Items point into content_blobs instead of storing copies of file text
+        cursor.execute("PRAGMA table_info(extP_index)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in [('blob_hash', 'TEXT'), ('content_start', 'INTEGER'),
+                                    ('content_end', 'INTEGER'), ('context_start', 'INTEGER'),
+                                    ('context_end', 'INTEGER')]:
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE extP_index ADD COLUMN {column} {column_type}')
+        
+        # Content-addressed, zlib-compressed file text shared by all items of a file
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS content_blobs (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL  -- uncompressed length in bytes
+            )
+        ''')
+        
         # Create indexes for fast searching
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_blob_hash ON extP_index(blob_hash)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_type ON extP_index(type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_name ON extP_index(name)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_source_file ON extP_index(source_file)')
@@ -70,12 +180,46 @@ class ExtPIndexer:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 from_item_id TEXT NOT NULL,
                 to_item_id TEXT NOT NULL,
-                relationship_type TEXT NOT NULL,  -- 'calls', 'imports', 'configures', 'validates'
+                relationship_type TEXT NOT NULL,  -- 'calls', 'imports', 'uses_config', 'handled_by'
                 metadata TEXT,
                 FOREIGN KEY (from_item_id) REFERENCES extP_index(id),
                 FOREIGN KEY (to_item_id) REFERENCES extP_index(id)
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rel_from ON relationships(from_item_id, relationship_type)')
+        # Older indexes could hold the same edge once per call site
+        cursor.execute('''
+            DELETE FROM relationships WHERE id NOT IN (
+                SELECT MIN(id) FROM relationships GROUP BY from_item_id, to_item_id, relationship_type
+            )
+        ''')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_rel_edge ON relationships(from_item_id, to_item_id, relationship_type)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rel_to ON relationships(to_item_id, relationship_type)')
+        
+        # Unresolved references collected while parsing; resolved into relationships
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS item_references (
+                source_file TEXT NOT NULL,
+                from_item_id TEXT NOT NULL,
+                relationship_type TEXT NOT NULL,
+                target_kind TEXT NOT NULL,  -- 'import', 'symbol', 'config', 'item'
+                target TEXT NOT NULL,
+                line_number INTEGER
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ref_source_file ON item_references(source_file)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ref_target ON item_references(target)')
+        
+        # Create per-file manifest used for cheap change detection
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS file_manifest (
+                path TEXT PRIMARY KEY,  -- relative to ExtP root
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         
         # Create change tracking table
         cursor.execute('''
@@ -89,14 +233,102 @@ class ExtPIndexer:
                 FOREIGN KEY (item_id) REFERENCES extP_index(id)
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_timestamp ON change_log(timestamp)')
+        
+        # Monotonic index version, bumped after every committed update so
+        # consumers can poll cheaply for a fresh index
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS index_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO index_state (key, value) VALUES ('version', 0)")
+        
+        self.db_connection.commit()
+        
+        self.fts_enabled = self._initialize_search_index()
+    
+    def _initialize_search_index(self) -> bool:
+        """Create the FTS5 table mirroring name/content/context of extP_index
+        
+        The table shares rowids with extP_index. Rows are added by the writer
+        (_store_items), which has the uncompressed text in hand, and removed by
+        a delete trigger. Returns False when this SQLite build has no FTS5, in
+        which case text queries fall back to LIKE scans.
+        """
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'extP_fts'")
+        exists = cursor.fetchone() is not None
         
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS extP_fts USING fts5(
+                    item_id UNINDEXED, name, content, context,
+                    prefix='2 3', tokenize='unicode61'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable, using LIKE queries: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS extP_fts_delete AFTER DELETE ON extP_index BEGIN
+                DELETE FROM extP_fts WHERE rowid = old.rowid;
+            END
+        ''')
+        # Item text now lives in content_blobs, so inserts are mirrored by the writer
+        cursor.execute('DROP TRIGGER IF EXISTS extP_fts_insert')
+        cursor.execute('DROP TRIGGER IF EXISTS extP_fts_update')
         self.db_connection.commit()
+        
+        if not exists:
+            # Existing index created before full-text search was added
+            self.rebuild_search_index()
+        
+        return True
     
-    def build_full_index(self) -> Dict[str, int]:
-        """Build complete index of ExtP system"""
+    def rebuild_search_index(self):
+        """Repopulate the full-text index from extP_index (e.g. after a VACUUM)"""
+        cursor = self.db_connection.cursor()
+        cursor.execute(f"SELECT {self.ITEM_COLUMNS} FROM extP_index i")
+        items = [self._row_to_item(row) for row in cursor.fetchall()]
+        with self.db_connection:
+            self.db_connection.execute("DELETE FROM extP_fts")
+            self._store_search_rows(items)
+    
+    def build_full_index(self, max_workers: Optional[int] = None) -> Dict[str, int]:
+        """Build complete index of ExtP system
+        
+        Files are collected in a single walk and parsed in a process pool;
+        the results are written here by a single writer in batched
+        transactions. max_workers=1 forces serial parsing.
+        """
         print(f"Building comprehensive index of {self.extP_path}")
         
-        stats = {
+        stats = self._empty_stats()
+        files = list(self._iter_indexable_files())
+        workers = max_workers or os.cpu_count() or 1
+        
+        if workers > 1 and len(files) >= self.PARALLEL_THRESHOLD:
+            chunksize = max(1, len(files) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker,
+                                     initargs=(str(self.extP_path),)) as pool:
+                self._write_parse_results(pool.map(_parse_file_in_worker, files, chunksize=chunksize), stats)
+        else:
+            self._write_parse_results((self._parse_file(f) for f in files), stats)
+        
+        # Build relationships
+        self._build_relationships()
+        self._bump_index_version()
+        
+        print(f"Indexing complete: {stats}")
+        return stats
+    
+    def _empty_stats(self) -> Dict[str, int]:
+        """Return a zeroed per-item statistics dictionary"""
+        return {
+            'modules': 0,
             'functions': 0,
             'classes': 0,
             'configs': 0,
@@ -106,90 +338,270 @@ class ExtPIndexer:
             'state_vars': 0,
             'files_processed': 0
         }
+    
+    def _iter_indexable_files(self) -> Iterator[Path]:
+        """Walk the ExtP tree once, yielding every file with an indexed suffix"""
+        for root, dirs, files in os.walk(self.extP_path):
+            dirs[:] = [d for d in dirs if d not in self.SKIPPED_DIRS]
+            for name in files:
+                if os.path.splitext(name)[1] in self.INDEXED_SUFFIXES:
+                    yield Path(root, name)
+    
+    def _parse_file(self, file_path: Path) -> ParsedFile:
+        """Parse a single file into indexed items without touching the database"""
+        stats = self._empty_stats()
+        self._pending_items = []
+        self._pending_references = []
+        self._pending_blob = None
+        self._id_occurrences = {}
         
-        # Index source code files
-        for py_file in self.extP_path.rglob("*.py"):
-            self._index_python_file(py_file, stats)
+        if file_path.suffix == '.py':
+            self._index_python_file(file_path, stats)
+        elif file_path.suffix == '.json':
+            self._index_config_file(file_path, stats)
+        elif file_path.suffix == '.md':
+            self._index_documentation_file(file_path, stats)
+        elif file_path.suffix == '.txt':
+            self._index_text_file(file_path, stats)
         
-        # Index configuration files
-        for config_file in self.extP_path.rglob("*.json"):
-            self._index_config_file(config_file, stats)
+        items, self._pending_items = self._pending_items, []
+        references, self._pending_references = self._pending_references, []
         
-        # Index documentation
-        for doc_file in self.extP_path.rglob("*.md"):
-            self._index_documentation_file(doc_file, stats)
+        blob = None
+        if self._pending_blob and any(item.blob_hash for item in items):
+            blob_hash, text = self._pending_blob
+            raw = text.encode('utf-8')
+            blob = (blob_hash, zlib.compress(raw, 6), len(raw))
+        self._pending_blob = None
         
-        # Index other relevant files
-        for txt_file in self.extP_path.rglob("*.txt"):
-            self._index_text_file(txt_file, stats)
+        return ParsedFile(
+            rel_path=str(file_path.relative_to(self.extP_path)),
+            items=items,
+            references=references,
+            stats=stats,
+            manifest_entry=self._manifest_entry(file_path),
+            blob=blob
+        )
+    
+    def _write_parse_results(self, results, stats: Dict[str, int]) -> set:
+        """Replace each parsed file's rows in the database, batching files per transaction
         
-        # Build relationships
-        self._build_relationships()
+        Returns the names of all items removed or written, for _update_relationships.
+        """
+        touched_names = set()
+        pending = 0
+        cursor = self.db_connection.cursor()
         
-        print(f"Indexing complete: {stats}")
-        return stats
+        try:
+            for parsed in results:
+                if parsed.blob:
+                    self.db_connection.execute(
+                        "INSERT OR IGNORE INTO content_blobs (hash, data, size) VALUES (?, ?, ?)", parsed.blob
+                    )
+                touched_names |= self._replace_file(cursor, parsed.rel_path, parsed.items, parsed.references)
+                if parsed.manifest_entry:
+                    self._store_manifest_entries([parsed.manifest_entry])
+                for key, value in parsed.stats.items():
+                    stats[key] = stats.get(key, 0) + value
+                
+                pending += len(parsed.items) + 1
+                if pending >= self.WRITE_BATCH_SIZE:
+                    self.db_connection.commit()
+                    pending = 0
+        finally:
+            self.db_connection.commit()
+        
+        return touched_names
+    
+    def _replace_file(self, cursor, rel_path: str, items: List[IndexedItem],
+                      references: List[tuple]) -> set:
+        """Replace a file's items and references, cascading to relationships and logging changes"""
+        cursor.execute("SELECT id, name, hash FROM extP_index WHERE source_file = ?", (rel_path,))
+        old_items = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        new_items = {item.id: item for item in items}
+        
+        changes = []
+        for item_id, item in new_items.items():
+            if item_id not in old_items:
+                changes.append((item_id, 'added', None, item.hash))
+            elif old_items[item_id][1] != item.hash:
+                changes.append((item_id, 'modified', old_items[item_id][1], item.hash))
+        for item_id, (_, old_hash) in old_items.items():
+            if item_id not in new_items:
+                changes.append((item_id, 'deleted', old_hash, None))
+        
+        old_blobs = self._delete_file_rows(cursor, rel_path, list(old_items))
+        self._store_items(items)
+        self.db_connection.executemany("""
+            INSERT INTO item_references
+            (source_file, from_item_id, relationship_type, target_kind, target, line_number)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, references)
+        # Sweep only after the new rows exist, so an unchanged file keeps its own blob
+        self._delete_orphaned_blobs(cursor, old_blobs)
+        self._log_changes(changes)
+        
+        return {name for name, _ in old_items.values()} | {item.name for item in items}
+    
+    def _remove_file(self, cursor, rel_path: str) -> set:
+        """Remove a deleted file from the index, cascading to relationships and logging changes"""
+        cursor.execute("SELECT id, name, hash FROM extP_index WHERE source_file = ?", (rel_path,))
+        old_items = cursor.fetchall()
+        
+        old_blobs = self._delete_file_rows(cursor, rel_path, [row[0] for row in old_items])
+        self._delete_orphaned_blobs(cursor, old_blobs)
+        cursor.execute("DELETE FROM file_manifest WHERE path = ?", (rel_path,))
+        self._log_changes([(item_id, 'deleted', old_hash, None) for item_id, _, old_hash in old_items])
+        
+        return {name for _, name, _ in old_items}
+    
+    def _delete_file_rows(self, cursor, rel_path: str, item_ids: List[str]) -> List[str]:
+        """Delete a file's items, references and every relationship touching its items
+        
+        Returns the blob hashes the deleted items pointed at; the caller passes them to
+        _delete_orphaned_blobs once any replacement rows have been written.
+        """
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"DELETE FROM relationships WHERE from_item_id IN ({placeholders})", chunk)
+            cursor.execute(f"DELETE FROM relationships WHERE to_item_id IN ({placeholders})", chunk)
+        cursor.execute("SELECT DISTINCT blob_hash FROM extP_index WHERE source_file = ? AND blob_hash IS NOT NULL",
+                       (rel_path,))
+        old_blobs = [row[0] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM extP_index WHERE source_file = ?", (rel_path,))
+        cursor.execute("DELETE FROM item_references WHERE source_file = ?", (rel_path,))
+        if item_ids:
+            self._adjacency = None
+        return old_blobs
+    
+    def _delete_orphaned_blobs(self, cursor, blob_hashes: List[str]):
+        """Drop the given blobs unless an indexed item still points at them
+        
+        Blobs are shared by identical files, so a hash is only removed once nothing references it.
+        """
+        cursor.executemany("""
+            DELETE FROM content_blobs WHERE hash = ?
+            AND NOT EXISTS (SELECT 1 FROM extP_index WHERE blob_hash = ?)
+        """, [(blob_hash, blob_hash) for blob_hash in blob_hashes])
+    
+    def _log_changes(self, changes: List[tuple]):
+        """Append (item_id, change_type, old_hash, new_hash) rows to the change log"""
+        self.db_connection.executemany("""
+            INSERT INTO change_log (item_id, change_type, old_hash, new_hash)
+            VALUES (?, ?, ?, ?)
+        """, changes)
+    
+    def get_changes(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return change log entries, optionally only those after a 'YYYY-MM-DD HH:MM:SS' timestamp"""
+        cursor = self.db_connection.cursor()
+        query = "SELECT item_id, change_type, old_hash, new_hash, timestamp FROM change_log"
+        params = []
+        if since:
+            query += " WHERE timestamp > ?"
+            params.append(since)
+        cursor.execute(query + " ORDER BY id", params)
+        return [
+            {'item_id': row[0], 'change_type': row[1], 'old_hash': row[2],
+             'new_hash': row[3], 'timestamp': row[4]}
+            for row in cursor.fetchall()
+        ]
+    
+    def _index_file(self, file_path: Path, stats: Dict[str, int]) -> set:
+        """Index a single file according to its type and record it in the manifest"""
+        return self._write_parse_results([self._parse_file(file_path)], stats)
     
     def _index_python_file(self, file_path: Path, stats: Dict[str, int]):
-        """Index a Python source file"""
+        """Index a Python source file in a single AST pass over a shared line table"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Parse AST for structural analysis
-            tree = ast.parse(content, filename=str(file_path))
+            lines = content.split('\n')
+            last_modified = datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+            blob_hash = self._register_blob(content)
             
-            # Index functions
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    self._index_function(node, file_path, content, stats)
-                elif isinstance(node, ast.ClassDef):
-                    self._index_class(node, file_path, content, stats)
-                elif isinstance(node, ast.Assign):
-                    self._index_variable_assignment(node, file_path, content, stats)
+            # Parse AST for structural analysis
+            try:
+                tree = ast.parse(content, filename=str(file_path))
+            except SyntaxError as e:
+                print(f"Syntax error in {file_path}, indexing UI elements by pattern only: {e}")
+                self._scan_ui_lines(lines, file_path, blob_hash, last_modified, stats)
+                stats['files_processed'] += 1
+                return
             
-            # Index UI prompts and menus
-            self._index_ui_elements(content, file_path, stats)
+            module_item = self._index_module(tree, file_path, content, last_modified, stats)
+            _PythonFileVisitor(self, file_path, lines, blob_hash, last_modified, module_item, stats).visit(tree)
             
             stats['files_processed'] += 1
             
         except Exception as e:
             print(f"Error indexing {file_path}: {e}")
     
-    def _index_function(self, node: ast.FunctionDef, file_path: Path, content: str, stats: Dict[str, int]):
+    def _index_module(self, tree: ast.Module, file_path: Path, content: str,
+                      last_modified: str, stats: Dict[str, int]) -> IndexedItem:
+        """Index a Python module; its imports and module-level references hang off this item"""
+        module_name = self._module_name(file_path)
+        docstring = ast.get_docstring(tree) or ''
+        
+        item = IndexedItem(
+            id=self._generate_id('module', file_path, module_name),
+            type='module',
+            name=module_name,
+            source_file=str(file_path.relative_to(self.extP_path)),
+            line_number=0,
+            content=docstring,
+            context=docstring,
+            metadata={'file_type': 'python'},
+            hash=self._calculate_hash(content),
+            last_modified=last_modified
+        )
+        
+        self._store_item(item)
+        stats['modules'] += 1
+        return item
+    
+    def _index_function(self, node: ast.FunctionDef, source: '_PythonFileVisitor',
+                        item_id: str, complexity: int) -> IndexedItem:
         """Index a function definition"""
-        lines = content.split('\n')
+        lines = source.lines
         start_line = node.lineno - 1
         end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line + 10
         
         function_content = '\n'.join(lines[start_line:end_line])
         context = '\n'.join(lines[max(0, start_line-3):min(len(lines), end_line+3)])
+        context_start = max(0, start_line-3)
         
         metadata = {
             'args': [arg.arg for arg in node.args.args],
             'docstring': ast.get_docstring(node),
             'decorators': [self._get_decorator_name(d) for d in node.decorator_list],
-            'complexity': self._calculate_complexity(node)
+            'complexity': complexity
         }
         
         item = IndexedItem(
-            id=self._generate_id('function', file_path, node.name, node.lineno),
+            id=item_id,
             type='function',
             name=node.name,
-            source_file=str(file_path.relative_to(self.extP_path)),
+            source_file=source.source_file,
             line_number=node.lineno,
             content=function_content,
             context=context,
             metadata=metadata,
             hash=self._calculate_hash(function_content),
-            last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+            last_modified=source.last_modified,
+            blob_hash=source.blob_hash,
+            content_range=source.line_range(start_line, end_line),
+            context_range=source.line_range(context_start, min(len(lines), end_line+3))
         )
         
         self._store_item(item)
-        stats['functions'] += 1
+        source.stats['functions'] += 1
+        return item
     
-    def _index_class(self, node: ast.ClassDef, file_path: Path, content: str, stats: Dict[str, int]):
+    def _index_class(self, node: ast.ClassDef, source: '_PythonFileVisitor', item_id: str):
         """Index a class definition"""
-        lines = content.split('\n')
+        lines = source.lines
         start_line = node.lineno - 1
         end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line + 20
         
@@ -197,64 +609,48 @@ class ExtPIndexer:
         
         metadata = {
             'bases': [self._get_base_name(base) for base in node.bases],
-            'methods': [n.name for n in node.body if isinstance(n, ast.FunctionDef)],
+            'methods': [n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))],
             'docstring': ast.get_docstring(node)
         }
         
         item = IndexedItem(
-            id=self._generate_id('class', file_path, node.name, node.lineno),
+            id=item_id,
             type='class',
             name=node.name,
-            source_file=str(file_path.relative_to(self.extP_path)),
+            source_file=source.source_file,
             line_number=node.lineno,
             content=class_content,
             context=class_content,
             metadata=metadata,
             hash=self._calculate_hash(class_content),
-            last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+            last_modified=source.last_modified,
+            blob_hash=source.blob_hash,
+            content_range=source.line_range(start_line, end_line),
+            context_range=source.line_range(start_line, end_line)
         )
         
         self._store_item(item)
-        stats['classes'] += 1
-    
-    def _index_ui_elements(self, content: str, file_path: Path, stats: Dict[str, int]):
-        """Index UI prompts, menus, and user interactions"""
-        lines = content.split('\n')
-        
-        # Patterns for different UI elements
-        patterns = {
-            'menu': [
-                r'print\s*\(\s*["\'].*(?:menu|option|choice|select).*["\']',
-                r'print\s*\(\s*["\'].*\d+[\.\)]\s*.*["\']',  # Numbered options
-            ],
-            'prompt': [
-                r'input\s*\(\s*["\'].*["\']',
-                r'print\s*\(\s*["\'].*(?:enter|input|type).*["\']',
-            ],
-            'config': [
-                r'[A-Z_]+\s*=\s*.*',  # Configuration constants
-                r'config\[.*\]',
-                r'\.config\.',
-            ]
-        }
-        
+        source.stats['classes'] += 1
+    
+    def _scan_ui_lines(self, lines: List[str], file_path: Path, blob_hash: str,
+                       last_modified: str, stats: Dict[str, int]):
+        """Index UI prompts, menus and config usage by pattern, for files the AST cannot parse"""
+        offset = 0
         for line_num, line in enumerate(lines, 1):
-            for element_type, pattern_list in patterns.items():
-                for pattern in pattern_list:
-                    matches = re.finditer(pattern, line, re.IGNORECASE)
-                    for match in matches:
-                        self._index_ui_element(
-                            element_type, match.group(), file_path, 
-                            line_num, line, stats
-                        )
+            for match in self.UI_LINE_PATTERN.finditer(line):
+                element_type = match.lastgroup.split('_')[0]
+                match_text = match.group()
+                name = re.sub(r'["\']', '', match_text).strip()
+                self._index_ui_element(element_type, name, match_text, file_path,
+                                       line_num, line, last_modified, stats,
+                                       blob_hash, (offset, offset + len(line)))
+            offset += len(line) + 1
     
-    def _index_ui_element(self, element_type: str, match_text: str, file_path: Path, 
-                         line_num: int, line_context: str, stats: Dict[str, int]):
+    def _index_ui_element(self, element_type: str, name: str, match_text: str, file_path: Path,
+                          line_num: int, line_context: str, last_modified: str,
+                          stats: Dict[str, int], blob_hash: Optional[str] = None,
+                          line_range: Optional[Tuple[int, int]] = None) -> IndexedItem:
         """Index a UI element (menu, prompt, etc.)"""
-        
-        # Extract meaningful text from the match
-        clean_text = re.sub(r'["\']', '', match_text).strip()
-        
         metadata = {
             'pattern_matched': match_text,
             'context_line': line_context.strip(),
@@ -262,21 +658,23 @@ class ExtPIndexer:
         }
         
         item = IndexedItem(
-            id=self._generate_id(element_type, file_path, clean_text, line_num),
+            id=self._generate_id(element_type, file_path, name),
             type=element_type,
-            name=clean_text[:100],  # Truncate long names
+            name=name[:100],  # Truncate long names
             source_file=str(file_path.relative_to(self.extP_path)),
             line_number=line_num,
             content=match_text,
             context=line_context,
             metadata=metadata,
             hash=self._calculate_hash(match_text),
-            last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+            last_modified=last_modified,
+            blob_hash=blob_hash if line_range else None,
+            context_range=line_range
         )
         
         self._store_item(item)
-        if element_type in stats:
-            stats[element_type] += 1
+        stats[self.UI_STATS_KEYS[element_type]] += 1
+        return item
     
     def _index_config_file(self, file_path: Path, stats: Dict[str, int]):
         """Index configuration files"""
@@ -285,10 +683,13 @@ class ExtPIndexer:
                 content = f.read()
                 config_data = json.loads(content)
             
+            blob_hash = self._register_blob(content)
+            last_modified = datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+            
             # Index each configuration item
             for key, value in self._flatten_config(config_data).items():
                 item = IndexedItem(
-                    id=self._generate_id('config', file_path, key, 0),
+                    id=self._generate_id('config', file_path, key),
                     type='config',
                     name=key,
                     source_file=str(file_path.relative_to(self.extP_path)),
@@ -297,7 +698,9 @@ class ExtPIndexer:
                     context=content[:500],  # First 500 chars of file
                     metadata={'value_type': type(value).__name__, 'file_type': 'json'},
                     hash=self._calculate_hash(str(value)),
-                    last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+                    last_modified=last_modified,
+                    blob_hash=blob_hash,
+                    context_range=(0, min(len(content), 500))
                 )
                 
                 self._store_item(item)
@@ -314,10 +717,12 @@ class ExtPIndexer:
             
             # Extract requirements from markdown
             requirements = self._extract_requirements(content)
+            blob_hash = self._register_blob(content)
+            last_modified = datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
             
             for req_id, req_text in requirements.items():
                 item = IndexedItem(
-                    id=self._generate_id('requirement', file_path, req_id, 0),
+                    id=self._generate_id('requirement', file_path, req_id),
                     type='requirement',
                     name=req_id,
                     source_file=str(file_path.relative_to(self.extP_path)),
@@ -326,7 +731,9 @@ class ExtPIndexer:
                     context=content[:1000],
                     metadata={'file_type': 'markdown', 'requirement_id': req_id},
                     hash=self._calculate_hash(req_text),
-                    last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+                    last_modified=last_modified,
+                    blob_hash=blob_hash,
+                    context_range=(0, min(len(content), 1000))
                 )
                 
                 self._store_item(item)
@@ -337,144 +744,473 @@ class ExtPIndexer:
     
     def query_index(self, query_type: str = None, name_pattern: str = None, 
                    file_pattern: str = None, content_search: str = None) -> List[IndexedItem]:
-        """Query the index with various filters"""
+        """Query the index with various filters
+        
+        name_pattern, file_pattern and content_search are case-insensitive
+        substring matches (e.g. 'onfig' matches 'load_config'). Use search()
+        for ranked, word-based full-text queries.
+        """
         cursor = self.db_connection.cursor()
         
         where_clauses = []
         params = []
+        source = "extP_index i"
         
         if query_type:
-            where_clauses.append("type = ?")
+            where_clauses.append("i.type = ?")
             params.append(query_type)
         
         if name_pattern:
-            where_clauses.append("name LIKE ?")
+            where_clauses.append("i.name LIKE ?")
             params.append(f"%{name_pattern}%")
         
         if file_pattern:
-            where_clauses.append("source_file LIKE ?")
+            where_clauses.append("i.source_file LIKE ?")
             params.append(f"%{file_pattern}%")
         
         if content_search:
-            where_clauses.append("content LIKE ?")
+            if self.fts_enabled:
+                # Blob-backed content is only held as text in the full-text table
+                source = "extP_index i JOIN extP_fts ON extP_fts.item_id = i.id"
+                where_clauses.append("extP_fts.content LIKE ?")
+            else:
+                where_clauses.append("(i.content LIKE ? OR i.content_start IS NOT NULL)")
             params.append(f"%{content_search}%")
         
         where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
         
         query = f"""
-            SELECT id, type, name, source_file, line_number, content, context, metadata, hash, last_modified
-            FROM extP_index 
+            SELECT {self.ITEM_COLUMNS}
+            FROM {source}
             WHERE {where_clause}
-            ORDER BY type, source_file, line_number
+            ORDER BY i.type, i.source_file, i.line_number
         """
         
         cursor.execute(query, params)
-        results = []
+        items = [self._row_to_item(row) for row in cursor.fetchall()]
+        if content_search and not self.fts_enabled:
+            needle = content_search.lower()
+            items = [item for item in items if needle in (item.content or '').lower()]
+        return items
+    
+    def search(self, query: str, query_type: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Ranked full-text search over item names, content and context
         
-        for row in cursor.fetchall():
-            metadata = json.loads(row[7]) if row[7] else {}
-            item = IndexedItem(
-                id=row[0], type=row[1], name=row[2], source_file=row[3],
-                line_number=row[4], content=row[5], context=row[6],
-                metadata=metadata, hash=row[8], last_modified=row[9]
-            )
-            results.append(item)
+        query uses FTS5 syntax, so prefix queries ('menu*'), phrases and
+        column filters ('name : config') are supported. Each result holds the
+        item, its bm25 score (lower is better) and a highlighted snippet.
+        """
+        if not self.fts_enabled:
+            return [{'item': item, 'score': 0.0, 'snippet': item.content[:120]}
+                    for item in self.query_index(query_type=query_type, content_search=query)[:limit]]
+        
+        sql = f"""
+            SELECT {self.ITEM_COLUMNS},
+                   bm25(extP_fts, {self.FTS_WEIGHTS}) AS score,
+                   snippet(extP_fts, -1, '[', ']', '...', 12)
+            FROM extP_fts JOIN extP_index i ON i.id = extP_fts.item_id
+            WHERE extP_fts MATCH ?{" AND i.type = ?" if query_type else ""}
+            ORDER BY score
+            LIMIT ?
+        """
+        params = [query] + ([query_type] if query_type else []) + [limit]
+        
+        cursor = self.db_connection.cursor()
+        try:
+            cursor.execute(sql, params)
+        except sqlite3.OperationalError:
+            # Not valid FTS syntax - search for the words as a prefix phrase instead
+            phrase = self._fts_phrase(query)
+            if not phrase:
+                return []
+            params[0] = phrase
+            cursor.execute(sql, params)
+        
+        columns = self.ITEM_COLUMNS.count(',') + 1
+        return [{'item': self._row_to_item(row[:columns]), 'score': row[columns], 'snippet': row[columns + 1]}
+                for row in cursor.fetchall()]
+    
+    def get_related_items(self, item_id: str, relationship_type: str = None,
+                          direction: str = 'out') -> List[IndexedItem]:
+        """Get items directly related to a specific item
+        
+        direction='out' follows edges from the item (what it calls, imports,
+        uses); direction='in' follows edges into it (who calls or imports it).
+        """
+        neighbors = self._neighbors(item_id, direction, {relationship_type} if relationship_type else None)
+        return self._load_items(neighbors)
+    
+    def traverse_relationships(self, item_id: str, direction: str = 'out',
+                               relationship_types: Optional[List[str]] = None,
+                               max_depth: Optional[int] = None) -> Dict[str, int]:
+        """Breadth-first traversal of the relationship graph
+        
+        Returns {item_id: hop distance} for every item reachable from item_id,
+        i.e. the transitive closure, or the k-hop neighbourhood when max_depth
+        is given. The start item itself is not included.
+        """
+        types = set(relationship_types) if relationship_types else None
+        distances = {item_id: 0}
+        frontier = [item_id]
+        depth = 0
+        
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for current in frontier:
+                for neighbor in self._neighbors(current, direction, types):
+                    if neighbor not in distances:
+                        distances[neighbor] = depth
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
         
-        return results
+        del distances[item_id]
+        return distances
+    
+    def get_impacted_items(self, item_id: str, item_types: Optional[List[str]] = None,
+                           max_depth: Optional[int] = None) -> List[IndexedItem]:
+        """Find items affected by a change to item_id
+        
+        Follows relationships backwards (callers, importers, and the menus and
+        prompts handled by affected functions), e.g. item_types=['menu', 'prompt']
+        answers "which menus does this changed function affect?".
+        """
+        impacted = self.traverse_relationships(item_id, direction='in', max_depth=max_depth)
+        items = self._load_items(sorted(impacted, key=impacted.get))
+        if item_types:
+            items = [item for item in items if item.type in item_types]
+        return items
     
-    def get_related_items(self, item_id: str, relationship_type: str = None) -> List[IndexedItem]:
-        """Get items related to a specific item"""
+    def get_file_signals(self) -> Dict[str, Dict[str, int]]:
+        """Per-file signals of how much a file matters to CLI testing
+        
+        For every indexed file: 'prompts' and 'menus' count its input prompts
+        and menu items, 'fan_in' counts the other files with relationships
+        into it, and 'requirement_refs' counts the distinct requirement IDs
+        (from the indexed documentation) that its code or comments mention.
+        Only structured IDs (REQUIREMENT_ID_PATTERN) count, since numbered
+        section IDs like '1' or '2.3' match any file containing those numbers.
+        """
         cursor = self.db_connection.cursor()
+        signals: Dict[str, Dict[str, int]] = {}
         
-        if relationship_type:
-            query = """
-                SELECT i.* FROM extP_index i
-                JOIN relationships r ON i.id = r.to_item_id
-                WHERE r.from_item_id = ? AND r.relationship_type = ?
-            """
-            params = [item_id, relationship_type]
-        else:
-            query = """
-                SELECT i.* FROM extP_index i
-                JOIN relationships r ON i.id = r.to_item_id
-                WHERE r.from_item_id = ?
-            """
-            params = [item_id]
+        def file_signals(source_file: str) -> Dict[str, int]:
+            return signals.setdefault(source_file, {'prompts': 0, 'menus': 0, 'fan_in': 0, 'requirement_refs': 0})
         
-        cursor.execute(query, params)
-        # Convert results to IndexedItem objects
-        # ... (similar to query_index method)
+        cursor.execute("""
+            SELECT source_file, type, COUNT(*) FROM extP_index
+            WHERE type IN ('prompt', 'menu') GROUP BY source_file, type
+        """)
+        for source_file, item_type, count in cursor.fetchall():
+            file_signals(source_file)[item_type + 's'] = count
         
-        return []  # Simplified for brevity
+        cursor.execute("""
+            SELECT t.source_file, COUNT(DISTINCT f.source_file)
+            FROM relationships r
+            JOIN extP_index f ON f.id = r.from_item_id
+            JOIN extP_index t ON t.id = r.to_item_id
+            WHERE f.source_file != t.source_file
+            GROUP BY t.source_file
+        """)
+        for source_file, count in cursor.fetchall():
+            file_signals(source_file)['fan_in'] = count
+        
+        if self.fts_enabled:
+            requirement_ids = set()
+            for item in self.query_index(query_type='requirement'):
+                requirement_ids.update(self.REQUIREMENT_ID_PATTERN.findall(item.name))
+                requirement_ids.update(self.REQUIREMENT_ID_PATTERN.findall(item.content))
+            for requirement_id in sorted(requirement_ids):
+                phrase = self._fts_phrase(requirement_id)
+                if not phrase:
+                    continue
+                cursor.execute("""
+                    SELECT DISTINCT i.source_file
+                    FROM extP_fts JOIN extP_index i ON i.id = extP_fts.item_id
+                    WHERE extP_fts MATCH ? AND i.type != 'requirement'
+                """, (phrase.rstrip('*'),))
+                for (source_file,) in cursor.fetchall():
+                    file_signals(source_file)['requirement_refs'] += 1
+        
+        return signals
     
-    def check_for_changes(self) -> List[str]:
-        """Check if any files have changed and need reindexing"""
-        changed_files = []
+    def _neighbors(self, item_id: str, direction: str, types: Optional[set]) -> List[str]:
+        """Adjacent item IDs from the in-memory adjacency cache"""
+        if self._adjacency is None:
+            self._load_adjacency()
         
+        outgoing, incoming = self._adjacency
+        edges = (outgoing if direction == 'out' else incoming).get(item_id, ())
+        return [other for other, rel_type in edges if types is None or rel_type in types]
+    
+    def _load_adjacency(self):
+        """Load the relationships table into outgoing/incoming adjacency maps"""
+        outgoing: Dict[str, List[Tuple[str, str]]] = {}
+        incoming: Dict[str, List[Tuple[str, str]]] = {}
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT from_item_id, to_item_id, relationship_type FROM relationships")
+        for from_id, to_id, rel_type in cursor.fetchall():
+            outgoing.setdefault(from_id, []).append((to_id, rel_type))
+            incoming.setdefault(to_id, []).append((from_id, rel_type))
+        self._adjacency = (outgoing, incoming)
+    
+    def _load_items(self, item_ids: List[str]) -> List[IndexedItem]:
+        """Load items by ID, preserving the order of item_ids"""
+        found = {}
         cursor = self.db_connection.cursor()
-        cursor.execute("SELECT DISTINCT source_file, hash FROM extP_index")
-        indexed_files = {row[0]: row[1] for row in cursor.fetchall()}
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            cursor.execute(f"""
+                SELECT {self.ITEM_COLUMNS} FROM extP_index i
+                WHERE i.id IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            for row in cursor.fetchall():
+                found[row[0]] = self._row_to_item(row)
+        return [found[item_id] for item_id in item_ids if item_id in found]
+    
+    def check_for_changes(self) -> List[str]:
+        """Check if any files have changed and need reindexing
         
-        # Check all files in ExtP directory
-        for file_path in self.extP_path.rglob("*"):
-            if file_path.is_file() and file_path.suffix in ['.py', '.json', '.md', '.txt']:
-                rel_path = str(file_path.relative_to(self.extP_path))
-                
-                if rel_path in indexed_files:
-                    # Check if file has changed
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        current_hash = self._calculate_hash(f.read())
-                    
-                    if current_hash != indexed_files[rel_path]:
-                        changed_files.append(rel_path)
-                else:
-                    # New file
-                    changed_files.append(rel_path)
+        Files are compared against the file manifest by size and mtime first;
+        only files whose stat signature differs are read and hashed. Files that
+        are in the manifest but no longer on disk are reported as well.
+        """
+        manifest = self._load_manifest()
+        on_disk = [str(file_path.relative_to(self.extP_path)) for file_path in self._iter_indexable_files()]
+        
+        changed_files = self._compare_with_manifest(on_disk, manifest)
+        
+        # Deleted files
+        changed_files.extend(sorted(set(manifest) - set(on_disk)))
         
         return changed_files
     
     def incremental_update(self) -> Dict[str, int]:
-        """Update index for changed files only"""
-        changed_files = self.check_for_changes()
+        """Update index for changed files only
+        
+        Each changed file's items are replaced in one transaction, together
+        with its references and relationships, and the item-level changes
+        are recorded in change_log. Relationships are then re-resolved only
+        for the changed files and for references elsewhere that name their items.
+        """
+        return self._apply_changes(self.check_for_changes())
+    
+    def update_files(self, rel_paths: List[str]) -> Dict[str, int]:
+        """Reindex specific files (paths relative to the ExtP root), e.g. from a file watcher
+        
+        Paths that are not indexable, or whose size/mtime/content still match
+        the manifest, are skipped; paths that no longer exist are removed.
+        """
+        candidates = [rel_path for rel_path in dict.fromkeys(rel_paths) if self.is_indexed_path(rel_path)]
+        
+        manifest = self._load_manifest(candidates)
+        existing = [rel_path for rel_path in candidates if (self.extP_path / rel_path).is_file()]
+        deleted = [rel_path for rel_path in candidates
+                   if rel_path in manifest and not (self.extP_path / rel_path).is_file()]
+        
+        return self._apply_changes(self._compare_with_manifest(existing, manifest) + deleted)
+    
+    def is_indexed_path(self, rel_path: str) -> bool:
+        """Whether a path relative to the ExtP root is one the index covers"""
+        path = Path(rel_path)
+        return path.suffix in self.INDEXED_SUFFIXES and not self.SKIPPED_DIRS.intersection(path.parts)
+    
+    def get_index_version(self) -> int:
+        """Current index version; it increases after every committed index update"""
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT value FROM index_state WHERE key = 'version'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def _apply_changes(self, changed_files: List[str]) -> Dict[str, int]:
+        """Reindex or remove the given changed files"""
         stats = {'updated': 0, 'added': 0, 'deleted': 0}
+        item_stats = self._empty_stats()
+        
+        cursor = self.db_connection.cursor()
+        known_files = set(self._load_manifest(changed_files))
         
+        touched_names = set()
+        results = []
         for file_path in changed_files:
             full_path = self.extP_path / file_path
+            
             if full_path.exists():
-                # Remove old entries for this file
-                cursor = self.db_connection.cursor()
-                cursor.execute("DELETE FROM extP_index WHERE source_file = ?", (file_path,))
-                
-                # Re-index the file
-                if full_path.suffix == '.py':
-                    self._index_python_file(full_path, stats)
-                elif full_path.suffix == '.json':
-                    self._index_config_file(full_path, stats)
-                elif full_path.suffix == '.md':
-                    self._index_documentation_file(full_path, stats)
+                results.append(self._parse_file(full_path))
                 
-                stats['updated'] += 1
+                if file_path in known_files:
+                    stats['updated'] += 1
+                else:
+                    stats['added'] += 1
+            else:
+                with self.db_connection:
+                    touched_names |= self._remove_file(cursor, file_path)
+                stats['deleted'] += 1
         
-        self.db_connection.commit()
+        touched_names |= self._write_parse_results(results, item_stats)
+        
+        if changed_files:
+            self._update_relationships(changed_files, touched_names)
+            self._bump_index_version()
         return stats
     
+    def _load_manifest(self, rel_paths: Optional[List[str]] = None) -> Dict[str, Tuple[int, int, str]]:
+        """Manifest rows {path: (size, mtime_ns, content_hash)}, for all files or just rel_paths"""
+        cursor = self.db_connection.cursor()
+        query = "SELECT path, size, mtime_ns, content_hash FROM file_manifest"
+        if rel_paths is None:
+            cursor.execute(query)
+            return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+        
+        manifest = {}
+        for start in range(0, len(rel_paths), 500):
+            chunk = rel_paths[start:start + 500]
+            cursor.execute(f"{query} WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+            manifest.update({row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()})
+        return manifest
+    
+    def _compare_with_manifest(self, rel_paths: List[str], manifest: Dict[str, tuple]) -> List[str]:
+        """Return the files among rel_paths that are new, changed, or deleted since they were listed"""
+        changed_files = []
+        touched = []
+        
+        for rel_path in rel_paths:
+            if rel_path not in manifest:
+                # New file
+                changed_files.append(rel_path)
+                continue
+            
+            file_path = self.extP_path / rel_path
+            size, mtime_ns, content_hash = manifest[rel_path]
+            try:
+                stat = file_path.stat()
+                if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+                    continue
+                
+                # Stat signature differs - confirm with a content hash
+                current_hash = self._hash_file(file_path)
+            except FileNotFoundError:
+                # Deleted since it was listed; reported so the caller removes it
+                changed_files.append(rel_path)
+                continue
+            
+            if current_hash != content_hash:
+                changed_files.append(rel_path)
+            else:
+                # Touched but unchanged; refresh the signature so it is skipped next time
+                touched.append((stat.st_size, stat.st_mtime_ns, rel_path))
+        
+        if touched:
+            self.db_connection.executemany(
+                "UPDATE file_manifest SET size = ?, mtime_ns = ? WHERE path = ?", touched
+            )
+            self.db_connection.commit()
+        
+        return changed_files
+    
+    def _bump_index_version(self):
+        """Publish a new index version after a committed update"""
+        with self.db_connection:
+            self.db_connection.execute("UPDATE index_state SET value = value + 1 WHERE key = 'version'")
+    
     # Helper methods
-    def _generate_id(self, item_type: str, file_path: Path, name: str, line: int) -> str:
-        """Generate unique ID for an indexed item"""
-        base = f"{item_type}:{file_path.name}:{name}:{line}"
+    def _row_to_item(self, row) -> IndexedItem:
+        """Convert an extP_index row (ITEM_COLUMNS order) to an IndexedItem
+        
+        Content and context stored as blob ranges are decompressed lazily,
+        the first time they are read.
+        """
+        metadata = json.loads(row[7]) if row[7] else {}
+        blob_hash = row[10]
+        content_range = (row[11], row[12]) if row[11] is not None else None
+        context_range = (row[13], row[14]) if row[13] is not None else None
+        
+        item_class = _BlobBackedItem if blob_hash else IndexedItem
+        item = item_class(
+            id=row[0], type=row[1], name=row[2], source_file=row[3],
+            line_number=row[4], content=row[5], context=row[6],
+            metadata=metadata, hash=row[8], last_modified=row[9],
+            blob_hash=blob_hash, content_range=content_range, context_range=context_range
+        )
+        if blob_hash:
+            item._blob_loader = self._load_blob
+        return item
+    
+    def _load_blob(self, blob_hash: str) -> str:
+        """Decompressed text of a content blob, through a small LRU cache"""
+        text = self._blob_cache.get(blob_hash)
+        if text is not None:
+            self._blob_cache.move_to_end(blob_hash)
+            return text
+        
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT data FROM content_blobs WHERE hash = ?", (blob_hash,))
+        row = cursor.fetchone()
+        text = zlib.decompress(row[0]).decode('utf-8') if row else ''
+        
+        self._blob_cache[blob_hash] = text
+        if len(self._blob_cache) > self.BLOB_CACHE_SIZE:
+            self._blob_cache.popitem(last=False)
+        return text
+    
+    def _register_blob(self, content: str) -> str:
+        """Remember the text of the file being parsed as its content blob; returns the blob hash"""
+        blob_hash = self._calculate_hash(content)
+        self._pending_blob = (blob_hash, content)
+        return blob_hash
+    
+    def _fts_phrase(self, text: str) -> Optional[str]:
+        """Turn free text into a quoted FTS5 prefix phrase, or None if it has no words"""
+        if not self.fts_enabled:
+            return None
+        words = re.findall(r'[^\W_]+', text)
+        if not words:
+            return None
+        return '"' + ' '.join(words) + '"*'
+    
+    def _generate_id(self, item_type: str, file_path: Path, name: str) -> str:
+        """Generate a stable, unique ID for an indexed item
+        
+        IDs are based on the path relative to the ExtP root and the item's
+        (qualified) name, not its line, so editing code above an item keeps
+        its ID. Repeated names within one file get an occurrence suffix.
+        """
+        base = f"{item_type}:{file_path.relative_to(self.extP_path).as_posix()}:{name}"
+        occurrence = self._id_occurrences.get(base, 0)
+        self._id_occurrences[base] = occurrence + 1
+        if occurrence:
+            base = f"{base}#{occurrence}"
         return hashlib.md5(base.encode()).hexdigest()
     
     def _calculate_hash(self, content: str) -> str:
         """Calculate hash of content for change detection"""
         return hashlib.sha256(content.encode()).hexdigest()
     
-    def _calculate_complexity(self, node: ast.FunctionDef) -> int:
-        """Calculate cyclomatic complexity of a function"""
-        complexity = 1  # Base complexity
-        for child in ast.walk(node):
-            if isinstance(child, (ast.If, ast.While, ast.For, ast.ExceptHandler)):
-                complexity += 1
-        return complexity
+    def _hash_file(self, file_path: Path) -> str:
+        """Calculate hash of a file's raw bytes without decoding it"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _manifest_entry(self, file_path: Path) -> Optional[tuple]:
+        """Build a file's manifest row: (path, size, mtime_ns, content_hash)"""
+        try:
+            stat = file_path.stat()
+            content_hash = self._hash_file(file_path)
+        except OSError as e:
+            print(f"Error recording manifest entry for {file_path}: {e}")
+            return None
+        
+        return (str(file_path.relative_to(self.extP_path)), stat.st_size, stat.st_mtime_ns, content_hash)
+    
+    def _store_manifest_entries(self, entries: List[tuple]):
+        """Store manifest rows in the database"""
+        self.db_connection.executemany("""
+            INSERT OR REPLACE INTO file_manifest (path, size, mtime_ns, content_hash)
+            VALUES (?, ?, ?, ?)
+        """, entries)
     
     def _get_decorator_name(self, decorator) -> str:
         """Get decorator name as string"""
@@ -485,6 +1221,45 @@ class ExtPIndexer:
         else:
             return "unknown"
     
+    def _get_callee_name(self, func) -> Optional[str]:
+        """Get the unqualified name of a called function"""
+        if isinstance(func, ast.Name):
+            return func.id
+        elif isinstance(func, ast.Attribute):
+            return func.attr
+        return None
+    
+    def _is_config_expression(self, node) -> bool:
+        """Whether an expression looks like a configuration mapping (config, self.config, ...)"""
+        if isinstance(node, ast.Name):
+            return 'config' in node.id.lower()
+        elif isinstance(node, ast.Attribute):
+            return 'config' in node.attr.lower()
+        return False
+    
+    def _module_name(self, file_path: Path) -> str:
+        """Dotted module name of a Python file relative to the ExtP root"""
+        parts = list(file_path.relative_to(self.extP_path).with_suffix('').parts)
+        if parts and parts[-1] == '__init__' and len(parts) > 1:
+            parts.pop()
+        return '.'.join(parts)
+    
+    def _resolve_import_base(self, module_name: str, is_package: bool, level: int,
+                             module: Optional[str]) -> str:
+        """Resolve the module part of a (possibly relative) from-import"""
+        if not level:
+            return module or ''
+        package = module_name.split('.') if is_package else module_name.split('.')[:-1]
+        package = package[:len(package) - (level - 1)] if level > 1 else package
+        return '.'.join(package + ([module] if module else []))
+    
+    def _add_reference(self, source_file: str, from_item_id: str, relationship_type: str,
+                       target_kind: str, target: str, line_number: int):
+        """Queue an unresolved reference from an item; resolved by _build_relationships"""
+        self._pending_references.append(
+            (source_file, from_item_id, relationship_type, target_kind, target, line_number)
+        )
+    
     def _get_base_name(self, base) -> str:
         """Get base class name as string"""
         if isinstance(base, ast.Name):
@@ -518,24 +1293,204 @@ class ExtPIndexer:
         return requirements
     
     def _store_item(self, item: IndexedItem):
-        """Store an indexed item in the database"""
-        cursor = self.db_connection.cursor()
-        cursor.execute("""
+        """Queue an indexed item; it is written by the caller of _parse_file"""
+        self._pending_items.append(item)
+    
+    def _store_items(self, items: List[IndexedItem]):
+        """Store indexed items in the database
+        
+        Text covered by a blob range is stored as the range only (NULL
+        content/context); the full-text index is fed from the in-memory text.
+        """
+        rows = []
+        for item in items:
+            content_range = item.content_range if item.blob_hash else None
+            context_range = item.context_range if item.blob_hash else None
+            rows.append((
+                item.id, item.type, item.name, item.source_file, item.line_number,
+                None if content_range else item.content,
+                None if context_range else item.context,
+                json.dumps(item.metadata), item.hash, item.last_modified,
+                item.blob_hash if (content_range or context_range) else None,
+                content_range[0] if content_range else None,
+                content_range[1] if content_range else None,
+                context_range[0] if context_range else None,
+                context_range[1] if context_range else None
+            ))
+        
+        self.db_connection.executemany("""
             INSERT OR REPLACE INTO extP_index 
-            (id, type, name, source_file, line_number, content, context, metadata, hash, last_modified)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            item.id, item.type, item.name, item.source_file, item.line_number,
-            item.content, item.context, json.dumps(item.metadata), item.hash, item.last_modified
-        ))
+            (id, type, name, source_file, line_number, content, context, metadata, hash, last_modified,
+             blob_hash, content_start, content_end, context_start, context_end)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        self._store_search_rows(items)
+    
+    def _store_search_rows(self, items: List[IndexedItem]):
+        """Add items to the full-text index
+        
+        Multi-line contexts taken from the file blob (function surroundings,
+        file prefixes) are left out; they repeat text indexed elsewhere.
+        """
+        if not self.fts_enabled:
+            return
+        self.db_connection.executemany("""
+            INSERT INTO extP_fts (rowid, item_id, name, content, context)
+            SELECT rowid, id, name, ?, ? FROM extP_index WHERE id = ?
+        """, [(
+            item.content or '',
+            '' if item.context_range and '\n' in (item.context or '') else (item.context or ''),
+            item.id
+        ) for item in items])
     
     def _build_relationships(self):
-        """Build relationships between indexed items"""
-        # This would analyze imports, function calls, configuration usage, etc.
-        # Simplified for brevity
-        pass
+        """Resolve all stored references into relationships between indexed items"""
+        cursor = self.db_connection.cursor()
+        cursor.execute("""
+            SELECT source_file, from_item_id, relationship_type, target_kind, target, line_number
+            FROM item_references
+        """)
+        edges = self._resolve_references(cursor.fetchall())
+        
+        with self.db_connection:
+            self.db_connection.execute("DELETE FROM relationships")
+            self._store_relationships(edges)
+        
+        self._adjacency = None
+        print(f"Relationships built: {len(edges)}")
     
-    def _index_variable_assignment(self, node: ast.Assign, file_path: Path, content: str, stats: Dict[str, int]):
+    def _update_relationships(self, changed_files: List[str], touched_names: set):
+        """Re-resolve relationships affected by changes to changed_files
+        
+        Edges touching the changed files' items were already removed by
+        _replace_file/_remove_file. Here the changed files' own references
+        are resolved again, and so are all references of items in other
+        files that refer to a name that was added, removed or rewritten.
+        """
+        cursor = self.db_connection.cursor()
+        affected = []
+        
+        for start in range(0, len(changed_files), 500):
+            chunk = changed_files[start:start + 500]
+            cursor.execute(f"""
+                SELECT source_file, from_item_id, relationship_type, target_kind, target, line_number
+                FROM item_references WHERE source_file IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            affected.extend(cursor.fetchall())
+        
+        changed_set = set(changed_files)
+        names = sorted(touched_names)
+        sources = set()
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            cursor.execute(f"""
+                SELECT source_file, from_item_id FROM item_references WHERE target_kind IN ('symbol', 'config')
+                AND target IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            sources.update(row[1] for row in cursor.fetchall() if row[0] not in changed_set)
+        
+        # Import targets are dotted paths; match them on module prefix or imported symbol
+        cursor.execute("""
+            SELECT source_file, from_item_id, target FROM item_references WHERE target_kind = 'import'
+        """)
+        for source_file, from_id, target in cursor.fetchall():
+            if source_file in changed_set:
+                continue
+            if target in touched_names or target.rsplit('.', 1)[-1] in touched_names or \
+                    target.rsplit('.', 1)[0] in touched_names:
+                sources.add(from_id)
+        
+        # An edge is stored once per (from, to, type), whichever reference produced it,
+        # so an affected item in another file has all of its references re-resolved
+        sources = sorted(sources)
+        for start in range(0, len(sources), 500):
+            chunk = sources[start:start + 500]
+            cursor.execute(f"""
+                SELECT source_file, from_item_id, relationship_type, target_kind, target, line_number
+                FROM item_references WHERE from_item_id IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            affected.extend(cursor.fetchall())
+        
+        edges = self._resolve_references(affected)
+        
+        with self.db_connection:
+            # Drop the re-resolved items' old edges; the changed files' were removed already
+            for start in range(0, len(sources), 500):
+                chunk = sources[start:start + 500]
+                self.db_connection.execute(
+                    f"DELETE FROM relationships WHERE from_item_id IN ({','.join('?' * len(chunk))})", chunk
+                )
+            self._store_relationships(edges)
+        
+        self._adjacency = None
+    
+    def _resolve_references(self, references) -> set:
+        """Resolve (source_file, from_id, type, kind, target, line) references into edges"""
+        cursor = self.db_connection.cursor()
+        
+        modules = {}
+        symbols: Dict[str, List[Tuple[str, str]]] = {}
+        configs: Dict[str, List[str]] = {}
+        cursor.execute("""
+            SELECT id, type, name, source_file FROM extP_index
+            WHERE type IN ('module', 'function', 'class', 'config')
+        """)
+        for item_id, item_type, name, source_file in cursor.fetchall():
+            if item_type == 'module':
+                modules[name] = (item_id, source_file)
+            elif item_type in ('function', 'class'):
+                symbols.setdefault(name, []).append((item_id, source_file))
+            elif item_type == 'config':
+                configs.setdefault(name, []).append(item_id)
+                if '.' in name:
+                    configs.setdefault(name.rsplit('.', 1)[1], []).append(item_id)
+        
+        edges = set()
+        for source_file, from_id, rel_type, kind, target, line_number in references:
+            if kind == 'item':
+                targets = [target]
+            elif kind == 'import':
+                targets = self._resolve_import_target(target, modules, symbols)
+            elif kind == 'symbol':
+                candidates = symbols.get(target, [])
+                same_file = [item_id for item_id, path in candidates if path == source_file]
+                if same_file:
+                    targets = same_file
+                elif len(candidates) <= self.MAX_AMBIGUOUS_TARGETS:
+                    targets = [item_id for item_id, _ in candidates]
+                else:
+                    targets = []
+            elif kind == 'config':
+                targets = configs.get(target, [])
+            else:
+                targets = []
+            
+            for to_id in targets:
+                if to_id != from_id:
+                    edges.add((from_id, to_id, rel_type, json.dumps({'target': target, 'line': line_number})))
+        return edges
+    
+    def _store_relationships(self, edges: set):
+        """Insert resolved edges; an edge already present is kept"""
+        self.db_connection.executemany("""
+            INSERT OR IGNORE INTO relationships (from_item_id, to_item_id, relationship_type, metadata)
+            VALUES (?, ?, ?, ?)
+        """, sorted(edges))
+    
+    def _resolve_import_target(self, target: str, modules: Dict[str, tuple],
+                               symbols: Dict[str, List[Tuple[str, str]]]) -> List[str]:
+        """Resolve 'pkg.mod' or 'pkg.mod.symbol' to a module or symbol item"""
+        if target in modules:
+            return [modules[target][0]]
+        if '.' in target:
+            base, symbol = target.rsplit('.', 1)
+            if base in modules:
+                module_file = modules[base][1]
+                matches = [item_id for item_id, path in symbols.get(symbol, []) if path == module_file]
+                return matches or [modules[base][0]]
+        return []
+    
+    def _index_variable_assignment(self, node: ast.Assign, source: '_PythonFileVisitor'):
         """Index variable assignments that might be state variables"""
         # Look for potential state variables
         for target in node.targets:
@@ -546,24 +1501,27 @@ class ExtPIndexer:
                     'config' in var_name.lower() or
                     var_name.startswith('_')):  # Private variables
                     
-                    lines = content.split('\n')
+                    lines = source.lines
                     line_content = lines[node.lineno - 1] if node.lineno <= len(lines) else ""
                     
                     item = IndexedItem(
-                        id=self._generate_id('state_var', file_path, var_name, node.lineno),
+                        id=self._generate_id('state_var', source.file_path, var_name),
                         type='state_var',
                         name=var_name,
-                        source_file=str(file_path.relative_to(self.extP_path)),
+                        source_file=source.source_file,
                         line_number=node.lineno,
                         content=line_content,
                         context=line_content,
                         metadata={'variable_type': 'assignment'},
                         hash=self._calculate_hash(line_content),
-                        last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+                        last_modified=source.last_modified,
+                        blob_hash=source.blob_hash,
+                        content_range=source.line_range(node.lineno - 1, node.lineno),
+                        context_range=source.line_range(node.lineno - 1, node.lineno)
                     )
                     
                     self._store_item(item)
-                    stats['state_vars'] += 1
+                    source.stats['state_vars'] += 1
     
     def _index_text_file(self, file_path: Path, stats: Dict[str, int]):
         """Index text files (like simulation dictionaries)"""
@@ -575,9 +1533,11 @@ class ExtPIndexer:
             if content.strip().startswith('{'):
                 try:
                     data = json.loads(content)
+                    blob_hash = self._register_blob(content)
+                    last_modified = datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
                     for key, value in data.items():
                         item = IndexedItem(
-                            id=self._generate_id('simulation_rule', file_path, key, 0),
+                            id=self._generate_id('simulation_rule', file_path, key),
                             type='simulation_rule',
                             name=key,
                             source_file=str(file_path.relative_to(self.extP_path)),
@@ -586,7 +1546,9 @@ class ExtPIndexer:
                             context=content[:200],
                             metadata={'trigger': key, 'action': value, 'file_type': 'simulation_dict'},
                             hash=self._calculate_hash(f"{key}{value}"),
-                            last_modified=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+                            last_modified=last_modified,
+                            blob_hash=blob_hash,
+                            context_range=(0, min(len(content), 200))
                         )
                         self._store_item(item)
                         stats['configs'] += 1
@@ -596,9 +1558,390 @@ class ExtPIndexer:
         except Exception as e:
             print(f"Error indexing text file {file_path}: {e}")
 
+class _PythonFileVisitor(ast.NodeVisitor):
+    """Single pass over a module's AST for ExtPIndexer
+    
+    Indexes functions, classes, state variables and UI elements (print/input
+    string literals, config lookups and module constants), tracks cyclomatic
+    complexity of the enclosing functions as branch nodes are visited, and
+    records imports, calls and config lookups against the innermost scope.
+    """
+    
+    BRANCH_NODES = (ast.If, ast.While, ast.For, ast.ExceptHandler)
+    
+    def __init__(self, indexer: ExtPIndexer, file_path: Path, lines: List[str], blob_hash: str,
+                 last_modified: str, module_item: IndexedItem, stats: Dict[str, int]):
+        self.indexer = indexer
+        self.file_path = file_path
+        self.source_file = module_item.source_file
+        self.lines = lines
+        self.blob_hash = blob_hash
+        self.line_offsets = [0]  # Character offset of each line in the file text
+        for line in lines:
+            self.line_offsets.append(self.line_offsets[-1] + len(line) + 1)
+        self.last_modified = last_modified
+        self.stats = stats
+        self.module_item = module_item
+        self.module_name = module_item.name
+        self.is_package = file_path.name == '__init__.py'
+        self.scopes: List[Optional[str]] = [module_item.id]  # None inside class bodies
+        self.functions: List[str] = []  # IDs of the enclosing functions
+        self.qualname: List[str] = []  # Names of the enclosing classes/functions
+        self.complexity: List[int] = []  # One counter per enclosing function
+    
+    def visit(self, node):
+        if self.complexity and isinstance(node, self.BRANCH_NODES):
+            # Branches count towards every enclosing function, as ast.walk would
+            self.complexity = [count + 1 for count in self.complexity]
+        return super().visit(node)
+    
+    def visit_FunctionDef(self, node):
+        self.qualname.append(node.name)
+        item_id = self.indexer._generate_id('function', self.file_path, '.'.join(self.qualname))
+        self.scopes.append(item_id)
+        self.functions.append(item_id)
+        self.complexity.append(1)
+        self.generic_visit(node)
+        complexity = self.complexity.pop()
+        self.functions.pop()
+        self.scopes.pop()
+        self.qualname.pop()
+        
+        self.indexer._index_function(node, self, item_id, complexity)
+    
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_ClassDef(self, node):
+        self.qualname.append(node.name)
+        item_id = self.indexer._generate_id('class', self.file_path, '.'.join(self.qualname))
+        self.scopes.append(None)
+        self.generic_visit(node)
+        self.scopes.pop()
+        self.qualname.pop()
+        self.indexer._index_class(node, self, item_id)
+    
+    def visit_Assign(self, node):
+        self.indexer._index_variable_assignment(node, self)
+        if len(self.scopes) == 1:
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id.isupper():
+                    # Module-level configuration constant
+                    self._ui_element('config', target.id, node)
+        self.generic_visit(node)
+    
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._reference_from(self.module_item.id, 'imports', 'import', alias.name, node.lineno)
+    
+    def visit_ImportFrom(self, node):
+        base = self.indexer._resolve_import_base(self.module_name, self.is_package, node.level, node.module)
+        for alias in node.names:
+            target = f"{base}.{alias.name}" if base else alias.name
+            self._reference_from(self.module_item.id, 'imports', 'import', target, node.lineno)
+    
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id in ('print', 'input') and node.args:
+            text = self._literal_text(node.args[0])
+            if text and text.strip():
+                if node.func.id == 'input':
+                    self._ui_element('prompt', text, node)
+                elif self.indexer.MENU_TEXT.search(text):
+                    self._ui_element('menu', text, node)
+                elif self.indexer.PROMPT_TEXT.search(text):
+                    self._ui_element('prompt', text, node)
+        
+        scope = self.scopes[-1]
+        if scope:
+            callee = self.indexer._get_callee_name(node.func)
+            if callee:
+                self._reference_from(scope, 'calls', 'symbol', callee, node.lineno)
+            # config.get("key")
+            if (isinstance(node.func, ast.Attribute) and node.func.attr == 'get' and
+                    self.indexer._is_config_expression(node.func.value) and node.args and
+                    isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                self._reference_from(scope, 'uses_config', 'config', node.args[0].value, node.lineno)
+        self.generic_visit(node)
+    
+    def visit_Subscript(self, node):
+        # config["key"]
+        scope = self.scopes[-1]
+        if scope and self.indexer._is_config_expression(node.value):
+            key = node.slice
+            if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                self._reference_from(scope, 'uses_config', 'config', key.value, node.lineno)
+        if self.indexer._is_config_expression(node.value):
+            self._ui_element('config', self._segment(node), node)
+        self.generic_visit(node)
+    
+    def visit_Attribute(self, node):
+        # x.config.y
+        if isinstance(node.value, ast.Attribute) and node.value.attr == 'config':
+            self._ui_element('config', self._segment(node), node)
+        self.generic_visit(node)
+    
+    def _ui_element(self, element_type: str, name: str, node: ast.AST):
+        """Index a UI element found at node and link menus/prompts to their handler"""
+        line = self.lines[node.lineno - 1] if node.lineno <= len(self.lines) else ""
+        item = self.indexer._index_ui_element(
+            element_type, name.strip(), self._segment(node), self.file_path,
+            node.lineno, line, self.last_modified, self.stats,
+            self.blob_hash, self.line_range(node.lineno - 1, node.lineno)
+        )
+        if element_type in ('menu', 'prompt') and self.functions:
+            self._reference_from(item.id, 'handled_by', 'item', self.functions[-1], node.lineno)
+    
+    def line_range(self, start: int, end: int) -> Tuple[int, int]:
+        """Character range in the file text of '\\n'.join(lines[start:end])"""
+        end = min(max(start, end), len(self.lines))
+        return self.line_offsets[start], max(self.line_offsets[start], self.line_offsets[end] - 1)
+    
+    def _segment(self, node: ast.AST) -> str:
+        """Source text of node, cut from the shared line table (first line only if multi-line)"""
+        line = self.lines[node.lineno - 1] if node.lineno <= len(self.lines) else ""
+        end = node.end_col_offset if getattr(node, 'end_lineno', None) == node.lineno else None
+        return line[node.col_offset:end]
+    
+    def _literal_text(self, node: ast.AST) -> Optional[str]:
+        """Text of a string literal or f-string (placeholders shown as {})"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.JoinedStr):
+            return ''.join(part.value if isinstance(part, ast.Constant) else '{}'
+                           for part in node.values)
+        return None
+    
+    def _reference_from(self, item_id: str, relationship_type: str, target_kind: str,
+                        target: str, line_number: int):
+        self.indexer._add_reference(self.source_file, item_id, relationship_type,
+                                    target_kind, target, line_number)
+
+def read_index_version(cache_path: str = "extP_index.db") -> int:
+    """Read the published index version without opening an ExtPIndexer
+    
+    Cheap enough for CUS and the prompt/test generators to poll; returns -1
+    if the index does not exist yet.
+    """
+    if not os.path.exists(cache_path):
+        return -1
+    try:
+        connection = sqlite3.connect(f"file:{Path(cache_path).resolve().as_posix()}?mode=ro", uri=True)
+        try:
+            row = connection.execute("SELECT value FROM index_state WHERE key = 'version'").fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return -1
+    return row[0] if row else 0
+
+class _ChangeCollector(FileSystemEventHandler):
+    """watchdog handler forwarding file events to an ExtPIndexWatcher"""
+    
+    def __init__(self, watcher: 'ExtPIndexWatcher'):
+        super().__init__()
+        self.watcher = watcher
+    
+    def on_any_event(self, event):
+        if event.is_directory:
+            # Directory moves/deletes do not always report their files
+            if event.event_type in ('moved', 'deleted'):
+                self.watcher.request_rescan()
+            return
+        self.watcher.notify_changed(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.notify_changed(dest_path)
+
+class ExtPIndexWatcher:
+    """Long-running mode that keeps an ExtP index current as files change
+    
+    File events come from watchdog (inotify/FSEvents/ReadDirectoryChangesW)
+    when it is installed, otherwise the tree is polled with the stat-only
+    manifest check. Each poll walks the tree and stats every indexed file
+    against the manifest; files are only read and hashed when their size or
+    mtime differ, but the walk itself costs O(files) every poll_interval, so
+    raise poll_interval for large trees. Bursts of events are coalesced for
+    debounce_seconds, then only the touched files are reindexed on a
+    background thread, which owns its own ExtPIndexer (SQLite connections
+    are per thread). Consumers poll read_index_version() to notice updates.
+    """
+    
+    def __init__(self, extP_path: str, cache_path: str = "extP_index.db",
+                 debounce_seconds: float = 0.5, poll_interval: float = 2.0,
+                 use_polling: Optional[bool] = None, build_if_missing: bool = True):
+        self.extP_path = Path(extP_path).resolve()
+        self.cache_path = cache_path
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.use_polling = (not WATCHDOG_AVAILABLE) if use_polling is None else use_polling
+        if not self.use_polling and not WATCHDOG_AVAILABLE:
+            print("watchdog is not installed - falling back to polling for changes")
+            self.use_polling = True
+        self.build_if_missing = build_if_missing
+        
+        self.index_version = -1
+        self.last_update_stats: Dict[str, int] = {}
+        self._pending: set = set()
+        self._rescan = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+    
+    def start(self):
+        """Start watching; returns immediately"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._idle.clear()
+        self._thread = threading.Thread(target=self._run, name="ExtPIndexWatcher", daemon=True)
+        self._thread.start()
+        
+        if not self.use_polling:
+            self._observer = Observer()
+            self._observer.schedule(_ChangeCollector(self), str(self.extP_path), recursive=True)
+            self._observer.start()
+        
+        mode = "polling" if self.use_polling else "filesystem events"
+        print(f"Watching {self.extP_path} for changes ({mode})")
+    
+    def stop(self, timeout: float = 10.0):
+        """Stop watching, after the update in progress (if any) completes"""
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout)
+            self._observer = None
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+    
+    def notify_changed(self, path: str):
+        """Queue a changed path (absolute, or relative to the ExtP root) for reindexing"""
+        try:
+            rel_path = str(Path(path).resolve().relative_to(self.extP_path)) if os.path.isabs(path) else path
+        except ValueError:
+            return  # Outside the watched tree
+        with self._lock:
+            self._pending.add(rel_path)
+            self._idle.clear()
+        self._wakeup.set()
+    
+    def request_rescan(self):
+        """Queue a manifest check of the whole tree"""
+        with self._lock:
+            self._rescan = True
+            self._idle.clear()
+        self._wakeup.set()
+    
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until all queued changes have been indexed
+        
+        The watcher first becomes idle once the initial build or catch-up
+        update after start() has finished, and again after each update that
+        leaves nothing queued (including failed ones). It is also released
+        when the watcher thread exits. Returns False if timeout expires first.
+        """
+        return self._idle.wait(timeout)
+    
+    def _set_idle_if_drained(self):
+        with self._lock:
+            if not self._pending and not self._rescan:
+                self._idle.set()
+    
+    def _run(self):
+        indexer = ExtPIndexer(str(self.extP_path), self.cache_path)
+        try:
+            if self.build_if_missing and not indexer._load_manifest():
+                indexer.build_full_index()
+            else:
+                # Catch up on anything changed while nobody was watching
+                indexer.incremental_update()
+            self.index_version = indexer.get_index_version()
+            self._set_idle_if_drained()
+            
+            while not self._stop.is_set():
+                if self.use_polling:
+                    self._wakeup.wait(self.poll_interval)
+                    if not self._stop.is_set():
+                        self.request_rescan()
+                else:
+                    self._wakeup.wait()
+                if self._stop.is_set():
+                    break
+                
+                # Coalesce a burst of saves into one update
+                while True:
+                    self._wakeup.clear()
+                    if not self._wakeup.wait(self.debounce_seconds) or self._stop.is_set():
+                        break
+                
+                with self._lock:
+                    pending, self._pending = sorted(self._pending), set()
+                    rescan, self._rescan = self._rescan, False
+                
+                try:
+                    stats = indexer.incremental_update() if rescan else indexer.update_files(pending)
+                except Exception as e:
+                    print(f"Error updating index: {e}")
+                    self._set_idle_if_drained()
+                    continue
+                
+                if any(stats.values()):
+                    self.last_update_stats = stats
+                    self.index_version = indexer.get_index_version()
+                    print(f"Index updated to version {self.index_version}: {stats}")
+                
+                self._set_idle_if_drained()
+        finally:
+            indexer.db_connection.close()
+            # Nothing more will be indexed, so do not leave waiters blocked
+            self._idle.set()
+
+# Process pool workers for build_full_index. Each worker keeps one
+# parse-only indexer so the ExtP path is not re-sent with every file.
+_worker_indexer: Optional[ExtPIndexer] = None
+
+def _init_parse_worker(extP_path: str):
+    global _worker_indexer
+    _worker_indexer = ExtPIndexer(extP_path, cache_path=None)
+
+def _parse_file_in_worker(file_path: Path):
+    return _worker_indexer._parse_file(file_path)
+
 # Usage example
 if __name__ == "__main__":
-    indexer = ExtPIndexer("C:/Path/To/ExtP")
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build and query the ExtP index")
+    parser.add_argument("extp_path", help="Root directory of the ExtP to index")
+    parser.add_argument("--db", default="extP_index.db", help="Index database path")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and reindex files as they change")
+    parser.add_argument("--poll", action="store_true",
+                        help="With --watch, poll the tree instead of using filesystem events")
+    args = parser.parse_args()
+    
+    if args.watch:
+        watcher = ExtPIndexWatcher(args.extp_path, args.db, use_polling=True if args.poll else None)
+        watcher.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            watcher.stop()
+        sys.exit(0)
+    
+    indexer = ExtPIndexer(args.extp_path, args.db)
     
     # Build initial index
     stats = indexer.build_full_index()
@@ -0,0 +1,196 @@
+"""
+Shared False Negative Rule Engine
+=================================
+
+Compiles the false negative patterns in false_negative_rules.json once and
+scans text incrementally, line by line, so ExtP output, execution logs and OCR
+deltas can be streamed through it as they arrive.
+
+Used by AdvancedTestExecutor, AutomatedRemediationSystem and
+EnhancedTestCaseGenerator so all three work from one rule set. Results of
+scan() are cached by text, so when the same output is handed to several of
+them it is only scanned once.
+
+Key Features:
+- Single JSON rule file (pattern, scope, severity, remediation metadata)
+- One combined prefilter regex per scope; per-rule matching only on hit lines
+- Streaming scanner with absolute match offsets and line numbers
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "false_negative_rules.json")
+
+@dataclass
+class FalseNegativeRule:
+    """A false negative detection rule loaded from the rule file"""
+    id: str
+    pattern: str
+    scope: str = "output"  # 'output' for program/OCR text, 'log' for execution logs
+    case_id: Optional[str] = None
+    context: str = ""
+    description: str = ""
+    severity: str = "medium"
+    auto_fix: bool = False
+    expected_response: str = ""
+    expected_behavior: str = ""
+    actual_behavior: str = ""
+    method: str = "pattern_matching"
+    confidence: float = 0.8
+    compiled: Any = field(default=None, repr=False, compare=False)
+
+@dataclass
+class RuleMatch:
+    """A rule match with its absolute offsets in the scanned stream"""
+    rule: FalseNegativeRule
+    text: str
+    start: int
+    end: int
+    line_number: int
+
+class RuleStream:
+    """
+    Incremental scanner: feed() text chunks (log lines, OCR deltas) and get back
+    matches for every complete line; close() scans any trailing partial line.
+    """
+
+    def __init__(self, engine: "FalseNegativeRuleEngine", scope: Optional[str] = None):
+        self.engine = engine
+        self.scope = scope
+        self._pending = ""
+        self._offset = 0
+        self._line_number = 1
+
+    def feed(self, chunk: str) -> List[RuleMatch]:
+        """Scan the complete lines in pending text plus chunk"""
+        if not chunk:
+            return []
+        text = self._pending + chunk
+        cut = text.rfind("\n") + 1
+        self._pending = text[cut:]
+        return self._scan_lines(text[:cut])
+
+    def feed_line(self, line: str) -> List[RuleMatch]:
+        """Scan one complete line (without its newline)"""
+        return self.feed(line + "\n")
+
+    def close(self) -> List[RuleMatch]:
+        """Scan whatever partial line is left"""
+        text, self._pending = self._pending, ""
+        return self._scan_lines(text)
+
+    def _scan_lines(self, text: str) -> List[RuleMatch]:
+        matches = []
+        prefilter, rules = self.engine._compiled_scope(self.scope)
+        position = 0
+        while position < len(text):
+            # Split on '\n' only: '.' in the patterns matches every other character
+            newline = text.find("\n", position)
+            line_end = len(text) if newline < 0 else newline + 1
+            line = text[position:line_end]
+            position = line_end
+            if prefilter is not None and prefilter.search(line):
+                for rule in rules:
+                    for match in rule.compiled.finditer(line):
+                        matches.append(RuleMatch(
+                            rule=rule,
+                            text=match.group(0),
+                            start=self._offset + match.start(),
+                            end=self._offset + match.end(),
+                            line_number=self._line_number
+                        ))
+            self._offset += len(line)
+            self._line_number += 1
+        return matches
+
+class FalseNegativeRuleEngine:
+    """
+    Compiled false negative rule set shared by the test and remediation tools
+    """
+
+    SCAN_CACHE_SIZE = 32
+
+    def __init__(self, rules_path: str = DEFAULT_RULES_PATH):
+        self.rules_path = rules_path
+        self.rules: List[FalseNegativeRule] = self._load_rules(rules_path)
+        self._scopes: Dict[Optional[str], Any] = {}
+        self._scan_cache: "OrderedDict[tuple, List[RuleMatch]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load_rules(self, rules_path: str) -> List[FalseNegativeRule]:
+        """Load and compile rules; patterns are case-insensitive, as before"""
+        try:
+            with open(rules_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Error loading false negative rules from {rules_path}: {e}")
+            return []
+
+        rules = []
+        known_fields = set(FalseNegativeRule.__dataclass_fields__) - {"compiled"}
+        for entry in data.get("rules", []):
+            rule = FalseNegativeRule(**{k: v for k, v in entry.items() if k in known_fields})
+            try:
+                rule.compiled = re.compile(rule.pattern, re.IGNORECASE)
+            except re.error as e:
+                print(f"⚠️  Skipping false negative rule {rule.id}: invalid pattern ({e})")
+                continue
+            rules.append(rule)
+        return rules
+
+    def rules_for(self, scope: Optional[str] = None) -> List[FalseNegativeRule]:
+        """Rules in a scope, or all rules when scope is None"""
+        return [rule for rule in self.rules if scope is None or rule.scope == scope]
+
+    def _compiled_scope(self, scope: Optional[str]):
+        """Combined prefilter regex and rule list for a scope, compiled once"""
+        compiled = self._scopes.get(scope)
+        if compiled is None:
+            rules = self.rules_for(scope)
+            prefilter = None
+            if rules:
+                prefilter = re.compile("|".join(f"(?:{rule.pattern})" for rule in rules), re.IGNORECASE)
+            compiled = (prefilter, rules)
+            self._scopes[scope] = compiled
+        return compiled
+
+    def stream(self, scope: Optional[str] = None) -> RuleStream:
+        """Start an incremental scan over a stream of text"""
+        return RuleStream(self, scope)
+
+    def scan(self, text: str, scope: Optional[str] = None) -> List[RuleMatch]:
+        """Scan a complete text; repeated scans of the same text reuse the result"""
+        key = (hashlib.sha1(text.encode('utf-8', 'replace')).hexdigest(), len(text), scope)
+        with self._lock:
+            if key in self._scan_cache:
+                self._scan_cache.move_to_end(key)
+                return list(self._scan_cache[key])
+
+        scanner = self.stream(scope)
+        matches = scanner.feed(text) + scanner.close()
+
+        with self._lock:
+            self._scan_cache[key] = matches
+            while len(self._scan_cache) > self.SCAN_CACHE_SIZE:
+                self._scan_cache.popitem(last=False)
+        return list(matches)
+
+_engines: Dict[str, FalseNegativeRuleEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_rule_engine(rules_path: str = DEFAULT_RULES_PATH) -> FalseNegativeRuleEngine:
+    """Shared engine for a rule file, so the rules are compiled once per process"""
+    path = os.path.abspath(rules_path)
+    with _engines_lock:
+        engine = _engines.get(path)
+        if engine is None:
+            engine = FalseNegativeRuleEngine(path)
+            _engines[path] = engine
+        return engine
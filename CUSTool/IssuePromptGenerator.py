@@ -9,28 +9,45 @@ Features:
 - Severity-based classification (Critical, Error, Warning, Info)
 - Comprehensive failure context collection
 - AI-optimized prompt format (Markdown + JSON metadata)
-- Screenshot capture with annotations
+- Screenshot capture with annotations (cropped, compressed, content-addressed)
 - Documentation traceability
 - External program directory integration
+- Defect fingerprinting so recurring failures fold into one issue
+- Optional background rendering queue so callers never block on report I/O
+- Indexed SQLite defect store alongside the markdown reports (see DefectStore.py)
+- Before/after and sequence evidence from a rolling, delta-encoded frame buffer
 """
 
 import os
+import re
 import json
 import time
+import zlib
+import queue
+import atexit
+import hashlib
+import threading
 import shutil
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 import uuid
+from collections import deque
 
 # Import for screenshot annotation (we'll add this capability)
 try:
-    from PIL import Image, ImageDraw, ImageFont
+    from PIL import Image, ImageChops, ImageDraw, ImageFont, features
     ANNOTATION_AVAILABLE = True
 except ImportError:
     ANNOTATION_AVAILABLE = False
 
+try:
+    from DefectStore import DefectStore, DEFAULT_DB_NAME
+    DEFECT_STORE_AVAILABLE = True
+except ImportError:
+    DEFECT_STORE_AVAILABLE = False
+
 class IssueSeverity(Enum):
     """Issue severity levels"""
     CRITICAL = "Critical"    # External program crashes, data corruption
@@ -93,6 +110,204 @@ class IssuePrompt:
     error_details: Dict[str, Any]
     system_context: Dict[str, Any]
     ai_assistance_request: str
+    fingerprint: str = ""
+    occurrence_count: int = 1
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+
+@dataclass
+class BufferedFrame:
+    """A frame in the rolling buffer: a full keyframe or a patch over the previous frame"""
+    timestamp: datetime
+    ocr_text: str
+    source_path: Optional[str]
+    size: Tuple[int, int]
+    mode: str
+    is_keyframe: bool
+    bbox: Optional[Tuple[int, int, int, int]]  # Changed region for patches, None if unchanged
+    data: bytes  # zlib-compressed raw pixels of the keyframe or patch
+
+class RollingFrameBuffer:
+    """
+    Keeps the last max_frames screen captures and their OCR text, delta-encoded.
+    
+    The oldest frame is always a keyframe; every later frame stores only the
+    rectangle that changed since the frame before it, so a mostly static console
+    costs little more than one compressed frame. When the oldest frame is evicted
+    the next one is rebased into a keyframe.
+    """
+    
+    def __init__(self, max_frames: int = 8, compression_level: int = 1):
+        self.max_frames = max(2, max_frames)
+        self.compression_level = compression_level
+        self._frames: deque = deque()
+        self._last_image = None
+        self._lock = threading.Lock()
+    
+    def _encode(self, image: Any) -> bytes:
+        return zlib.compress(image.tobytes(), self.compression_level)
+    
+    def _decode_keyframe(self, frame: BufferedFrame) -> Any:
+        return Image.frombytes(frame.mode, frame.size, zlib.decompress(frame.data))
+    
+    def _apply_patch(self, image: Any, frame: BufferedFrame) -> Any:
+        if frame.bbox is None:
+            return image
+        left, top, right, bottom = frame.bbox
+        patch = Image.frombytes(frame.mode, (right - left, bottom - top), zlib.decompress(frame.data))
+        image = image.copy()
+        image.paste(patch, (left, top))
+        return image
+    
+    def add(self, image: Any, ocr_text: str = "", source_path: str = None) -> None:
+        """Append a captured frame with the OCR text read from it"""
+        if image is None:
+            return
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        
+        with self._lock:
+            last = self._last_image
+            if last is None or last.size != image.size or last.mode != image.mode:
+                frame = BufferedFrame(datetime.now(), ocr_text or "", source_path, image.size,
+                                      image.mode, True, None, self._encode(image))
+            else:
+                bbox = ImageChops.difference(last, image).getbbox()
+                data = self._encode(image.crop(bbox)) if bbox else b""
+                frame = BufferedFrame(datetime.now(), ocr_text or "", source_path, image.size,
+                                      image.mode, False, bbox, data)
+            
+            self._frames.append(frame)
+            self._last_image = image
+            
+            while len(self._frames) > self.max_frames:
+                oldest = self._frames.popleft()
+                following = self._frames[0]
+                if not following.is_keyframe:
+                    rebased = self._apply_patch(self._decode_keyframe(oldest), following)
+                    following.is_keyframe = True
+                    following.bbox = None
+                    following.data = self._encode(rebased)
+    
+    def recent(self, count: Optional[int] = None) -> List[Tuple[BufferedFrame, Any]]:
+        """Decode the most recent frames (all if count is None), oldest first"""
+        with self._lock:
+            frames = list(self._frames)
+        
+        decoded = []
+        image = None
+        for frame in frames:
+            image = self._decode_keyframe(frame) if frame.is_keyframe else self._apply_patch(image, frame)
+            decoded.append((frame, image))
+        return decoded[-count:] if count else decoded
+    
+    def memory_usage(self) -> int:
+        """Compressed bytes held by the buffer"""
+        with self._lock:
+            return sum(len(frame.data) for frame in self._frames)
+    
+    def __len__(self) -> int:
+        return len(self._frames)
+
+class BackgroundRenderQueue:
+    """
+    Bounded work queue with a small worker pool for rendering defect reports.
+    
+    When the queue is full, submit() waits up to enqueue_timeout seconds and then
+    renders on the caller's thread, so reports are never dropped. Pending work
+    is flushed on close(), which is also registered to run at interpreter exit.
+    """
+    
+    def __init__(self, workers: int = 2, max_queue: int = 64, enqueue_timeout: float = 0.5):
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "inline_renders": 0,
+            "blocked_submits": 0,
+            "blocked_seconds": 0.0,
+            "max_depth": 0
+        }
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"IssueRender-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+        atexit.register(self.close)
+    
+    def submit(self, func, *args) -> None:
+        """Queue func(*args) for a worker, rendering inline if the queue stays full"""
+        if self._closed:
+            self._run(func, args)
+            return
+        
+        with self._lock:
+            self._stats["submitted"] += 1
+        try:
+            self._queue.put_nowait((func, args))
+        except queue.Full:
+            started = time.time()
+            try:
+                self._queue.put((func, args), timeout=self.enqueue_timeout)
+            except queue.Full:
+                with self._lock:
+                    self._stats["inline_renders"] += 1
+                self._run(func, args)
+            finally:
+                with self._lock:
+                    self._stats["blocked_submits"] += 1
+                    self._stats["blocked_seconds"] += time.time() - started
+        
+        with self._lock:
+            self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+    
+    def _run(self, func, args) -> None:
+        try:
+            func(*args)
+            with self._lock:
+                self._stats["completed"] += 1
+        except Exception as e:
+            print(f"Error rendering issue report: {e}")
+            with self._lock:
+                self._stats["failed"] += 1
+    
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            finally:
+                self._queue.task_done()
+    
+    def flush(self) -> None:
+        """Block until every queued render has finished"""
+        self._queue.join()
+    
+    def close(self) -> None:
+        """Flush pending renders and stop the workers"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        atexit.unregister(self.close)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Back-pressure metrics: counts, blocking time and queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        return stats
 
 class IssuePromptGenerator:
     """
@@ -105,13 +320,58 @@ class IssuePromptGenerator:
         self.defect_prompts_path = self._setup_defect_prompts_directory()
         self.current_test_run_id = self._generate_test_run_id()
         
+        # Defect deduplication state: fingerprint -> issue prompt, plus the
+        # markdown path and occurrence count at the last write
+        self.deduplicate = self.config.get("deduplicate_issues", True)
+        self.max_samples = self.config.get("max_issue_samples", 3)
+        self._issues_by_fingerprint: Dict[str, IssuePrompt] = {}
+        self._saved_issues: Dict[str, Tuple[str, int]] = {}
+        
+        # Per-issue write locks and the occurrence count each issue was last written with
+        self._issue_locks: Dict[str, threading.Lock] = {}
+        self._written_counts: Dict[str, int] = {}
+        
+        # Rolling buffer of recent frames for before/after and sequence evidence
+        self.frame_buffer: Optional[RollingFrameBuffer] = None
+        if ANNOTATION_AVAILABLE and (self.config.get("capture_before_after") or self.config.get("capture_sequence")):
+            self.frame_buffer = RollingFrameBuffer(
+                max_frames=max(2, self.config.get("sequence_length", 5))
+            )
+        
+        # Content-addressed evidence images already written or queued
+        self._evidence_lock = threading.Lock()
+        self._evidence_paths = set()
+        
+        # Indexed store of every issue written, next to the markdown reports
+        self.defect_store = None
+        if self.config.get("defect_store", True) and DEFECT_STORE_AVAILABLE:
+            try:
+                self.defect_store = DefectStore(os.path.join(self.defect_prompts_path, DEFAULT_DB_NAME))
+            except Exception as e:
+                print(f"Defect store unavailable: {e}")
+        
+        # Optional background rendering of reports and annotated screenshots
+        self.render_queue: Optional[BackgroundRenderQueue] = None
+        if self.config.get("background_rendering", False):
+            self.render_queue = BackgroundRenderQueue(
+                workers=self.config.get("render_workers", 2),
+                max_queue=self.config.get("render_queue_size", 64)
+            )
+        
     def _load_default_config(self) -> Dict:
         """Load default configuration"""
         return {
             "external_program_path": "",
             "capture_before_after": False,
             "capture_sequence": False,
+            "sequence_length": 5,
             "annotate_screenshots": True,
+            "deduplicate_issues": True,
+            "max_issue_samples": 3,
+            "background_rendering": False,
+            "render_workers": 2,
+            "render_queue_size": 64,
+            "defect_store": True,
             "severity_mapping": {
                 "external_crash": IssueSeverity.CRITICAL,
                 "external_error": IssueSeverity.ERROR,
@@ -123,7 +383,12 @@ class IssuePromptGenerator:
                 "save_original": True,
                 "save_annotated": True,
                 "annotation_color": "red",
-                "annotation_width": 3
+                "annotation_width": 3,
+                "crop_region": None,
+                "max_width": 1600,
+                "image_format": "png",
+                "palette_colors": 256,
+                "vector_annotations": True
             }
         }
     
@@ -197,6 +462,221 @@ class IssuePromptGenerator:
         
         return failure_type, severity
     
+    # Digits OCR commonly reads in place of letters, used inside words
+    OCR_DIGIT_LETTERS = str.maketrans({"0": "o", "1": "l", "5": "s", "8": "b"})
+    PROMPT_LINE = re.compile(r'[:?>]\s*$|\b(enter|select|choose|choice|option)\b', re.IGNORECASE)
+    
+    @classmethod
+    def _normalize_for_fingerprint(cls, text: Any, limit: int = 200) -> str:
+        """
+        Reduce text to the words that survive OCR noise and volatile values:
+        ids, addresses, counters, amounts and timestamps are dropped, digits
+        misread inside words are mapped back to letters, and only words of
+        three or more letters are kept
+        """
+        text = str(text or "").lower()
+        text = re.sub(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', ' ', text)
+        text = re.sub(r'\b0x[0-9a-f]+\b|\b[0-9a-f]{8,}\b', ' ', text)
+        text = re.sub(r'(?<=[a-z])[0158]+|[0158]+(?=[a-z])', lambda m: m.group(0).translate(cls.OCR_DIGIT_LETTERS), text)
+        return " ".join(re.findall(r'[a-z]{3,}', text))[:limit]
+    
+    def _screen_context(self, screen_text: Any) -> str:
+        """The menu/prompt line of a screen, which stays put while the rest of the screen changes"""
+        lines = [line.strip() for line in str(screen_text or "").splitlines() if line.strip()]
+        prompts = [line for line in lines if self.PROMPT_LINE.search(line)]
+        return self._normalize_for_fingerprint(prompts[-1] if prompts else (lines[0] if lines else ""), limit=80)
+    
+    def compute_fingerprint(self,
+                            failure_type: FailureType,
+                            error_context: Dict,
+                            test_case_context: TestCaseContext) -> str:
+        """
+        Fingerprint a failure from its stable fields: failure and error type,
+        test case, expected vs. actual behaviour, error message, trigger/action
+        and the menu context. The menu context is the expected text or trigger
+        when there is one, otherwise the screen's prompt line; the rest of the
+        OCR screen text is left out, as it carries timestamps, counters and
+        OCR noise. Run-specific values such as test_sequence_id are ignored.
+        """
+        screen_state = (error_context.get("screen_content")
+                        or error_context.get("screen_before")
+                        or error_context.get("current_screen")
+                        or error_context.get("ocr_text")
+                        or "")
+        # Trigger, action and expected text come from CUS's own configuration, not OCR
+        def exact(value: Any) -> str:
+            return " ".join(str(value or "").lower().split())
+        
+        menu_context = (exact(error_context.get("expected_text"))
+                        or exact(error_context.get("trigger"))
+                        or self._screen_context(screen_state))
+        components = [
+            failure_type.value,
+            str(error_context.get("error_type", "")),
+            test_case_context.test_case_name,
+            self._normalize_for_fingerprint(test_case_context.expected_behavior),
+            self._normalize_for_fingerprint(test_case_context.actual_behavior),
+            self._normalize_for_fingerprint(error_context.get("error_message", "")),
+            exact(error_context.get("action")),
+            menu_context,
+        ]
+        digest = hashlib.sha256("\x1f".join(components).encode("utf-8")).hexdigest()
+        return digest[:16]
+    
+    def _make_sample(self, timestamp: datetime, test_case_context: TestCaseContext, error_context: Dict) -> Dict[str, Any]:
+        """Small representative record of a single occurrence"""
+        return {
+            "timestamp": timestamp.isoformat(),
+            "test_sequence_id": test_case_context.test_sequence_id,
+            "error_message": str(error_context.get("error_message", ""))[:300],
+            "screenshot_path": error_context.get("screenshot_path", "")
+        }
+    
+    def _record_occurrence(self, issue_prompt: IssuePrompt, test_case_context: TestCaseContext, error_context: Dict) -> IssuePrompt:
+        """Fold a repeat of a known defect into its existing issue"""
+        timestamp = datetime.now()
+        issue_prompt.occurrence_count += 1
+        issue_prompt.last_seen = timestamp
+        if len(issue_prompt.samples) < self.max_samples:
+            issue_prompt.samples.append(self._make_sample(timestamp, test_case_context, error_context))
+        return issue_prompt
+    
+    def get_defect_summary(self) -> List[Dict[str, Any]]:
+        """Distinct defects seen in this test run with their occurrence counts"""
+        return [
+            {
+                "fingerprint": fingerprint,
+                "issue_id": prompt.issue_id,
+                "failure_type": prompt.failure_type.value,
+                "severity": prompt.severity.value,
+                "occurrences": prompt.occurrence_count,
+                "first_seen": prompt.first_seen.isoformat() if prompt.first_seen else None,
+                "last_seen": prompt.last_seen.isoformat() if prompt.last_seen else None
+            }
+            for fingerprint, prompt in self._issues_by_fingerprint.items()
+        ]
+    
+    def _evidence_settings(self) -> Dict[str, Any]:
+        """Screenshot settings with defaults for the evidence-image pipeline"""
+        settings = {
+            "annotation_color": "red",
+            "annotation_width": 3,
+            "crop_region": None,          # (left, top, right, bottom) of the console, as for ImageGrab bbox
+            "max_width": 1600,            # Downscale wider images to this width
+            "image_format": "png",        # 'png' (palette-reduced) or 'webp' (lossless)
+            "palette_colors": 256,        # 0 keeps full colour PNGs
+            "vector_annotations": True    # Store annotations as overlay metadata, not a second bitmap
+        }
+        settings.update(self.config.get("screenshot_settings", {}))
+        return settings
+    
+    def _prepare_evidence_image(self, image: Any, crop: bool = True) -> Tuple[Any, Tuple[int, int, float]]:
+        """
+        Crop to the console region and downscale for storage.
+        Returns the image and the (left, top, scale) transform applied to it.
+        """
+        settings = self._evidence_settings()
+        left = top = 0
+        crop_region = settings.get("crop_region")
+        if crop and crop_region:
+            left, top = crop_region[0], crop_region[1]
+            image = image.crop(tuple(crop_region))
+        
+        scale = 1.0
+        max_width = settings.get("max_width")
+        if max_width and image.width > max_width:
+            scale = max_width / image.width
+            image = image.resize((max_width, max(1, round(image.height * scale))), Image.LANCZOS)
+        
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return image, (left, top, scale)
+    
+    def _store_evidence_image(self, image: Any, crop: bool = True) -> Tuple[str, Any, Tuple[int, int, float]]:
+        """
+        Store an evidence image under its content hash so identical frames are
+        written once. Encoding is queued when background rendering is enabled.
+        Returns the file path, the prepared image and its transform.
+        """
+        image, transform = self._prepare_evidence_image(image, crop)
+        settings = self._evidence_settings()
+        
+        image_format = settings.get("image_format", "png").lower()
+        if image_format == "webp" and not (ANNOTATION_AVAILABLE and features.check("webp")):
+            image_format = "png"
+        
+        digest = hashlib.sha256(f"{image.mode}{image.size}".encode("utf-8") + image.tobytes()).hexdigest()
+        file_path = os.path.join(self.defect_prompts_path, "screenshots", f"{digest[:24]}.{image_format}")
+        
+        with self._evidence_lock:
+            is_new = file_path not in self._evidence_paths and not os.path.exists(file_path)
+            self._evidence_paths.add(file_path)
+        if is_new:
+            if self.render_queue:
+                self.render_queue.submit(self._encode_evidence_image, image, file_path, image_format)
+            else:
+                self._encode_evidence_image(image, file_path, image_format)
+        return file_path, image, transform
+    
+    def _encode_evidence_image(self, image: Any, file_path: str, image_format: str) -> None:
+        """Write an evidence image as lossless WebP or palette-reduced PNG"""
+        if image_format == "webp":
+            image.save(file_path, "WEBP", lossless=True)
+            return
+        
+        colors = self._evidence_settings().get("palette_colors")
+        if colors:
+            image = image.quantize(colors=colors)
+        image.save(file_path, "PNG", optimize=True)
+    
+    def record_frame(self, image: Any, ocr_text: str = "", source_path: str = None) -> None:
+        """
+        Add a frame CUS captured (and the OCR text read from it) to the rolling
+        buffer. Does nothing unless capture_before_after or capture_sequence is on.
+        """
+        if self.frame_buffer is not None:
+            try:
+                self.frame_buffer.add(image, ocr_text, source_path)
+            except Exception as e:
+                print(f"Error buffering frame: {e}")
+    
+    def _buffered_screenshots(self, issue_id: str, exclude_paths: List[str]) -> List[ScreenshotInfo]:
+        """
+        Evidence from the frame buffer: the last two frames as before/after and/or
+        the last sequence_length frames leading up to the failure
+        """
+        if self.frame_buffer is None or not len(self.frame_buffer):
+            return []
+        
+        if self.config.get("capture_sequence"):
+            count = self.config.get("sequence_length", 5)
+        else:
+            count = 2
+        frames = self.frame_buffer.recent(count)
+        
+        if self.config.get("capture_sequence"):
+            types = ['sequence'] * len(frames)
+        else:
+            types = ['before', 'after'][-len(frames):]
+        
+        screenshots = []
+        for index, ((frame, image), screenshot_type) in enumerate(zip(frames, types), 1):
+            if frame.source_path and frame.source_path in exclude_paths:
+                continue
+            file_path, _, _ = self._store_evidence_image(image, crop=False)
+            if file_path in exclude_paths:
+                continue
+            ocr_excerpt = " ".join(frame.ocr_text.split())[:120]
+            screenshots.append(ScreenshotInfo(
+                screenshot_id=f"{issue_id}_{screenshot_type}_{index}",
+                file_path=file_path,
+                timestamp=frame.timestamp,
+                screenshot_type=screenshot_type,
+                description=f"Buffered frame {index}/{len(frames)} at {frame.timestamp.strftime('%H:%M:%S')}"
+                            + (f" - OCR: {ocr_excerpt}" if ocr_excerpt else "")
+            ))
+        return screenshots
+    
     def capture_failure_screenshot(self, issue_id: str, annotation_data: Dict = None) -> ScreenshotInfo:
         """
         Capture screenshot of failure with optional annotations
@@ -211,11 +691,9 @@ class IssuePromptGenerator:
             # Generate screenshot info
             timestamp = datetime.now()
             screenshot_id = f"{issue_id}_failure_{int(timestamp.timestamp())}"
-            filename = f"{screenshot_id}.png"
-            file_path = os.path.join(self.defect_prompts_path, "screenshots", filename)
             
-            # Save original
-            screenshot.save(file_path)
+            # Save cropped, compressed, content-addressed copy
+            file_path, screenshot, transform = self._store_evidence_image(screenshot)
             
             screenshot_info = ScreenshotInfo(
                 screenshot_id=screenshot_id,
@@ -228,7 +706,7 @@ class IssuePromptGenerator:
             # Create annotated version if requested and data available
             if self.config["screenshot_settings"]["save_annotated"] and annotation_data:
                 annotated_info = self._create_annotated_screenshot(
-                    screenshot, screenshot_info, annotation_data
+                    screenshot, screenshot_info, annotation_data, transform
                 )
                 return annotated_info
             
@@ -245,87 +723,214 @@ class IssuePromptGenerator:
                 description=f"Screenshot capture failed: {e}"
             )
     
-    def _create_annotated_screenshot(self, screenshot: Image, base_info: ScreenshotInfo, annotation_data: Dict) -> ScreenshotInfo:
+    def screenshot_from_frame(self,
+                              issue_id: str,
+                              frame: Any = None,
+                              frame_path: str = None,
+                              annotation_data: Dict = None) -> ScreenshotInfo:
         """
-        Create annotated version of screenshot highlighting expected vs actual areas
+        Use a frame CUS already captured as the failure screenshot instead of
+        grabbing the screen again. The frame (in memory, or loaded from
+        frame_path) is downscaled, compressed and stored once by content hash;
+        it is cropped to crop_region only when it is a full-screen capture,
+        since CUS frames taken with SCREEN_REGION are already limited to it.
         """
-        if not ANNOTATION_AVAILABLE:
-            return base_info
-        
         try:
-            # Create copy for annotation
-            annotated = screenshot.copy()
-            draw = ImageDraw.Draw(annotated)
-            
-            # Annotation settings
-            color = self.config["screenshot_settings"]["annotation_color"]
-            width = self.config["screenshot_settings"]["annotation_width"]
-            
-            # Add annotations based on data
-            annotations = []
+            if frame is None and frame_path and os.path.exists(frame_path):
+                timestamp = datetime.fromtimestamp(os.path.getmtime(frame_path))
+                if not ANNOTATION_AVAILABLE:
+                    # Without PIL the saved frame can only be referenced as it is
+                    return ScreenshotInfo(
+                        screenshot_id=f"{issue_id}_failure_{int(timestamp.timestamp())}",
+                        file_path=frame_path,
+                        timestamp=timestamp,
+                        screenshot_type='failure',
+                        description="Frame captured by CUS at time of test failure"
+                    )
+                with Image.open(frame_path) as saved_frame:
+                    frame = saved_frame.copy()
+            elif frame is not None:
+                timestamp = datetime.now()
+            else:
+                return self.capture_failure_screenshot(issue_id, annotation_data)
             
-            if "expected_area" in annotation_data:
-                area = annotation_data["expected_area"]
-                draw.rectangle(area, outline=color, width=width)
-                draw.text((area[0], area[1] - 20), "EXPECTED", fill=color)
-                annotations.append({"type": "expected", "area": area})
+            screenshot_id = f"{issue_id}_failure_{int(timestamp.timestamp())}"
+            file_path, frame, transform = self._store_evidence_image(frame, crop=self._is_full_screen_frame(frame))
             
-            if "actual_area" in annotation_data:
-                area = annotation_data["actual_area"]
-                draw.rectangle(area, outline="blue", width=width)
-                draw.text((area[0], area[1] - 20), "ACTUAL", fill="blue")
-                annotations.append({"type": "actual", "area": area})
+            screenshot_info = ScreenshotInfo(
+                screenshot_id=screenshot_id,
+                file_path=file_path,
+                timestamp=timestamp,
+                screenshot_type='failure',
+                description="Frame captured by CUS at time of test failure"
+            )
             
-            if "error_location" in annotation_data:
-                area = annotation_data["error_location"]
-                draw.rectangle(area, outline="red", width=width)
-                draw.text((area[0], area[1] - 20), "ERROR", fill="red")
-                annotations.append({"type": "error", "area": area})
+            if self.config["screenshot_settings"]["save_annotated"] and annotation_data and ANNOTATION_AVAILABLE:
+                return self._create_annotated_screenshot(frame, screenshot_info, annotation_data, transform)
             
-            # Save annotated version
-            annotated_filename = f"{base_info.screenshot_id}_annotated.png"
-            annotated_path = os.path.join(self.defect_prompts_path, "screenshots", annotated_filename)
-            annotated.save(annotated_path)
+            return screenshot_info
             
-            # Create annotated screenshot info
-            annotated_info = ScreenshotInfo(
+        except Exception as e:
+            print(f"Error using captured frame: {e}")
+            return ScreenshotInfo(
+                screenshot_id=f"{issue_id}_failure_unavailable",
+                file_path=frame_path or "screenshot_unavailable",
+                timestamp=datetime.now(),
+                screenshot_type='failure',
+                description=f"Captured frame unavailable: {e}"
+            )
+    
+    def _is_full_screen_frame(self, frame: Any) -> bool:
+        """Whether a CUS frame still contains the whole crop_region, rather than being a region capture"""
+        crop_region = self._evidence_settings().get("crop_region")
+        if not crop_region:
+            return False
+        left, top, right, bottom = crop_region
+        return frame.size != (right - left, bottom - top) and frame.width >= right and frame.height >= bottom
+    
+    def _create_annotated_screenshot(self,
+                                     screenshot: Any,
+                                     base_info: ScreenshotInfo,
+                                     annotation_data: Dict,
+                                     transform: Tuple[int, int, float] = (0, 0, 1.0)) -> ScreenshotInfo:
+        """
+        Create annotated version of screenshot highlighting expected vs actual areas.
+        
+        By default annotations are vector overlay metadata on the stored image
+        (areas mapped through the crop/scale transform). With vector_annotations
+        disabled a second bitmap is drawn; screenshot may then be a PIL image or
+        the path of a saved frame, and with background rendering the drawing is
+        queued and the annotated info is returned at once.
+        """
+        if not ANNOTATION_AVAILABLE:
+            return base_info
+        
+        settings = self._evidence_settings()
+        colors = {
+            "expected": settings["annotation_color"],
+            "actual": "blue",
+            "error": "red"
+        }
+        left, top, scale = transform
+        
+        # Add annotations based on data
+        annotations = []
+        for key, annotation_type in (("expected_area", "expected"),
+                                     ("actual_area", "actual"),
+                                     ("error_location", "error")):
+            if key in annotation_data:
+                x1, y1, x2, y2 = annotation_data[key]
+                area = [round((x1 - left) * scale), round((y1 - top) * scale),
+                        round((x2 - left) * scale), round((y2 - top) * scale)]
+                annotations.append({
+                    "type": annotation_type,
+                    "area": area,
+                    "label": annotation_type.upper(),
+                    "color": colors[annotation_type],
+                    "width": settings["annotation_width"]
+                })
+        
+        if settings.get("vector_annotations", True):
+            return ScreenshotInfo(
                 screenshot_id=f"{base_info.screenshot_id}_annotated",
-                file_path=annotated_path,
+                file_path=base_info.file_path,
                 timestamp=base_info.timestamp,
                 screenshot_type='annotated',
-                description="Annotated screenshot highlighting expected vs actual areas",
+                description="Screenshot with vector annotation overlay highlighting expected vs actual areas",
                 annotations=annotations
             )
-            
+        
+        annotated_filename = f"{base_info.screenshot_id}_annotated.png"
+        annotated_info = ScreenshotInfo(
+            screenshot_id=f"{base_info.screenshot_id}_annotated",
+            file_path=os.path.join(self.defect_prompts_path, "screenshots", annotated_filename),
+            timestamp=base_info.timestamp,
+            screenshot_type='annotated',
+            description="Annotated screenshot highlighting expected vs actual areas",
+            annotations=annotations
+        )
+        
+        if self.render_queue:
+            self.render_queue.submit(self._draw_annotations, screenshot, annotated_info)
+            return annotated_info
+        
+        try:
+            self._draw_annotations(screenshot, annotated_info)
             return annotated_info
-            
         except Exception as e:
             print(f"Error creating annotated screenshot: {e}")
             return base_info
     
+    def _draw_annotations(self, screenshot: Any, annotated_info: ScreenshotInfo) -> None:
+        """Draw the annotation rectangles onto a copy of the screenshot and save it"""
+        if isinstance(screenshot, str):
+            screenshot = Image.open(screenshot)
+        
+        # Create copy for annotation
+        annotated = screenshot.copy()
+        draw = ImageDraw.Draw(annotated)
+        
+        for annotation in annotated_info.annotations:
+            area = annotation["area"]
+            draw.rectangle(area, outline=annotation["color"], width=annotation["width"])
+            draw.text((area[0], area[1] - 20), annotation["label"], fill=annotation["color"])
+        
+        # Save annotated version
+        annotated.save(annotated_info.file_path)
+    
     def generate_issue_prompt(self, 
                             test_case_context: TestCaseContext,
                             error_context: Dict,
                             screenshots: List[ScreenshotInfo] = None,
-                            system_context: Dict = None) -> IssuePrompt:
+                            system_context: Dict = None,
+                            frame: Any = None,
+                            frame_path: str = None) -> IssuePrompt:
         """
-        Generate comprehensive issue prompt for AI assistance
+        Generate comprehensive issue prompt for AI assistance.
+        
+        When no screenshots are given, the frame CUS captured for this failure
+        (frame image, frame_path or error_context["screenshot_path"]) is used
+        as evidence; the screen is only grabbed again if none is available.
+        
+        A failure whose fingerprint matches an earlier issue in this run returns
+        that issue with its occurrence counter bumped; no new screenshot is taken.
         """
+        # Determine failure type and severity
+        failure_type, severity = self.detect_failure_type_and_severity(error_context)
+        
+        fingerprint = self.compute_fingerprint(failure_type, error_context, test_case_context)
+        if self.deduplicate and fingerprint in self._issues_by_fingerprint:
+            return self._record_occurrence(
+                self._issues_by_fingerprint[fingerprint], test_case_context, error_context
+            )
+        
         # Generate unique identifiers
         issue_id = self._generate_issue_id()
         timestamp = datetime.now()
         
-        # Determine failure type and severity
-        failure_type, severity = self.detect_failure_type_and_severity(error_context)
-        
-        # Capture screenshot if not provided
+        # Reuse the captured frame, or capture a screenshot if none was provided
         if not screenshots:
-            screenshot_info = self.capture_failure_screenshot(
-                issue_id, 
-                error_context.get("annotation_data")
-            )
+            frame_path = frame_path or error_context.get("screenshot_path")
+            if frame is not None or (frame_path and os.path.exists(frame_path)):
+                screenshot_info = self.screenshot_from_frame(
+                    issue_id,
+                    frame=frame,
+                    frame_path=frame_path,
+                    annotation_data=error_context.get("annotation_data")
+                )
+            else:
+                screenshot_info = self.capture_failure_screenshot(
+                    issue_id, 
+                    error_context.get("annotation_data")
+                )
             screenshots = [screenshot_info]
         
+        # Attach before/after or sequence frames already in the buffer
+        if self.frame_buffer is not None:
+            screenshots = list(screenshots) + self._buffered_screenshots(
+                issue_id, [s.file_path for s in screenshots]
+            )
+        
         # Create AI assistance request
         ai_request = self._generate_ai_assistance_request(
             test_case_context, error_context, failure_type, severity
@@ -342,9 +947,16 @@ class IssuePromptGenerator:
             screenshots=screenshots,
             error_details=error_context,
             system_context=system_context or {},
-            ai_assistance_request=ai_request
+            ai_assistance_request=ai_request,
+            fingerprint=fingerprint,
+            first_seen=timestamp,
+            last_seen=timestamp,
+            samples=[self._make_sample(timestamp, test_case_context, error_context)]
         )
         
+        if self.deduplicate:
+            self._issues_by_fingerprint[fingerprint] = issue_prompt
+        
         return issue_prompt
     
     def _generate_ai_assistance_request(self, 
@@ -386,9 +998,46 @@ class IssuePromptGenerator:
     
     def save_issue_prompt(self, issue_prompt: IssuePrompt) -> str:
         """
-        Save issue prompt to markdown file with JSON metadata
+        Save issue prompt to markdown file with JSON metadata.
+        
+        Repeats of an already saved defect only rewrite its files when the
+        occurrence count reaches a power of two; flush_occurrences() writes
+        the final counts. With background rendering a snapshot of the issue is
+        queued and the markdown path is returned without waiting for the write.
         """
+        saved = self._saved_issues.get(issue_prompt.issue_id)
+        if saved:
+            saved_path, saved_count = saved
+            count = issue_prompt.occurrence_count
+            if count == saved_count or count & (count - 1):
+                return saved_path
+        
+        markdown_path = os.path.join(self.defect_prompts_path, f"{issue_prompt.issue_id}.md")
+        
+        if self.render_queue:
+            # Snapshot so later occurrences do not mutate the issue mid-render
+            snapshot = replace(issue_prompt, samples=list(issue_prompt.samples))
+            self._saved_issues[issue_prompt.issue_id] = (markdown_path, issue_prompt.occurrence_count)
+            self.render_queue.submit(self._write_issue_files, snapshot, markdown_path, bool(saved))
+            return markdown_path
+        
         try:
+            self._write_issue_files(issue_prompt, markdown_path, bool(saved))
+            self._saved_issues[issue_prompt.issue_id] = (markdown_path, issue_prompt.occurrence_count)
+            return markdown_path
+            
+        except Exception as e:
+            print(f"Error saving issue prompt: {e}")
+            return ""
+    
+    def _write_issue_files(self, issue_prompt: IssuePrompt, markdown_path: str, is_update: bool = False) -> None:
+        """Render and write the markdown prompt and JSON metadata for an issue"""
+        lock = self._issue_locks.setdefault(issue_prompt.issue_id, threading.Lock())
+        with lock:
+            # A newer occurrence count may already have been written by another worker
+            if issue_prompt.occurrence_count < self._written_counts.get(issue_prompt.issue_id, 0):
+                return
+            
             # Create markdown content
             markdown_content = self._create_markdown_prompt(issue_prompt)
             
@@ -396,9 +1045,6 @@ class IssuePromptGenerator:
             json_metadata = self._create_json_metadata(issue_prompt)
             
             # Save markdown file
-            markdown_filename = f"{issue_prompt.issue_id}.md"
-            markdown_path = os.path.join(self.defect_prompts_path, markdown_filename)
-            
             with open(markdown_path, 'w', encoding='utf-8') as f:
                 f.write(markdown_content)
             
@@ -409,14 +1055,52 @@ class IssuePromptGenerator:
             with open(json_path, 'w', encoding='utf-8') as f:
                 json.dump(json_metadata, f, indent=2, default=str)
             
+            if self.defect_store:
+                self.defect_store.upsert_issue(json_metadata, markdown_path)
+            
+            self._written_counts[issue_prompt.issue_id] = issue_prompt.occurrence_count
+        
+        if is_update:
+            print(f"Issue prompt updated: {markdown_path} ({issue_prompt.occurrence_count} occurrences)")
+        else:
             print(f"Issue prompt saved: {markdown_path}")
             print(f"Metadata saved: {json_path}")
-            
-            return markdown_path
-            
-        except Exception as e:
-            print(f"Error saving issue prompt: {e}")
-            return ""
+    
+    def flush_occurrences(self) -> int:
+        """
+        Rewrite saved issues whose occurrence count changed since their last write.
+        Returns the number of issues rewritten.
+        """
+        flushed = 0
+        for issue_prompt in self._issues_by_fingerprint.values():
+            saved = self._saved_issues.get(issue_prompt.issue_id)
+            if not saved or saved[1] == issue_prompt.occurrence_count:
+                continue
+            # Forget the last write so save_issue_prompt does not skip it
+            del self._saved_issues[issue_prompt.issue_id]
+            if self.save_issue_prompt(issue_prompt):
+                flushed += 1
+        return flushed
+    
+    def close(self) -> Dict[str, Any]:
+        """
+        Write final occurrence counts and wait for queued renders to finish.
+        Returns the render queue metrics (empty without background rendering).
+        """
+        flushed = self.flush_occurrences()
+        if flushed:
+            print(f"Updated occurrence counts for {flushed} recurring defect(s)")
+        stats = {}
+        if self.render_queue:
+            self.render_queue.close()
+            stats = self.render_queue.stats()
+            print(f"Issue render queue: {stats['completed']} rendered, {stats['failed']} failed, "
+                  f"{stats['blocked_submits']} blocked submits ({stats['blocked_seconds']:.2f}s), "
+                  f"max depth {stats['max_depth']}")
+        if self.defect_store:
+            self.defect_store.close()
+            self.defect_store = None
+        return stats
     
     def _create_markdown_prompt(self, issue_prompt: IssuePrompt) -> str:
         """
@@ -427,11 +1111,12 @@ class IssuePromptGenerator:
             f"",
             f"## Issue Identification",
             f"- **Error ID**: {issue_prompt.issue_id}",
-            f"- **Timestamp**: {issue_prompt.timestamp.strftime('%Y-%m-%d %H:%M:%S UTC')}",
+            f"- **Timestamp**: {issue_prompt.timestamp.strftime('%Y-%m-%d %H:%M:%S')}",
             f"- **Test Run ID**: {issue_prompt.test_run_id}",
             f"- **Severity**: {issue_prompt.severity.value}",
             f"- **Failure Type**: {issue_prompt.failure_type.value.replace('_', ' ')}",
             f"- **Test Case**: {issue_prompt.test_case_context.test_case_name}",
+            f"- **Fingerprint**: {issue_prompt.fingerprint}",
             f"",
             f"## Failure Summary",
             f"**Expected**: {issue_prompt.test_case_context.expected_behavior}",
@@ -448,6 +1133,20 @@ class IssuePromptGenerator:
             else:
                 content_parts.append(f"{i}. {step}")
         
+        # Add occurrence history for recurring defects
+        if issue_prompt.occurrence_count > 1:
+            content_parts.extend([
+                f"",
+                f"## Occurrences",
+                f"- **Count**: {issue_prompt.occurrence_count}",
+                f"- **First Seen**: {issue_prompt.first_seen.strftime('%Y-%m-%d %H:%M:%S')}",
+                f"- **Last Seen**: {issue_prompt.last_seen.strftime('%Y-%m-%d %H:%M:%S')}",
+                f"",
+                f"### Representative Samples"
+            ])
+            for sample in issue_prompt.samples:
+                content_parts.append(f"- {sample['timestamp']} ({sample['test_sequence_id']}): {sample['error_message']}")
+        
         # Add visual evidence
         content_parts.extend([
             f"",
@@ -460,6 +1159,8 @@ class IssuePromptGenerator:
                 f"  - ID: {screenshot.screenshot_id}",
                 f"  - Description: {screenshot.description}"
             ])
+            for annotation in screenshot.annotations:
+                content_parts.append(f"  - Overlay: {annotation['label']} ({annotation['color']}) at {annotation['area']}")
         
         # Add documentation references
         if issue_prompt.test_case_context.documentation_refs:
@@ -531,12 +1232,20 @@ class IssuePromptGenerator:
             "test_case_name": issue_prompt.test_case_context.test_case_name,
             "test_sequence_id": issue_prompt.test_case_context.test_sequence_id,
             "failure_step": issue_prompt.test_case_context.failure_step,
+            "fingerprint": issue_prompt.fingerprint,
+            "occurrences": {
+                "count": issue_prompt.occurrence_count,
+                "first_seen": issue_prompt.first_seen.isoformat() if issue_prompt.first_seen else None,
+                "last_seen": issue_prompt.last_seen.isoformat() if issue_prompt.last_seen else None,
+                "samples": issue_prompt.samples
+            },
             "screenshots": [
                 {
                     "screenshot_id": s.screenshot_id,
                     "file_path": s.file_path,
                     "type": s.screenshot_type,
-                    "description": s.description
+                    "description": s.description,
+                    "annotations": s.annotations
                 } for s in issue_prompt.screenshots
             ],
             "documentation_references": [
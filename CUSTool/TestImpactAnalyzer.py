@@ -0,0 +1,374 @@
+"""
+Test Impact Analysis for CUS/ExtP Test Suites
+=============================================
+
+Selects the test cases affected by a change to ExtP instead of re-running the
+whole suite. A change set (a git diff of the ExtP tree, or the ExtP index's
+change log) is mapped to indexed items, expanded through the index's
+relationship graph to everything that depends on them, traced to the
+requirements those items implement, and finally to the test cases anchored on
+those requirements.
+
+Key Features:
+- Change sets from `git diff` or from ExtPIndexer.get_changes()
+- Reverse relationship expansion (callers, importers, affected menus/prompts)
+- Requirement tracing by requirement ID references and description keywords
+- Prerequisite tests (referenced in preconditions) are always pulled in
+- Conservative fallback to a full run when a change cannot be traced,
+  including changes to files the index does not cover
+- Suite definition changes detected against hashes recorded after the last run
+- Full runs stay available with --full
+"""
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Iterable
+
+from EnhancedTestCaseGenerator import EnhancedTestCaseGenerator, TestCase
+from ExtP_Indexer import ExtPIndexer, IndexedItem
+from FalseNegativeRules import DEFAULT_RULES_PATH
+
+# Words in requirement descriptions that say nothing about which code is meant
+REQUIREMENT_STOPWORDS = {
+    "cus", "extp", "shall", "should", "must", "will", "when", "the", "and", "for",
+    "between", "with", "that", "this", "from", "into", "is", "are", "be", "an", "a",
+    "of", "to", "in", "on", "or", "correctly", "accurate", "accurately", "provide"
+}
+
+@dataclass
+class ImpactSelection:
+    """Result of an impact analysis: which tests to run and why"""
+    test_ids: List[str]
+    full_run: bool = False
+    reasons: List[str] = field(default_factory=list)
+    changed_files: List[str] = field(default_factory=list)
+    changed_items: List[str] = field(default_factory=list)
+    impacted_items: int = 0
+    requirements: Dict[str, List[str]] = field(default_factory=dict)  # requirement id -> evidence
+    unmapped_changes: List[str] = field(default_factory=list)
+
+class TestImpactAnalyzer:
+    """
+    Maps ExtP changes through code relationships and requirements to test cases
+    """
+
+    QUOTED_TEXT = re.compile(r"'([^']{4,})'")
+    TEST_ID_REFERENCE = re.compile(r"\bTC-[A-Z]+-[\w-]+\b")
+
+    def __init__(self, generator: EnhancedTestCaseGenerator, indexer: ExtPIndexer,
+                 min_keyword_overlap: int = 2, conservative: bool = True,
+                 max_depth: Optional[int] = None):
+        self.generator = generator
+        self.indexer = indexer
+        self.min_keyword_overlap = min_keyword_overlap
+        self.conservative = conservative  # Fall back to a full run for changes that cannot be traced
+        self.max_depth = max_depth
+
+        # Files that define the suite itself; changing them invalidates every selection.
+        # They live outside the ExtP repository, so they are compared by content hash
+        # against the state recorded after the last run rather than by git revision.
+        self.suite_files = [
+            os.path.abspath(generator.requirements_file),
+            os.path.abspath(os.path.join(generator.output_dir, "test_cases.json")),
+            DEFAULT_RULES_PATH
+        ]
+        self.suite_state_file = os.path.join(generator.output_dir, "impact_suite_state.json")
+
+    def changed_files_from_git(self, base: str = "HEAD") -> List[str]:
+        """
+        Files under the ExtP root that differ from base (paths relative to the
+        ExtP root), including untracked files
+        """
+        extp_root = str(self.indexer.extP_path)
+        diff = self._git(["-C", extp_root, "diff", "--name-only", "--relative", base])
+        untracked = self._git(["-C", extp_root, "ls-files", "--others", "--exclude-standard"])
+        return list(dict.fromkeys(diff + untracked))
+
+    def suite_changes(self) -> List[str]:
+        """
+        Suite definition files (requirements, test cases, rules) whose content
+        differs from the state recorded by record_suite_state. Without a
+        recorded state every suite file counts as changed.
+
+        Raises OSError/ValueError if the files or the recorded state cannot be read.
+        """
+        if not os.path.exists(self.suite_state_file):
+            return list(self.suite_files)
+        with open(self.suite_state_file, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+        current = self._suite_hashes()
+        return [path for path in self.suite_files if recorded.get(path) != current[path]]
+
+    def record_suite_state(self):
+        """Remember the suite files' content hashes, after the suite has been run"""
+        with open(self.suite_state_file, 'w', encoding='utf-8') as f:
+            json.dump(self._suite_hashes(), f, indent=2)
+
+    def _suite_hashes(self) -> Dict[str, Optional[str]]:
+        """SHA-256 of each suite file, None for files that do not exist"""
+        hashes = {}
+        for path in self.suite_files:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    hashes[path] = hashlib.sha256(f.read()).hexdigest()
+            else:
+                hashes[path] = None
+        return hashes
+
+    def _git(self, args: List[str]) -> List[str]:
+        result = subprocess.run(["git"] + args, capture_output=True, text=True, check=True)
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+    def select_for_git_diff(self, base: str = "HEAD") -> ImpactSelection:
+        """Select tests for the working tree's changes relative to a git revision"""
+        try:
+            changed_files = self.changed_files_from_git(base)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            return self._full_selection([f"git diff against {base} failed: {e}"])
+        try:
+            suite_changes = self.suite_changes()
+        except (OSError, ValueError) as e:
+            return self._full_selection([f"could not check the suite definition files: {e}"])
+
+        if suite_changes:
+            return self._full_selection([f"suite definition changed: {', '.join(suite_changes)}"])
+        return self.select_for_files(changed_files)
+
+    def select_for_files(self, changed_files: Iterable[str]) -> ImpactSelection:
+        """
+        Select tests for changed files (paths relative to the ExtP root).
+
+        Items are collected before and after the files are reindexed, so removed
+        functions are traced through the relationships they had and new ones
+        through the relationships they now have.
+        """
+        changed_files = [str(Path(path)) for path in dict.fromkeys(changed_files)]
+        indexable = [path for path in changed_files if self.indexer.is_indexed_path(path)]
+
+        items_before = self._items_in_files(indexable)
+        impacted = self._expand(items_before)
+        self.indexer.update_files(indexable)
+        items_after = self._items_in_files(indexable)
+        impacted.update(self._expand(items_after))
+
+        changed_items = {item.id: item for item in items_before + items_after}
+        traced_files = {item.source_file for item in changed_items.values()}
+        # Includes files the index never sees (other suffixes, skipped directories)
+        unmapped = [path for path in changed_files if path not in traced_files]
+
+        selection = self._select(changed_items, impacted, unmapped)
+        selection.changed_files = changed_files
+        return selection
+
+    def select_since(self, since: Optional[str] = None) -> ImpactSelection:
+        """Select tests for the item-level changes in the index's change log since a timestamp"""
+        changes = self.indexer.get_changes(since)
+        item_ids = list(dict.fromkeys(change['item_id'] for change in changes))
+        items = self.indexer._load_items(item_ids)
+
+        found = {item.id for item in items}
+        # Deleted items and their relationships are gone from the index
+        unmapped = [f"{change['change_type']} item {change['item_id']}" for change in changes
+                    if change['item_id'] not in found]
+
+        selection = self._select({item.id: item for item in items}, self._expand(items), unmapped)
+        selection.changed_files = sorted({item.source_file for item in items})
+        return selection
+
+    def full_selection(self) -> ImpactSelection:
+        """Select every test case (the on-demand full run)"""
+        return self._full_selection(["full run requested"])
+
+    def _full_selection(self, reasons: List[str]) -> ImpactSelection:
+        return ImpactSelection(test_ids=list(self._test_cases()), full_run=True, reasons=reasons)
+
+    def _test_cases(self) -> Dict[str, TestCase]:
+        if not self.generator.test_cases:
+            self.generator.generate_comprehensive_test_suite()
+        return self.generator.test_cases
+
+    def _items_in_files(self, rel_paths: List[str]) -> List[IndexedItem]:
+        """Indexed items whose source file is one of rel_paths"""
+        if not rel_paths:
+            return []
+        cursor = self.indexer.db_connection.cursor()
+        item_ids = []
+        for start in range(0, len(rel_paths), 500):
+            chunk = rel_paths[start:start + 500]
+            cursor.execute(f"SELECT id FROM extP_index WHERE source_file IN ({','.join('?' * len(chunk))})", chunk)
+            item_ids.extend(row[0] for row in cursor.fetchall())
+        return self.indexer._load_items(item_ids)
+
+    def _expand(self, items: List[IndexedItem]) -> Dict[str, IndexedItem]:
+        """Items that depend on the given items, following relationships backwards"""
+        impacted = {}
+        for item in items:
+            for dependent in self.indexer.get_impacted_items(item.id, max_depth=self.max_depth):
+                impacted[dependent.id] = dependent
+        return impacted
+
+    def _select(self, changed_items: Dict[str, IndexedItem], impacted: Dict[str, IndexedItem],
+                unmapped: List[str]) -> ImpactSelection:
+        """Trace changed and impacted items to requirements and test cases"""
+        test_cases = self._test_cases()
+        affected = dict(impacted)
+        affected.update(changed_items)
+
+        selection = ImpactSelection(
+            test_ids=[],
+            changed_items=[f"{item.type}:{item.name} ({item.source_file})" for item in changed_items.values()],
+            impacted_items=len(impacted),
+            unmapped_changes=unmapped
+        )
+
+        if unmapped and self.conservative:
+            full = self._full_selection([f"{len(unmapped)} change(s) could not be traced to indexed items"])
+            full.changed_items = selection.changed_items
+            full.impacted_items = selection.impacted_items
+            full.unmapped_changes = unmapped
+            return full
+
+        item_texts = [(item, self._item_text(item)) for item in affected.values()]
+        selection.requirements = self._trace_requirements(item_texts)
+
+        selected = set()
+        for test_id, test_case in test_cases.items():
+            if not test_case.requirement_ids:
+                # Not traceable, so it cannot be ruled out
+                selected.add(test_id)
+            elif set(test_case.requirement_ids) & set(selection.requirements):
+                selected.add(test_id)
+            elif self._quotes_affected_item(test_case, item_texts):
+                selected.add(test_id)
+
+        selected = self._with_prerequisites(selected, test_cases)
+        selection.test_ids = [test_id for test_id in test_cases if test_id in selected]
+        return selection
+
+    def _item_text(self, item: IndexedItem) -> str:
+        return f"{item.type} {item.name} {item.content}".lower()
+
+    def _keywords(self, text: str) -> Set[str]:
+        """Crude stems, so 'configure', 'configured' and 'configuration' all match"""
+        return {word[:6] for word in re.findall(r"[a-z]{3,}", text.lower())
+                if word not in REQUIREMENT_STOPWORDS}
+
+    def _trace_requirements(self, item_texts) -> Dict[str, List[str]]:
+        """
+        Requirements touched by the affected items: an item references the
+        requirement ID, or shares enough description keywords with it. Then
+        requirements depending on an affected requirement are added.
+        """
+        traced: Dict[str, List[str]] = {}
+        item_keywords = [(item, text, self._keywords(text)) for item, text in item_texts]
+
+        for req_id, requirement in self.generator.requirements.items():
+            req_keywords = self._keywords(requirement.description)
+            id_pattern = re.compile(rf"\b{re.escape(req_id.lower())}\b")
+            for item, text, keywords in item_keywords:
+                if id_pattern.search(text):
+                    traced.setdefault(req_id, []).append(f"{item.type}:{item.name} references {req_id}")
+                    continue
+                shared = req_keywords & keywords
+                if shared and len(shared) >= min(self.min_keyword_overlap, len(req_keywords)):
+                    traced.setdefault(req_id, []).append(
+                        f"{item.type}:{item.name} matches {', '.join(sorted(shared))}")
+
+        changed = True
+        while changed:
+            changed = False
+            for req_id, requirement in self.generator.requirements.items():
+                if req_id in traced:
+                    continue
+                upstream = [dep for dep in requirement.dependencies if dep in traced]
+                if upstream:
+                    traced[req_id] = [f"depends on {dep}" for dep in upstream]
+                    changed = True
+
+        return traced
+
+    def _quotes_affected_item(self, test_case: TestCase, item_texts) -> bool:
+        """Whether the test quotes ExtP text (menu options, messages) found in an affected item"""
+        quoted = []
+        for text in test_case.preconditions + test_case.test_steps + [test_case.description]:
+            quoted.extend(quote.lower() for quote in self.QUOTED_TEXT.findall(text))
+        quoted.extend(indicator.lower() for indicator in test_case.false_negative_indicators)
+        return any(quote in text for quote in quoted for _, text in item_texts)
+
+    def _with_prerequisites(self, selected: Set[str], test_cases: Dict[str, TestCase]) -> Set[str]:
+        """Add the tests that selected tests reference in their preconditions"""
+        pending = list(selected)
+        while pending:
+            test_case = test_cases.get(pending.pop())
+            if test_case is None:
+                continue
+            for precondition in test_case.preconditions:
+                for ref in self.TEST_ID_REFERENCE.findall(precondition):
+                    if ref in test_cases and ref not in selected:
+                        selected.add(ref)
+                        pending.append(ref)
+        return selected
+
+def print_selection(selection: ImpactSelection, suite_size: int):
+    """Print a selection summary"""
+    if selection.full_run:
+        print(f"📋 Full run: {len(selection.test_ids)} test cases ({'; '.join(selection.reasons)})")
+    else:
+        print(f"🎯 Impact analysis selected {len(selection.test_ids)} of {suite_size} test cases")
+    print(f"   Changed files: {len(selection.changed_files)}, changed items: {len(selection.changed_items)}, "
+          f"impacted items: {selection.impacted_items}")
+    for req_id, evidence in selection.requirements.items():
+        print(f"   📌 {req_id}: {evidence[0]}" + (f" (+{len(evidence) - 1} more)" if len(evidence) > 1 else ""))
+    for change in selection.unmapped_changes[:10]:
+        print(f"   ⚠️  Untraced change: {change}")
+    for test_id in selection.test_ids:
+        print(f"   - {test_id}")
+
+def main():
+    """Select and run the tests affected by ExtP changes"""
+    import argparse
+    from AdvancedTestExecutor import AdvancedTestExecutor
+
+    parser = argparse.ArgumentParser(description="Run only the test cases affected by ExtP changes")
+    parser.add_argument("extp_path", help="Root directory of the ExtP")
+    parser.add_argument("--db", default="extP_index.db", help="ExtP index database path")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--git-base", default="HEAD",
+                        help="Compare the ExtP working tree against this git revision (default: HEAD)")
+    source.add_argument("--since", help="Use the index change log after a 'YYYY-MM-DD HH:MM:SS' timestamp")
+    source.add_argument("--full", action="store_true", help="Run the whole suite")
+    parser.add_argument("--no-fallback", action="store_true",
+                        help="Do not fall back to a full run for changes that cannot be traced")
+    parser.add_argument("--dry-run", action="store_true", help="Print the selection without running it")
+    args = parser.parse_args()
+
+    generator = EnhancedTestCaseGenerator()
+    indexer = ExtPIndexer(args.extp_path, args.db)
+    analyzer = TestImpactAnalyzer(generator, indexer, conservative=not args.no_fallback)
+
+    if args.full:
+        selection = analyzer.full_selection()
+    elif args.since:
+        selection = analyzer.select_since(args.since)
+    else:
+        selection = analyzer.select_for_git_diff(args.git_base)
+
+    print_selection(selection, len(generator.test_cases))
+    if args.dry_run:
+        return
+    if not selection.test_ids:
+        print("✅ No test cases affected by these changes")
+        return
+
+    executor = AdvancedTestExecutor(generator)
+    executor.execute_all_tests(test_ids=selection.test_ids)
+    analyzer.record_suite_state()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,21 +5,239 @@ Generates standardized prompts for GitHub Copilot to analyze ExtP systems
 and create comprehensive requirements validation rules for CUS.
 """
 import os
+import re
+import ast
 import json
-import glob
+import tokenize
+import math
+import hashlib
+import tempfile
+import threading
 from datetime import datetime
 import argparse
 from pathlib import Path
 import time
 import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+try:
+    from ExtP_Indexer import ExtPIndexer
+    EXTP_INDEXER_AVAILABLE = True
+except ImportError:
+    EXTP_INDEXER_AVAILABLE = False
+
+class TokenCounter:
+    """Counts prompt tokens for a target LLM
+    
+    Uses the model's tiktoken encoding when tiktoken is installed and knows
+    the model; otherwise estimates from UTF-8 bytes with the bytes-per-token
+    ratio implied by the model's llm_limits.json entry (max_bytes / max_tokens).
+    Any object with count(text) and describe() can be passed to
+    ExtPRequirementsGenerator instead.
+    """
+    DEFAULT_BYTES_PER_TOKEN = 4.0
+
+    def __init__(self, llm_name=None, llm_limits=None):
+        self.llm_name = llm_name
+        self.encoding = None
+        if TIKTOKEN_AVAILABLE and llm_name:
+            try:
+                self.encoding = tiktoken.encoding_for_model(llm_name)
+            except KeyError:
+                self.encoding = None
+        if llm_limits and llm_limits.get("max_tokens") and llm_limits.get("max_bytes"):
+            self.bytes_per_token = llm_limits["max_bytes"] / llm_limits["max_tokens"]
+        else:
+            self.bytes_per_token = self.DEFAULT_BYTES_PER_TOKEN
+
+    def count(self, text):
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return int(len(text.encode("utf-8")) / self.bytes_per_token) + 1
+
+    def describe(self):
+        if self.encoding is not None:
+            return f"tiktoken {self.encoding.name}"
+        return f"estimated at {self.bytes_per_token:.2f} bytes/token"
+
+class PromptCache:
+    """Persistent cache of prompt content between generator runs
+    
+    Lives in <output dir>/.prompt_cache. index.json maps each source file to
+    its size, mtime and content hash, so unchanged files are not even re-read;
+    chunks/ holds each file's truncated or chunked content keyed by content
+    hash and chunking parameters; last_run.json records the previous run's
+    entry hashes and how they were packed into parts.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.chunks_dir = os.path.join(cache_dir, "chunks")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        self.index = self._load_json("index.json", {})
+        self.used_keys = set()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _load_json(self, name, default):
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _save_json(self, path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def content_hash(self, filepath):
+        """SHA-256 of filepath, reusing the recorded hash while size and mtime are unchanged"""
+        stat = os.stat(filepath)
+        entry = self.index.get(filepath)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["hash"]
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        self.index[filepath] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def get(self, filepath, params, build):
+        """Return build() for filepath, reused while its content and params are unchanged"""
+        try:
+            content_hash = self.content_hash(filepath)
+        except OSError:
+            return build()
+        key = hashlib.sha256(json.dumps([content_hash, params]).encode("utf-8")).hexdigest()
+        path = os.path.join(self.chunks_dir, f"{key}.json")
+        with self._lock:
+            self.used_keys.add(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            with self._lock:
+                self.hits += 1
+            return value
+        except (OSError, ValueError):
+            pass
+        value = build()
+        self._save_json(path, value)
+        with self._lock:
+            self.misses += 1
+        return value
+
+    def load_last_run(self):
+        return self._load_json("last_run.json", {})
+
+    def save(self, last_run):
+        """Persist the index and this run's packing; drop chunks and files this run did not use"""
+        for name in os.listdir(self.chunks_dir):
+            if name.endswith(".json") and name[:-5] not in self.used_keys:
+                os.remove(os.path.join(self.chunks_dir, name))
+        used_files = set(last_run.get("source_files", []))
+        self.index = {path: entry for path, entry in self.index.items() if path in used_files}
+        self._save_json(os.path.join(self.cache_dir, "index.json"), self.index)
+        self._save_json(os.path.join(self.cache_dir, "last_run.json"), last_run)
+
+class PromptEntrySpool:
+    """Serialized prompt entries spilled to a temporary file
+    
+    Each entry is stored exactly as it appears inside a prompt's JSON object,
+    so prompt parts can be written by copying entries back out of the spool
+    with only one entry in memory at a time.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.offsets = {}  # key -> (offset, length)
+
+    def add(self, key, value):
+        """Spool an entry; returns its serialized form"""
+        fragment = json.dumps({key: value}, indent=2)[2:-2]  # '  "key": value' without the braces
+        data = fragment.encode("utf-8")
+        self.file.seek(0, os.SEEK_END)
+        self.offsets[key] = (self.file.tell(), len(data))
+        self.file.write(data)
+        return fragment
+
+    def iter_object(self, keys):
+        """Yield the JSON object of the given entries in pieces, formatted like json.dumps(indent=2)"""
+        if not keys:
+            yield "{}"
+            return
+        yield "{\n"
+        for index, key in enumerate(keys):
+            offset, length = self.offsets[key]
+            self.file.seek(offset)
+            yield self.file.read(length).decode("utf-8")
+            yield ",\n" if index < len(keys) - 1 else "\n}"
+
+    def close(self):
+        self.file.close()
 
 class ExtPRequirementsGenerator:
-    def __init__(self, exclude_patterns=None):
+    # File patterns looked for anywhere in the ExtP tree, with how many matches of each to keep
+    ENTRY_PATTERNS = ["main.py", "app.py", "run.py", "start.py", "__main__.py"]
+    CONFIG_PATTERNS = ["config.py", "settings.py", "*.ini", "*.yaml", "*.yml", "*.json"]
+    CLI_PATTERNS = ["*cli*.py", "*wizard*.py", "*menu*.py", "*interface*.py"]
+    REQUIREMENTS_PATTERNS = [
+        "**/README*.md", "**/requirements*.md", "**/REQUIREMENTS*",
+        "**/docs/**/*.md", "**/spec/**/*.md", "**/design/**/*.md"
+    ]
+    REQUIREMENTS_FOLDER_PATTERNS = ["*.md", "*.txt", "*.rst"]
+    # Bump when chunking/truncation output changes, to invalidate cached chunks
+    CHUNKING_VERSION = 1
+    # Weights of the relevance signals used to order code files; index counts are log-scaled
+    RELEVANCE_WEIGHTS = {
+        "prompts": 3.0,           # input() prompts in the file
+        "menus": 2.0,             # menu options printed by the file
+        "fan_in": 1.5,            # other files depending on it
+        "requirement_refs": 4.0,  # requirement IDs it mentions
+        "entry_point": 5.0,       # matches ENTRY_PATTERNS
+        "cli_pattern": 4.0,       # matches CLI_PATTERNS
+        "config_pattern": 2.0     # matches CONFIG_PATTERNS
+    }
+
+    def __init__(self, exclude_patterns=None, llm_name=None, llm_limits=None, token_counter=None, verbose=False,
+                 index_path=None):
         self.version = "1.0.0"
+        self.verbose = verbose  # per-file [DEBUG] output and full directory dumps
+        self.index_path = index_path  # ExtPIndexer database used to rank code files, if any
+        self.relevance = {}  # filepath -> (score, signals) from the last scan_extp_codebase
         self.max_file_size = 1024 * 5  # 5KB per file to stay under limits
         self.total_context_limit = 1024 * 20  # 20KB total to be safe
+        self.token_counter = token_counter or TokenCounter(llm_name, llm_limits)
+        if llm_limits:
+            self.max_file_size = llm_limits["recommended_prompt_bytes"] // 8  # e.g. 1/8th of prompt
+            self.total_context_limit = llm_limits["recommended_prompt_bytes"]
+            # Keep the same headroom for the response as the byte limits do
+            self.max_prompt_tokens = int(llm_limits["max_tokens"] * llm_limits["recommended_prompt_bytes"]
+                                         / llm_limits["max_bytes"])
+        else:
+            self.max_prompt_tokens = self.token_counter.count("x" * self.total_context_limit)
+        self.max_prompt_bytes = self.total_context_limit
         self.exclude_patterns = exclude_patterns or []
         self.gitignore_patterns = self._load_gitignore_patterns()
+        self.read_workers = None  # ThreadPoolExecutor default
+        self._exclude_matcher = self._compile_exclude_patterns(self.exclude_patterns)
+        self._gitignore_matcher = self._compile_gitignore_patterns(self.gitignore_patterns)
+        self._tree_scans = {}
+
+    def _debug(self, message):
+        if self.verbose:
+            print(message)
 
     def _load_gitignore_patterns(self):
         gitignore_path = os.path.join(os.path.dirname(__file__), ".gitignore")
@@ -30,103 +248,282 @@ class ExtPRequirementsGenerator:
                     line = line.strip()
                     if not line or line.startswith("#"):  # skip comments/empty
                         continue
-                    if line.startswith("!"):  # skip negation for now
-                        continue
                     patterns.append(line)
         return patterns
 
-    def _is_ignored(self, rel_path):
+    @staticmethod
+    def _compile_exclude_patterns(exclude_patterns):
+        """Compile exclude substrings into one case-insensitive regex"""
+        if not exclude_patterns:
+            return None
+        return re.compile("|".join(re.escape(pat.lower().rstrip("/")) for pat in exclude_patterns), re.IGNORECASE)
+
+    @staticmethod
+    def _gitignore_to_regex(pattern):
+        """Translate one gitignore pattern (without "!") into a regex over '/'-separated paths"""
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # Patterns without an inner slash match at any depth
+        regex = "" if "/" in pattern else "(?:.*/)?"
+        pattern = pattern.lstrip("/")
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+            elif pattern.startswith("**", i):
+                regex += ".*"
+                i += 2
+            elif pattern[i] == "*":
+                regex += "[^/]*"
+                i += 1
+            elif pattern[i] == "?":
+                regex += "[^/]"
+                i += 1
+            elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+                end = pattern.find("]", i + 2)
+                char_class = pattern[i + 1:end].replace("\\", "\\\\")
+                if char_class.startswith("!"):
+                    char_class = "^" + char_class[1:]
+                regex += f"[{char_class}]"
+                i = end + 1
+            else:
+                regex += re.escape(pattern[i])
+                i += 1
+        # Directory-only patterns need the trailing slash (_is_ignored adds one for directories);
+        # everything below a matched path is matched too
+        return regex + ("/.*" if dir_only else "(?:/.*)?")
+
+    def _compile_gitignore_patterns(self, patterns):
+        """Compile .gitignore rules into a single regex
+        
+        Alternatives are in reverse rule order, so the first one to match is
+        the last matching rule, which decides as in git; its group name says
+        whether it ignores or re-includes ("!") the path.
+        """
+        alternatives = []
+        for index in reversed(range(len(patterns))):
+            pattern = patterns[index]
+            group = "keep" if pattern.startswith("!") else "ignore"
+            alternatives.append(f"(?P<{group}{index}>{self._gitignore_to_regex(pattern.lstrip('!'))})")
+        if not alternatives:
+            return None
+        return re.compile("|".join(alternatives), re.IGNORECASE if os.name == "nt" else 0)
+
+    def _is_ignored(self, rel_path, is_dir=False):
+        rel_path = rel_path.replace("\\", "/")
         # Check exclude_patterns
-        for pat in self.exclude_patterns:
-            if pat.lower().rstrip("/") in rel_path.lower():
-                return True
+        if self._exclude_matcher and self._exclude_matcher.search(rel_path):
+            return True
         # Check .gitignore patterns
-        for pat in self.gitignore_patterns:
-            # Use fnmatch for glob-like patterns
-            if fnmatch.fnmatch(rel_path, pat) or fnmatch.fnmatch(rel_path.replace("\\", "/"), pat):
-                return True
+        if self._gitignore_matcher:
+            match = self._gitignore_matcher.fullmatch(rel_path + "/" if is_dir else rel_path)
+            return bool(match) and match.lastgroup.startswith("ignore")
         return False
 
+    def _scan_tree(self, root, apply_ignore=True):
+        """Walk a directory tree once with os.scandir
+        
+        Hidden entries are skipped and, with apply_ignore, ignored files and
+        whole ignored directories are pruned. Returns the full directory
+        structure, the (rel_path, full_path, size) of every file, and every
+        file matched per pattern in ENTRY/CONFIG/CLI/REQUIREMENTS_PATTERNS.
+        Results are cached per root for the lifetime of the generator.
+        """
+        key = (os.path.abspath(root), apply_ignore)
+        if key in self._tree_scans:
+            return self._tree_scans[key]
+        
+        files = []
+        
+        def scan_dir(path, rel_dir):
+            items = {}
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except PermissionError:
+                self._debug(f"[DEBUG] Permission denied: {path}")
+                return {"error": "Permission denied"}
+            except OSError as e:
+                self._debug(f"[DEBUG] Error reading {path}: {e}")
+                return {"error": str(e)}
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                rel_path = rel_dir + entry.name
+                try:
+                    is_dir = entry.is_dir()
+                    if apply_ignore and self._is_ignored(rel_path, is_dir):
+                        self._debug(f"[DEBUG] Excluding file/dir by .gitignore or exclude_patterns: {rel_path}")
+                        continue
+                    if is_dir:
+                        items[f"{entry.name}/"] = scan_dir(entry.path, rel_path + "/")
+                    else:
+                        size = entry.stat().st_size
+                        files.append((rel_path, entry.path, size))
+                        items[entry.name] = f"{size} bytes"
+                except OSError as e:
+                    self._debug(f"[DEBUG] Error reading {entry.path}: {e}")
+            return items
+        
+        structure = scan_dir(root, "")
+        scan = {
+            "structure": structure,
+            "files": files,
+            "matches": self._classify_files(files)
+        }
+        self._debug(f"[DEBUG] Scanned {root}: {len(files)} files")
+        self._tree_scans[key] = scan
+        return scan
+
+    def _classify_files(self, files):
+        """Match every file against all pattern sets in one pass
+        
+        A pattern matches on the file name; "**/dir/**/name" patterns also
+        require dir among the file's parent directories.
+        """
+        matchers = []
+        for pattern in (self.ENTRY_PATTERNS + self.CONFIG_PATTERNS + self.CLI_PATTERNS +
+                        self.REQUIREMENTS_PATTERNS + self.REQUIREMENTS_FOLDER_PATTERNS + ["*.py"]):
+            parts = [part for part in pattern.split("/") if part != "**"]
+            name_regex = re.compile(fnmatch.translate(os.path.normcase(parts[-1])))
+            matchers.append((pattern, {os.path.normcase(part) for part in parts[:-1]}, name_regex))
+        
+        matches = {pattern: [] for pattern, _, _ in matchers}
+        for rel_path, full_path, _ in files:
+            rel_dir, _, name = rel_path.rpartition("/")
+            name = os.path.normcase(name)
+            parent_dirs = {os.path.normcase(part) for part in rel_dir.split("/")} if rel_dir else set()
+            for pattern, required_dirs, name_regex in matchers:
+                if name_regex.match(name) and required_dirs <= parent_dirs:
+                    matches[pattern].append(full_path)
+        return matches
+
     def discover_requirements_sources(self, extp_path, requirements_file=None, requirements_folder=None):
         """Discover all requirements sources"""
-        print(f"[DEBUG] Discovering requirements sources in: {extp_path}")
+        self._debug(f"[DEBUG] Discovering requirements sources in: {extp_path}")
         sources = []
         
         # User-specified requirements file
         if requirements_file and os.path.exists(requirements_file):
-            print(f"[DEBUG] Including user-specified requirements file: {requirements_file}")
+            self._debug(f"[DEBUG] Including user-specified requirements file: {requirements_file}")
             sources.append(("requirements_file", requirements_file))
         else:
             if requirements_file:
-                print(f"[DEBUG] User-specified requirements file not found: {requirements_file}")
+                self._debug(f"[DEBUG] User-specified requirements file not found: {requirements_file}")
         
         # User-specified requirements folder
         if requirements_folder and os.path.exists(requirements_folder):
-            print(f"[DEBUG] Including user-specified requirements folder: {requirements_folder}")
-            for pattern in ["*.md", "*.txt", "*.rst"]:
-                files = glob.glob(os.path.join(requirements_folder, "**", pattern), recursive=True)
+            self._debug(f"[DEBUG] Including user-specified requirements folder: {requirements_folder}")
+            folder_matches = self._scan_tree(requirements_folder, apply_ignore=False)["matches"]
+            for pattern in self.REQUIREMENTS_FOLDER_PATTERNS:
+                files = folder_matches[pattern]
                 for file in files[:5]:  # Limit to avoid size issues
-                    print(f"[DEBUG] Found in requirements folder: {file}")
+                    self._debug(f"[DEBUG] Found in requirements folder: {file}")
                     sources.append(("requirements_folder", file))
         else:
             if requirements_folder:
-                print(f"[DEBUG] User-specified requirements folder not found: {requirements_folder}")
+                self._debug(f"[DEBUG] User-specified requirements folder not found: {requirements_folder}")
         
         # Auto-discovery in ExtP directory
-        auto_patterns = [
-            "**/README*.md", "**/requirements*.md", "**/REQUIREMENTS*",
-            "**/docs/**/*.md", "**/spec/**/*.md", "**/design/**/*.md"
-        ]
-        
-        for pattern in auto_patterns:
-            files = glob.glob(os.path.join(extp_path, pattern), recursive=True)
+        matches = self._scan_tree(extp_path)["matches"]
+        for pattern in self.REQUIREMENTS_PATTERNS:
+            files = matches[pattern]
             for file in files[:3]:  # Limit auto-discovered files
-                print(f"[DEBUG] Auto-discovered requirements file: {file}")
+                self._debug(f"[DEBUG] Auto-discovered requirements file: {file}")
                 sources.append(("auto_discovered", file))
         
-        print(f"[DEBUG] Final requirements sources: {sources}")
+        self._debug(f"[DEBUG] Final requirements sources: {sources}")
         return sources
     
     def scan_extp_codebase(self, extp_path):
         """Scan ExtP codebase for key files"""
-        print(f"[DEBUG] Scanning codebase at: {extp_path}")
+        self._debug(f"[DEBUG] Scanning codebase at: {extp_path}")
         important_files = []
+        pattern_signals = {}
+        matches = self._scan_tree(extp_path)["matches"]
         
         # Look for main entry points
-        entry_patterns = ["main.py", "app.py", "run.py", "start.py", "__main__.py"]
-        for pattern in entry_patterns:
-            files = glob.glob(os.path.join(extp_path, "**", pattern), recursive=True)
-            print(f"[DEBUG] Entry pattern '{pattern}' found: {files}")
+        for pattern in self.ENTRY_PATTERNS:
+            files = matches[pattern]
+            self._debug(f"[DEBUG] Entry pattern '{pattern}' found: {files}")
             important_files.extend(files[:2])  # Max 2 of each type
+            for f in files:
+                pattern_signals.setdefault(f, set()).add("entry_point")
         
         # Look for configuration files
-        config_patterns = ["config.py", "settings.py", "*.ini", "*.yaml", "*.yml", "*.json"]
-        for pattern in config_patterns:
-            files = glob.glob(os.path.join(extp_path, "**", pattern), recursive=True)
-            print(f"[DEBUG] Config pattern '{pattern}' found: {files}")
+        for pattern in self.CONFIG_PATTERNS:
+            files = matches[pattern]
+            self._debug(f"[DEBUG] Config pattern '{pattern}' found: {files}")
             important_files.extend(files[:2])  # Max 2 of each type
+            for f in files:
+                pattern_signals.setdefault(f, set()).add("config_pattern")
         
         # Look for CLI/wizard files (specific to our use case)
-        cli_patterns = ["*cli*.py", "*wizard*.py", "*menu*.py", "*interface*.py"]
-        for pattern in cli_patterns:
-            files = glob.glob(os.path.join(extp_path, "**", pattern), recursive=True)
-            print(f"[DEBUG] CLI pattern '{pattern}' found: {files}")
+        for pattern in self.CLI_PATTERNS:
+            files = matches[pattern]
+            self._debug(f"[DEBUG] CLI pattern '{pattern}' found: {files}")
             important_files.extend(files[:3])  # Max 3 CLI files
+            for f in files:
+                pattern_signals.setdefault(f, set()).add("cli_pattern")
         
-        # Add all Python files in all subdirectories
-        all_py_files = glob.glob(os.path.join(extp_path, "**", "*.py"), recursive=True)
-        print(f"[DEBUG] All .py files found: {all_py_files}")
-        # Exclude files matching any exclude pattern
-        filtered_py_files = []
-        for f in all_py_files:
-            if not any(pat.lower() in f.lower() for pat in self.exclude_patterns):
-                filtered_py_files.append(f)
-            else:
-                print(f"[DEBUG] Excluded by pattern: {f}")
-        important_files.extend(filtered_py_files)
-        print(f"[DEBUG] Important files after filtering: {important_files}")
+        # Add all Python files in all subdirectories (the walk already dropped
+        # files matching an exclude pattern)
+        all_py_files = matches["*.py"]
+        self._debug(f"[DEBUG] All .py files found: {all_py_files}")
+        important_files.extend(all_py_files)
         
-        return list(set(important_files))  # Remove duplicates
+        # Most relevant first, so the token budget goes to the files that matter
+        important_files = self.rank_files_by_relevance(extp_path, list(dict.fromkeys(important_files)), pattern_signals)
+        self._debug(f"[DEBUG] Important files after filtering: {important_files}")
+        
+        return important_files
+    
+    def rank_files_by_relevance(self, extp_path, filepaths, pattern_signals=None):
+        """Order candidate files by relevance to CLI testing, most relevant first
+        
+        Scores combine the ExtP index signals (input prompts, menus, fan-in
+        in the relationship graph, requirement references) with the file name
+        patterns each file matched, weighted by RELEVANCE_WEIGHTS. Without an
+        index only the name patterns count; ties keep path order.
+        """
+        pattern_signals = pattern_signals or {}
+        index_signals = self._load_index_signals(extp_path)
+        
+        self.relevance = {}
+        for filepath in filepaths:
+            signals = dict(index_signals.get(os.path.relpath(filepath, extp_path), {}))
+            score = sum(self.RELEVANCE_WEIGHTS[name] * math.log1p(count) for name, count in signals.items())
+            for name in pattern_signals.get(filepath, ()):
+                signals[name] = 1
+                score += self.RELEVANCE_WEIGHTS[name]
+            self.relevance[filepath] = (round(score, 3), signals)
+        
+        ranked = sorted(filepaths, key=lambda filepath: (-self.relevance[filepath][0], filepath))
+        print(f"[INFO] Most relevant code files: "
+              f"{[(os.path.relpath(f, extp_path), self.relevance[f][0]) for f in ranked[:10]]}")
+        return ranked
+    
+    def _load_index_signals(self, extp_path):
+        """Per-file signals from the ExtP index at index_path, building or refreshing it first"""
+        if not self.index_path:
+            return {}
+        if not EXTP_INDEXER_AVAILABLE:
+            print("[WARNING] ExtP_Indexer not available - ranking code files by name patterns only")
+            return {}
+        try:
+            indexer = ExtPIndexer(extp_path, self.index_path)
+            try:
+                if indexer.get_index_version() == 0:
+                    indexer.build_full_index()
+                else:
+                    indexer.incremental_update()
+                return indexer.get_file_signals()
+            finally:
+                indexer.db_connection.close()
+        except Exception as e:
+            print(f"[WARNING] Could not read the ExtP index ({e}) - ranking code files by name patterns only")
+            return {}
     
     def read_file_safely(self, filepath):
         """Read file content with size limits and error handling"""
@@ -143,53 +540,73 @@ class ExtPRequirementsGenerator:
         except Exception as e:
             return f"[ERROR READING FILE: {e}]"
     
+    def _iter_sources(self, sources, cache=None):
+        """Load (filepath, kind) sources on a thread pool, yielding (filepath, content) in order
+        
+        kind "markdown" gives the list of heading-based chunks, "python" the
+        list of statement-based chunks, "text" the read_file_safely content.
+        With a PromptCache, files whose content has not changed since the last
+        run are served from the cache. At most two loads per worker are in
+        flight or waiting to be consumed, so memory stays bounded however many
+        sources there are.
+        """
+        def load(source):
+            filepath, kind = source
+            if kind == "markdown":
+                build = lambda: self._chunk_markdown_file(filepath, max_chunk_size=self.max_file_size)
+            elif kind == "python":
+                build = lambda: self._chunk_python_file(filepath, max_chunk_size=self.max_file_size)
+            else:
+                build = lambda: self.read_file_safely(filepath)
+            if cache is None:
+                return build()
+            return cache.get(filepath, [kind, self.max_file_size, self.CHUNKING_VERSION], build)
+
+        # Same default as ThreadPoolExecutor
+        window = 2 * (self.read_workers or min(32, (os.cpu_count() or 1) + 4))
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.read_workers) as executor:
+            for source in sources:
+                pending.append((source[0], executor.submit(load, source)))
+                if len(pending) >= window:
+                    filepath, future = pending.popleft()
+                    yield filepath, future.result()
+            while pending:
+                filepath, future = pending.popleft()
+                yield filepath, future.result()
+
+    def _code_file_kind(self, filepath):
+        """Return 'python' for Python files too large to include whole, otherwise 'text'"""
+        try:
+            if filepath.endswith(".py") and os.path.getsize(filepath) > self.max_file_size:
+                return "python"
+        except OSError:
+            pass
+        return "text"
+
     def generate_directory_structure(self, extp_path, max_depth=None):
         """Generate a full directory structure view for the ExtP target directory, including every file."""
         # Allow max_depth override via environment variable or argument
         if max_depth is None:
             max_depth = int(os.environ.get("EXT_P_DIRSTRUCT_MAX_DEPTH", 10))  # default to 10 for deep scan
-        print(f"[DEBUG] Scanning directory structure at: {extp_path} (max_depth={max_depth})")
-        structure = {}
-        
-        def scan_dir(path, current_depth):
-            if current_depth > max_depth:
-                print(f"[DEBUG] Reached max depth at: {path}")
-                return {"_omitted": "max depth reached"}
-            rel_path = os.path.relpath(path, extp_path).replace("\\", "/")
-            if rel_path != "." and self._is_ignored(rel_path):
-                print(f"[DEBUG] Excluding directory by .gitignore or exclude_patterns: {rel_path}")
-                return {"_omitted": "excluded by pattern"}
-            items = {}
-            try:
-                for item in sorted(os.listdir(path)):
-                    if item.startswith('.'):
-                        print(f"[DEBUG] Skipping hidden file/dir: {os.path.join(path, item)}")
-                        continue
-                    item_path = os.path.join(path, item)
-                    rel_item_path = os.path.relpath(item_path, extp_path).replace("\\", "/")
-                    if self._is_ignored(rel_item_path):
-                        print(f"[DEBUG] Excluding file/dir by .gitignore or exclude_patterns: {rel_item_path}")
-                        continue
-                    if os.path.isdir(item_path):
-                        print(f"[DEBUG] Directory: {item_path}/")
-                        items[f"{item}/"] = scan_dir(item_path, current_depth + 1)
-                    else:
-                        size = os.path.getsize(item_path)
-                        print(f"[DEBUG] File: {item_path} ({size} bytes)")
-                        items[item] = f"{size} bytes"
-            except PermissionError:
-                print(f"[DEBUG] Permission denied: {path}")
-                items["error"] = "Permission denied"
-            except Exception as e:
-                print(f"[DEBUG] Error reading {path}: {e}")
-                items["error"] = str(e)
-            return items
-        
-        return scan_dir(extp_path, 0)
+        self._debug(f"[DEBUG] Scanning directory structure at: {extp_path} (max_depth={max_depth})")
+        return self._limit_depth(self._scan_tree(extp_path)["structure"], max_depth)
+    
+    def _limit_depth(self, structure, max_depth, current_depth=0):
+        """Copy of a scanned directory structure with directories below max_depth omitted"""
+        limited = {}
+        for name, value in structure.items():
+            if not isinstance(value, dict):
+                limited[name] = value
+            elif current_depth + 1 > max_depth:
+                limited[name] = {"_omitted": "max depth reached"}
+            else:
+                limited[name] = self._limit_depth(value, max_depth, current_depth + 1)
+        return limited
     
     def _chunk_markdown_file(self, filepath, max_chunk_size=4096):
         """Split a markdown file into logical chunks at headings, each chunk <= max_chunk_size bytes"""
-        print(f"[DEBUG] Chunking markdown file: {filepath}")
+        self._debug(f"[DEBUG] Chunking markdown file: {filepath}")
         with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
             lines = f.readlines()
         chunks = []
@@ -200,7 +617,7 @@ class ExtPRequirementsGenerator:
                 # Start new chunk at heading
                 if current_size > max_chunk_size:
                     # If chunk is too big, split at previous heading
-                    print(f"[DEBUG] Chunk exceeded max size at heading: {line.strip()}")
+                    self._debug(f"[DEBUG] Chunk exceeded max size at heading: {line.strip()}")
                 chunks.append(''.join(current_chunk))
                 current_chunk = []
                 current_size = 0
@@ -227,9 +644,168 @@ class ExtPRequirementsGenerator:
                         para_size = 0
                 if para_chunk:
                     final_chunks.append('\n\n'.join(para_chunk))
-        print(f"[DEBUG] Markdown file {filepath} split into {len(final_chunks)} chunks.")
+        self._debug(f"[DEBUG] Markdown file {filepath} split into {len(final_chunks)} chunks.")
         return final_chunks
     
+    def _chunk_python_file(self, filepath, max_chunk_size=4096):
+        """Split a Python file into chunks of at most max_chunk_size bytes at statement boundaries
+        
+        Falls back to plain line-based chunks when the file cannot be tokenized.
+        """
+        self._debug(f"[DEBUG] Chunking Python file: {filepath}")
+        try:
+            chunks = list(self._iter_python_chunks(filepath, max_chunk_size))
+        except (tokenize.TokenError, SyntaxError) as e:
+            self._debug(f"[DEBUG] Could not tokenize {filepath} ({e}); chunking by lines")
+            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+                chunks = ["".join(lines) for _, lines in self._split_lines(1, f, max_chunk_size)]
+        self._debug(f"[DEBUG] Python file {filepath} split into {len(chunks)} chunks.")
+        return chunks
+
+    def _iter_python_chunks(self, filepath, max_chunk_size):
+        """Yield chunks of a Python file, reading it one top-level statement at a time
+        
+        Consecutive statements are grouped up to the size limit. A class too
+        large for one chunk is parsed on its own and split between its methods;
+        any other oversized statement is split by lines. Chunks after the first
+        start with a comment header giving the file, line range and the
+        module's imports, followed by the enclosing class line when the chunk
+        starts inside a class.
+        """
+        name = os.path.basename(filepath)
+        imports = []
+        chunk_lines, chunk_size, chunk_start, chunk_end = [], 0, None, None
+        chunk_enclosing = None
+        emitted = 0
+
+        def render():
+            header = []
+            if emitted:
+                header.append(f"# {name} lines {chunk_start}-{chunk_end} (continued)")
+                if imports:
+                    imports_line = "# imports: " + "; ".join(imports)
+                    if len(imports_line) > max_chunk_size // 4:
+                        imports_line = imports_line[:max_chunk_size // 4] + " ..."
+                    header.append(imports_line)
+            if chunk_enclosing:
+                header.append(f"{chunk_enclosing}  # continued")
+            body = "".join(chunk_lines)
+            return "\n".join(header) + "\n" + body if header else body
+
+        # Room for the header added to continued chunks
+        budget = max(max_chunk_size - max_chunk_size // 4 - 200, max_chunk_size // 2)
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            for first_line, lines, keyword in self._iter_python_statements(f.readline):
+                if keyword in ("import", "from"):
+                    imports.append(" ".join(line.strip() for line in lines
+                                            if line.strip() and not line.strip().startswith("#")))
+                for start_line, piece, enclosing in self._split_python_statement(first_line, lines, keyword, budget):
+                    piece_size = sum(len(line.encode('utf-8')) for line in piece)
+                    if chunk_lines and chunk_size + piece_size > budget:
+                        yield render()
+                        emitted += 1
+                        chunk_lines, chunk_size = [], 0
+                    if not chunk_lines:
+                        chunk_start, chunk_enclosing = start_line, enclosing
+                    chunk_lines.extend(piece)
+                    chunk_size += piece_size
+                    chunk_end = start_line + len(piece) - 1
+        if chunk_lines:
+            yield render()
+
+    @staticmethod
+    def _iter_python_statements(readline):
+        """Yield (first_line, lines, first_keyword) for each top-level statement
+        
+        Lines are buffered only until their statement is complete. Comments and
+        blank lines before a statement belong to it, and decorators stay with
+        the definition they decorate.
+        """
+        buffer = []
+
+        def buffered_readline():
+            line = readline()
+            if line:
+                buffer.append(line)
+            return line
+
+        first_line = 1
+        depth = 0
+        last_newline = 0
+        at_statement_start = True
+        keyword = None
+        decorating = False
+        skipped = (tokenize.NL, tokenize.COMMENT, tokenize.ENCODING, tokenize.ENDMARKER)
+        for token in tokenize.generate_tokens(buffered_readline):
+            if token.type == tokenize.INDENT:
+                depth += 1
+            elif token.type == tokenize.DEDENT:
+                depth -= 1
+            elif token.type == tokenize.NEWLINE:
+                last_newline = token.start[0]
+                at_statement_start = True
+            elif token.type not in skipped:
+                if at_statement_start and depth == 0:
+                    if decorating:
+                        # Further decorators, then the definition they decorate
+                        decorating = token.string == "@"
+                    else:
+                        if keyword is not None:
+                            count = last_newline - first_line + 1
+                            yield first_line, buffer[:count], keyword
+                            del buffer[:count]
+                            first_line = last_newline + 1
+                        keyword = token.string
+                        decorating = keyword == "@"
+                at_statement_start = False
+        if buffer:
+            yield first_line, buffer, keyword
+
+    def _split_python_statement(self, first_line, lines, keyword, budget):
+        """Yield (start_line, lines, enclosing_class_line) pieces of a statement no larger than budget"""
+        if sum(len(line.encode('utf-8')) for line in lines) <= budget:
+            yield first_line, lines, None
+            return
+
+        if keyword in ("class", "@"):
+            try:
+                tree = ast.parse("".join(lines))
+            except SyntaxError:
+                tree = None
+            node = tree.body[-1] if tree and tree.body else None
+            if isinstance(node, ast.ClassDef) and node.body:
+                enclosing = lines[node.lineno - 1].rstrip()
+                if len(enclosing) > 150:
+                    enclosing = enclosing[:150] + " ..."
+                starts = [min([stmt.lineno] + [d.lineno for d in getattr(stmt, 'decorator_list', [])])
+                          for stmt in node.body]
+                # Class line, decorators and leading comments, then each body statement
+                boundaries = [1] + starts + [len(lines) + 1]
+                for index in range(len(boundaries) - 1):
+                    piece = lines[boundaries[index] - 1:boundaries[index + 1] - 1]
+                    start_line = first_line + boundaries[index] - 1
+                    for sub_start, sub_piece in self._split_lines(start_line, piece, budget):
+                        # Only pieces after the class line need it repeated
+                        yield sub_start, sub_piece, enclosing if index or sub_start != start_line else None
+                return
+
+        for start_line, piece in self._split_lines(first_line, lines, budget):
+            yield start_line, piece, None
+
+    @staticmethod
+    def _split_lines(first_line, lines, budget):
+        """Yield (start_line, lines) runs of consecutive lines no larger than budget"""
+        piece, size, start_line = [], 0, first_line
+        for line_number, line in enumerate(lines, first_line):
+            line_size = len(line.encode('utf-8'))
+            if piece and size + line_size > budget:
+                yield start_line, piece
+                piece, size, start_line = [], 0, line_number
+            piece.append(line)
+            size += line_size
+        if piece:
+            yield start_line, piece
+
     def generate_standardized_prompt(self, extp_path, requirements_file=None, requirements_folder=None):
         """Generate the standardized prompt for GitHub Copilot"""
         
@@ -262,31 +838,25 @@ class ExtPRequirementsGenerator:
             "total_context_size": 0
         }
         
-        # Add requirements sources content
+        # Add requirements sources content, then important code files, until the context limit.
+        # Files are read ahead only a few at a time, so nothing past the limit is read.
+        sources = [(filepath, "text") for _, filepath in requirements_sources]
+        sources += [(filepath, "text") for filepath in important_files]
         current_size = 0
-        for source_type, filepath in requirements_sources:
+        for index, (filepath, content) in enumerate(self._iter_sources(sources)):
             if current_size > self.total_context_limit:
                 break
             
-            content = self.read_file_safely(filepath)
             current_size += len(content)
             
             rel_path = os.path.relpath(filepath, extp_path)
-            context_data["requirements_sources"][rel_path] = {
-                "source_type": source_type,
-                "content": content
-            }
-        
-        # Add important code files
-        for filepath in important_files:
-            if current_size > self.total_context_limit:
-                break
-            
-            content = self.read_file_safely(filepath)
-            current_size += len(content)
-            
-            rel_path = os.path.relpath(filepath, extp_path)
-            context_data["code_files"][rel_path] = content
+            if index < len(requirements_sources):
+                context_data["requirements_sources"][rel_path] = {
+                    "source_type": requirements_sources[index][0],
+                    "content": content
+                }
+            else:
+                context_data["code_files"][rel_path] = content
         
         context_data["total_context_size"] = current_size
         
@@ -299,9 +869,19 @@ class ExtPRequirementsGenerator:
     
     def _build_prompt_template(self, context_data):
         """Build the standardized prompt template"""
-        
-        prompt = f"""
-=== GITHUB COPILOT: ExtP REQUIREMENTS ANALYSIS REQUEST ===
+        return "".join(self._iter_prompt_template(context_data))
+
+    @staticmethod
+    def _iter_json_section(value):
+        """Yield a JSON section of a prompt: a dict is dumped, anything else is already-serialized pieces"""
+        if isinstance(value, dict):
+            yield json.dumps(value, indent=2)
+        else:
+            yield from value
+
+    def _iter_prompt_template(self, context_data):
+        """Yield the standardized prompt in pieces, streaming its JSON sections"""
+        yield f"""=== GITHUB COPILOT: ExtP REQUIREMENTS ANALYSIS REQUEST ===
 
 REQUEST METADATA:
 {json.dumps(context_data["metadata"], indent=2)}
@@ -318,16 +898,15 @@ The generated rules must distinguish between:
 ANALYSIS CONTEXT:
 
 DIRECTORY STRUCTURE:
-{json.dumps(context_data["directory_structure"], indent=2)}
-
-REQUIREMENTS SOURCES:
-{json.dumps(context_data["requirements_sources"], indent=2)}
-
-KEY CODE FILES:
-{json.dumps(context_data["code_files"], indent=2)}
-
-SUMMARY OF INCLUDED/SKIPPED/CHUNKED FILES:
-{json.dumps(context_data.get('summary', {}), indent=2)}
+"""
+        yield from self._iter_json_section(context_data["directory_structure"])
+        yield "\n\nREQUIREMENTS SOURCES:\n"
+        yield from self._iter_json_section(context_data["requirements_sources"])
+        yield "\n\nKEY CODE FILES:\n"
+        yield from self._iter_json_section(context_data["code_files"])
+        yield "\n\nSUMMARY OF INCLUDED/SKIPPED/CHUNKED FILES:\n"
+        yield json.dumps(context_data.get('summary', {}), indent=2)
+        yield f"""
 
 EXPECTED OUTPUT STRUCTURE:
 
@@ -452,10 +1031,7 @@ Based on the ExtP analysis context provided above, please generate these three J
 === END REQUEST ===
 
 ---
-If this is part 1 of a multi-part prompt, the next part will be in a file named copilot_analysis_prompt_part2.txt in the same folder. Continue reading the next part for additional requirements/code context.
-"""
-        
-        return prompt.strip()
+If this is part 1 of a multi-part prompt, the next part will be in a file named copilot_analysis_prompt_part2.txt in the same folder. Continue reading the next part for additional requirements/code context."""
     
     def save_prompt_to_file(self, prompt, output_file):
         """Save the generated prompt to a file"""
@@ -488,8 +1064,13 @@ If this is part 1 of a multi-part prompt, the next part will be in a file named
         }
         return summary
 
-    def generate_multi_part_prompts(self, extp_path, requirements_file=None, requirements_folder=None, output_dir=None, base_filename="copilot_analysis_prompt.txt"):
-        """Generate multi-part prompts with semantic chunking for large requirements files"""
+    def generate_multi_part_prompts(self, extp_path, requirements_file=None, requirements_folder=None, output_dir=None, base_filename="copilot_analysis_prompt.txt", use_cache=True):
+        """Generate multi-part prompts with semantic chunking for large requirements files
+        
+        With use_cache, unchanged files are reused from the previous run,
+        part boundaries follow the previous run where they still fit, and
+        prompt_manifest.json in the run folder lists which parts changed.
+        """
         # Create a unique subfolder for each execution using timestamp
         unique_run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         if output_dir is None:
@@ -499,19 +1080,22 @@ If this is part 1 of a multi-part prompt, the next part will be in a file named
         output_dir = os.path.join(base_output_dir, f"copilot_run_{unique_run_id}")
         os.makedirs(output_dir, exist_ok=True)
         print(f"[INFO] Writing all copilot_analysis_prompt*.txt files to unique subfolder: {output_dir}")
+        cache = PromptCache(os.path.join(base_output_dir, ".prompt_cache")) if use_cache else None
+        previous_run = cache.load_last_run() if cache else {}
 
-        print(f"[EXPLICIT DEBUG] extp_path argument received: {extp_path}")
+        self._debug(f"[EXPLICIT DEBUG] extp_path argument received: {extp_path}")
         if not os.path.exists(extp_path):
-            print(f"[EXPLICIT DEBUG] ERROR: extp_path does not exist: {extp_path}")
+            print(f"[ERROR] extp_path does not exist: {extp_path}")
         else:
-            print(f"[EXPLICIT DEBUG] extp_path exists and is a directory: {os.path.isdir(extp_path)}")
+            self._debug(f"[EXPLICIT DEBUG] extp_path exists and is a directory: {os.path.isdir(extp_path)}")
 
         # Always dynamically generate the directory structure
         directory_structure = self.generate_directory_structure(extp_path)
-        print("[EXPLICIT DEBUG] Full directory structure as JSON:")
-        print(json.dumps(directory_structure, indent=2))
-        print("\n[DEVELOPER VALIDATION] Full ExtP directory structure (tree):")
-        self.print_full_directory_structure(extp_path)
+        if self.verbose:
+            print("[EXPLICIT DEBUG] Full directory structure as JSON:")
+            print(json.dumps(directory_structure, indent=2))
+            print("\n[DEVELOPER VALIDATION] Full ExtP directory structure (tree):")
+            self.print_full_directory_structure(extp_path)
 
         # Discover requirements sources
         requirements_sources = self.discover_requirements_sources(
@@ -520,86 +1104,96 @@ If this is part 1 of a multi-part prompt, the next part will be in a file named
         # Scan codebase
         important_files = self.scan_extp_codebase(extp_path)
 
-        # Batch requirements sources with semantic chunking for markdown
-        req_batches = []
-        req_batch = {}
-        req_batch_size = 0
+        # Load, chunk and spool every entry; only the measurements stay in memory
+        spool = PromptEntrySpool()
+        req_items = []
+        code_items = []
+        entry_hashes = {}
         included_files = []
         skipped_files = []
         chunked_files = []
-        for source_type, filepath in requirements_sources:
-            ext = os.path.splitext(filepath)[1].lower()
-            if ext in [".md", ".markdown"]:
-                # Use semantic chunking for markdown
-                chunks = self._chunk_markdown_file(filepath, max_chunk_size=self.max_file_size)
-                for i, chunk in enumerate(chunks):
-                    chunk_id = f"{os.path.relpath(filepath, extp_path)}::chunk_{i+1}"
-                    chunk_meta = {
-                        "source_type": source_type,
-                        "chunk_index": i+1,
-                        "total_chunks": len(chunks),
-                        "content": chunk
-                    }
-                    chunk_len = len(chunk)
-                    if chunk_len > self.max_file_size:
-                        chunked_files.append(chunk_id)
-                    included_files.append(chunk_id)
-                    req_batch[chunk_id] = chunk_meta
-                    req_batch_size += chunk_len
-                    if req_batch_size > self.total_context_limit:
-                        req_batches.append(req_batch)
-                        req_batch = {}
-                        req_batch_size = 0
-                if req_batch:
-                    req_batches.append(req_batch)
-                    req_batch = {}
-                    req_batch_size = 0
-            else:
-                # Non-markdown: treat as a single chunk, but truncate if too large
-                content = self.read_file_safely(filepath)
-                rel_path = os.path.relpath(filepath, extp_path)
-                content_len = len(content)
-                if content_len > self.max_file_size:
-                    chunked_files.append(rel_path)
-                included_files.append(rel_path)
-                req_batch[rel_path] = {
-                    "source_type": source_type,
-                    "chunk_index": 1,
-                    "total_chunks": 1,
-                    "content": content
-                }
-                req_batch_size += content_len
-                if req_batch_size > self.total_context_limit:
-                    req_batches.append(req_batch)
-                    req_batch = {}
-                    req_batch_size = 0
-        if req_batch:
-            req_batches.append(req_batch)
-
-        # Now batch code files (unchanged for now, but can add chunking for code later)
-        code_file_batches = []
-        code_batch = {}
-        code_batch_size = 0
-        for filepath in important_files:
-            content = self.read_file_safely(filepath)
-            rel_path = os.path.relpath(filepath, extp_path)
-            content_len = len(content)
-            if code_batch_size + content_len > self.total_context_limit and code_batch:
-                code_file_batches.append(code_batch)
-                code_batch = {}
-                code_batch_size = 0
-            code_batch[rel_path] = content
-            code_batch_size += content_len
-        if code_batch:
-            code_file_batches.append(code_batch)
 
-        # Calculate total parts
-        total_parts = len(req_batches) + len(code_file_batches)
-        is_multi_part = total_parts > 1
+        def add_entry(items, key, value, hash_value=None):
+            # A markdown chunk is not considered changed just because its file gained or lost chunks elsewhere
+            entry_hashes[key] = self._content_hash(value if hash_value is None else hash_value)
+            items.append((key,) + self._measure(spool.add(key, value) + ",\n"))
+
+        source_kinds = [(filepath, "markdown" if os.path.splitext(filepath)[1].lower() in [".md", ".markdown"] else "text")
+                        for _, filepath in requirements_sources]
+        source_kinds += [(filepath, self._code_file_kind(filepath)) for filepath in important_files]
+        source_types = [source_type for source_type, _ in requirements_sources]
+        for index, (filepath, content) in enumerate(self._iter_sources(source_kinds, cache)):
+            rel_path = os.path.relpath(filepath, extp_path)
+            if index < len(source_types):
+                source_type = source_types[index]
+                if source_kinds[index][1] == "markdown":
+                    # Use semantic chunking for markdown
+                    for i, chunk in enumerate(content):
+                        chunk_id = f"{rel_path}::chunk_{i+1}"
+                        chunk_meta = {"source_type": source_type, "chunk_index": i+1, "total_chunks": len(content)}
+                        if len(chunk) > self.max_file_size:
+                            chunked_files.append(chunk_id)
+                        included_files.append(chunk_id)
+                        add_entry(req_items, chunk_id, dict(chunk_meta, content=chunk),
+                                  {"source_type": source_type, "chunk_index": i+1, "content": chunk})
+                else:
+                    # Non-markdown: treat as a single chunk, but truncate if too large
+                    if len(content) > self.max_file_size:
+                        chunked_files.append(rel_path)
+                    included_files.append(rel_path)
+                    chunk_meta = {"source_type": source_type, "chunk_index": 1, "total_chunks": 1, "content": content}
+                    add_entry(req_items, rel_path, chunk_meta, {k: v for k, v in chunk_meta.items() if k != "total_chunks"})
+            elif isinstance(content, list):
+                # Large Python files arrive as statement-based chunks
+                chunked_files.append(rel_path)
+                for i, chunk in enumerate(content):
+                    add_entry(code_items, f"{rel_path}::chunk_{i+1}", chunk)
+            else:
+                add_entry(code_items, rel_path, content)
 
         # Add summary to each context_data
         summary = self.generate_summary(included_files, skipped_files, chunked_files)
 
+        # Pack requirements and code into as few parts as the token budget allows.
+        # The first requirements part also carries the instructions and directory structure.
+        def first_part_metadata(total_parts):
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "version": self.version,
+                "extp_path": str(extp_path),
+                "generator": "ExtPRequirementsGenerator",
+                "is_multi_part": total_parts > 1,
+                "total_parts": total_parts
+            }
+
+        first_overhead = self._measure(self._build_prompt_template({
+            "metadata": first_part_metadata(0),
+            "directory_structure": directory_structure,
+            "requirements_sources": {},
+            "code_files": {},
+            "summary": summary
+        }))
+        empty_part = {"requirements_sources": {}, "code_files": {}, "summary": summary}
+        req_overhead = self._measure(self._build_requirements_continuation_prompt_template(empty_part, 99))
+        code_overhead = self._measure(self._build_continuation_prompt_template(empty_part, 99))
+        previous_hashes = previous_run.get("entries", {})
+        changed_keys = {key for key, entry_hash in entry_hashes.items() if previous_hashes.get(key) != entry_hash}
+        previous_parts = previous_run.get("parts", [])
+        req_batches = self._pack_parts(
+            req_items, req_overhead, first_overhead,
+            [part["keys"] for part in previous_parts if part["kind"] == "requirements"]
+        )
+        code_file_batches = self._pack_parts(
+            code_items, code_overhead, None,
+            [part["keys"] for part in previous_parts if part["kind"] == "code"]
+        )
+
+        # Calculate total parts
+        total_parts = len(req_batches) + len(code_file_batches)
+        print(f"[INFO] Packed {len(req_items)} requirements chunks and {len(code_items)} code files into "
+              f"{total_parts} part(s) of at most {self.max_prompt_tokens:,} tokens / {self.max_prompt_bytes:,} bytes "
+              f"({self.token_counter.describe()})")
+
         # Interleave requirements and code files in batching
         interleaved_batches = []
         max_batches = max(len(req_batches), len(code_file_batches))
@@ -608,69 +1202,199 @@ If this is part 1 of a multi-part prompt, the next part will be in a file named
                 interleaved_batches.append(("requirements", req_batches[i]))
             if i < len(code_file_batches):
                 interleaved_batches.append(("code", code_file_batches[i]))
-        # Write each batch as a separate prompt file (interleaved)
+        # Stream each batch from the spool into a separate prompt file (interleaved)
         prompt_files = []
+        manifest_parts = []
         part_number = 1
         for batch_type, batch in interleaved_batches:
-            if batch_type == "requirements":
-                context_data = {
-                    "metadata": {
-                        "timestamp": datetime.now().isoformat(),
-                        "version": self.version,
-                        "extp_path": str(extp_path),
-                        "generator": "ExtPRequirementsGenerator",
-                        "is_multi_part": is_multi_part,
-                        "total_parts": len(interleaved_batches)
-                    },
-                    # Always include the up-to-date directory structure in the first file
-                    "directory_structure": directory_structure if part_number == 1 else {},
-                    "requirements_sources": batch,
+            filename = base_filename if part_number == 1 else base_filename.replace(".txt", f"_part{part_number}.txt")
+            output_path = os.path.join(output_dir, filename)
+            if batch_type == "requirements" and part_number == 1:
+                # Always include the up-to-date directory structure in the first file
+                pieces = self._iter_prompt_template({
+                    "metadata": first_part_metadata(len(interleaved_batches)),
+                    "directory_structure": directory_structure,
+                    "requirements_sources": spool.iter_object(batch),
                     "code_files": {},
-                    "total_context_size": sum(len(v["content"]) for v in batch.values()),
                     "summary": summary
-                }
-                if part_number == 1:
-                    print("[EXPLICIT DEBUG] DIRECTORY STRUCTURE being written to prompt file:")
-                    print(json.dumps(context_data["directory_structure"], indent=2))
-                    prompt = self._build_prompt_template(context_data)
-                    filename = base_filename
-                else:
-                    prompt = self._build_requirements_continuation_prompt_template(context_data, part_number)
-                    filename = base_filename.replace(".txt", f"_part{part_number}.txt")
+                })
             else:
-                context_data = {
-                    "metadata": {
-                        "is_multi_part": is_multi_part,
-                        "total_parts": len(interleaved_batches)
-                    },
-                    "directory_structure": {},
-                    "requirements_sources": {},
-                    "code_files": batch,
-                    "total_context_size": sum(len(v) for v in batch.values()),
-                    "summary": summary
-                }
-                prompt = self._build_continuation_prompt_template(context_data, part_number)
-                filename = base_filename.replace(".txt", f"_part{part_number}.txt")
-            output_path = os.path.join(output_dir, filename)
-            self.save_prompt_to_file(prompt, output_path)
+                section_title = "REQUIREMENTS SOURCES" if batch_type == "requirements" else "KEY CODE FILES"
+                pieces = self._iter_continuation_prompt_template(
+                    section_title, spool.iter_object(batch), {"summary": summary}, part_number
+                )
+            tokens, size = self._write_prompt(output_path, pieces)
             prompt_files.append(output_path)
+            print(f"[INFO] Part {part_number}: {tokens:,} tokens, {size:,} bytes")
+            manifest_parts.append({
+                "part": part_number,
+                "file": filename,
+                "kind": batch_type,
+                "keys": batch,
+                "payload_hash": self._content_hash(
+                    [[[key, entry_hashes[key]] for key in batch], directory_structure if part_number == 1 else {}]
+                ),
+                "changed_entries": sorted(changed_keys.intersection(batch)),
+                "tokens": tokens,
+                "bytes": size
+            })
             part_number += 1
+        spool.close()
         print(f"\n📝 Multi-part prompts written: {prompt_files}")
+
+        self._write_prompt_manifest(output_dir, manifest_parts, previous_run, entry_hashes)
+        if cache:
+            print(f"[INFO] Prompt cache: {cache.hits} files reused, {cache.misses} re-read")
+            cache.save({
+                "run_dir": output_dir,
+                "timestamp": datetime.now().isoformat(),
+                "entries": entry_hashes,
+                "parts": manifest_parts,
+                "source_files": [filepath for filepath, _ in source_kinds]
+            })
         return prompt_files
 
+    @staticmethod
+    def _content_hash(value):
+        return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _write_prompt_manifest(self, output_dir, parts, previous_run, entry_hashes):
+        """Write prompt_manifest.json saying which parts changed since the previous run
+        
+        A part is unchanged when a part with identical content (entries, and
+        the directory structure for part 1) was produced by the previous run,
+        possibly under another part number; only changed and new parts need
+        to be resubmitted to the LLM.
+        """
+        previous_parts = {part["payload_hash"]: part for part in previous_run.get("parts", [])}
+        for part in parts:
+            previous_part = previous_parts.get(part["payload_hash"])
+            if not previous_run:
+                part["status"] = "new"
+            elif previous_part:
+                part["status"] = "unchanged"
+                part["previous_part"] = previous_part["part"]
+            else:
+                part["status"] = "changed"
+        changed_files = [part["file"] for part in parts if part["status"] != "unchanged"]
+        manifest = {
+            "timestamp": datetime.now().isoformat(),
+            "previous_run": previous_run.get("run_dir"),
+            "changed_parts": changed_files,
+            "removed_entries": sorted(set(previous_run.get("entries", {})) - set(entry_hashes)),
+            "parts": parts
+        }
+        manifest_path = os.path.join(output_dir, "prompt_manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        if previous_run:
+            print(f"🔁 {len(changed_files)} of {len(parts)} parts changed since the previous run: {changed_files}")
+        print(f"📋 Prompt manifest saved to: {manifest_path}")
+
+    def _write_prompt(self, output_path, pieces):
+        """Write a prompt to output_path piece by piece; returns its (tokens, bytes)"""
+        tokens = size = 0
+        block = []  # pieces are measured in blocks of about 64KB
+        block_size = 0
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for piece in pieces:
+                f.write(piece)
+                block.append(piece)
+                block_size += len(piece)
+                if block_size >= 65536:
+                    block_tokens, block_bytes = self._measure("".join(block))
+                    tokens, size = tokens + block_tokens, size + block_bytes
+                    block, block_size = [], 0
+            if block:
+                block_tokens, block_bytes = self._measure("".join(block))
+                tokens, size = tokens + block_tokens, size + block_bytes
+        print(f"💾 Prompt saved to: {output_path}")
+        return tokens, size
+
+    def _measure(self, text):
+        """Return (tokens, bytes) of a piece of prompt text"""
+        return self.token_counter.count(text), len(text.encode("utf-8"))
+
+    def _pack_parts(self, items, overhead, first_overhead=None, previous_parts=None):
+        """Pack (key, tokens, bytes) prompt entries into parts in order; returns each part's keys
+        
+        Entries are measured as they are serialized into the prompt and filled
+        into parts in their given order (next-fit), so the ranked file order
+        and the sequence of a file's chunks are kept and the parts can be read
+        one after another. Each part stays within max_prompt_tokens and
+        max_prompt_bytes once the part's template overhead (tokens, bytes) is
+        added; first_overhead applies to the first part instead, which also
+        carries the instructions. An entry too large for any part gets a part
+        of its own.
+        
+        With previous_parts (the keys of each part of the previous run), parts
+        are also closed where a previous part started, so an edit to one file
+        does not shift every later part boundary - unless that would take more
+        parts than plain next-fit.
+        """
+        if first_overhead and (self.max_prompt_tokens <= first_overhead[0] or self.max_prompt_bytes <= first_overhead[1]):
+            print(f"[WARNING] The first part's template alone takes {first_overhead[0]:,} tokens / "
+                  f"{first_overhead[1]:,} bytes; it will carry no other content")
+
+        def pack(boundaries):
+            parts = []
+            room = None
+
+            def open_part():
+                part_overhead = first_overhead if not parts and first_overhead else overhead
+                parts.append([])
+                return [self.max_prompt_tokens - part_overhead[0], self.max_prompt_bytes - part_overhead[1]]
+
+            if first_overhead:
+                room = open_part()
+            for key, tokens, size in items:
+                fits = room is not None and tokens <= room[0] and size <= room[1]
+                if room is None or (parts[-1] and (not fits or key in boundaries)):
+                    room = open_part()
+                elif not parts[-1] and not fits and len(parts) == 1 and first_overhead:
+                    # The first part carries the instructions; it stays, possibly empty
+                    room = open_part()
+                if tokens > room[0] or size > room[1]:
+                    print(f"[WARNING] {key} ({tokens:,} tokens) exceeds the per-part budget; "
+                          f"it gets a part of its own")
+                room[0] -= tokens
+                room[1] -= size
+                parts[-1].append(key)
+            return parts
+
+        packed = pack(set())
+        previous_starts = {keys[0] for keys in previous_parts or [] if keys}
+        if previous_starts:
+            sticky = pack(previous_starts)
+            if len(sticky) <= len(packed):
+                packed = sticky
+        return packed
+
     def _build_requirements_continuation_prompt_template(self, context_data, part_number):
         """Build a continuation prompt template for additional requirements sources"""
-        prompt = f"""
-=== GITHUB COPILOT: ExtP REQUIREMENTS ANALYSIS CONTINUATION (PART {part_number}) ===\n\nThis is a continuation. Please use this together with the previous part(s) for full context.\n\nREQUIREMENTS SOURCES (CONTINUED):\n{json.dumps(context_data["requirements_sources"], indent=2)}\n\nSUMMARY OF INCLUDED/SKIPPED/CHUNKED FILES:\n{json.dumps(context_data.get('summary', {}), indent=2)}\n\n(Do not repeat instructions. Continue as if this is appended to the previous prompt.)\n---\nIf there is another part, continue reading the next file (copilot_analysis_prompt_part{part_number+1}.txt) for more context.\n"""
-        return prompt.strip()
+        return "".join(self._iter_continuation_prompt_template(
+            "REQUIREMENTS SOURCES", context_data["requirements_sources"], context_data, part_number
+        ))
 
     def _build_continuation_prompt_template(self, context_data, part_number):
         """Build a continuation prompt template for additional code files"""
-        prompt = f"""
-=== GITHUB COPILOT: ExtP REQUIREMENTS ANALYSIS CONTINUATION (PART {part_number}) ===\n\nThis is a continuation. Please use this together with the previous part(s) for full context.\n\nKEY CODE FILES (CONTINUED):\n{json.dumps(context_data['code_files'], indent=2)}\n\nSUMMARY OF INCLUDED/SKIPPED/CHUNKED FILES:\n{json.dumps(context_data.get('summary', {}), indent=2)}\n\n(Do not repeat instructions. Continue as if this is appended to the previous prompt.)\n---\nIf there is another part, continue reading the next file (copilot_analysis_prompt_part{part_number+1}.txt) for more context.\n"""
-        return prompt.strip()
+        return "".join(self._iter_continuation_prompt_template(
+            "KEY CODE FILES", context_data["code_files"], context_data, part_number
+        ))
+
+    def _iter_continuation_prompt_template(self, section_title, section, context_data, part_number):
+        """Yield a continuation prompt in pieces, streaming its JSON section"""
+        yield (f"=== GITHUB COPILOT: ExtP REQUIREMENTS ANALYSIS CONTINUATION (PART {part_number}) ===\n\n"
+               f"This is a continuation. Please use this together with the previous part(s) for full context.\n\n"
+               f"{section_title} (CONTINUED):\n")
+        yield from self._iter_json_section(section)
+        yield (f"\n\nSUMMARY OF INCLUDED/SKIPPED/CHUNKED FILES:\n{json.dumps(context_data.get('summary', {}), indent=2)}\n\n"
+               f"(Do not repeat instructions. Continue as if this is appended to the previous prompt.)\n---\n"
+               f"If there is another part, continue reading the next file (copilot_analysis_prompt_part{part_number+1}.txt) for more context.")
 
-def load_llm_limits(llm_name, config_path="llm_limits.json"):
+def load_llm_limits(llm_name, config_path=None):
+    if config_path is None:
+        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_limits.json")
     with open(config_path, "r", encoding="utf-8") as f:
         limits = json.load(f)
     if llm_name not in limits:
@@ -709,6 +1433,26 @@ def main():
         default="prompt_metadata.json",
         help="Output file for context metadata"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rebuild every prompt part instead of reusing unchanged content from the previous run"
+    )
+    parser.add_argument(
+        "--index-db",
+        default="extP_index.db",
+        help="ExtP index database used to rank code files by relevance (built or refreshed as needed)"
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Rank code files by name patterns only, without the ExtP index"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print per-file debug output and full directory structure dumps"
+    )
     parser.add_argument(
         "--llm",
         default="gpt-4o",
@@ -717,21 +1461,22 @@ def main():
     args = parser.parse_args()
     # Load LLM limits
     llm_limits = load_llm_limits(args.llm)
-    # Set batching/chunking limits from config
-    ExtPRequirementsGenerator.max_file_size = llm_limits["recommended_prompt_bytes"] // 8  # e.g. 1/8th of prompt
-    ExtPRequirementsGenerator.total_context_limit = llm_limits["recommended_prompt_bytes"]
     # Validate ExtP path
     if not os.path.exists(args.extp_path):
         print(f"❌ Error: ExtP path does not exist: {args.extp_path}")
         return 1
-    generator = ExtPRequirementsGenerator(exclude_patterns=args.exclude_patterns)
+    generator = ExtPRequirementsGenerator(
+        exclude_patterns=args.exclude_patterns, llm_name=args.llm, llm_limits=llm_limits,
+        verbose=args.verbose, index_path=None if args.no_index else args.index_db
+    )
     try:
         generator.generate_multi_part_prompts(
             extp_path=args.extp_path,
             requirements_file=args.requirements_file,
             requirements_folder=args.requirements_folder,
             output_dir=os.path.join(os.getcwd(), "ExternalProjectPrompts"),
-            base_filename=os.path.basename(args.output_prompt)
+            base_filename=os.path.basename(args.output_prompt),
+            use_cache=not args.no_cache
         )
         print("\n✅ SUCCESS!")
         print("Next steps:")
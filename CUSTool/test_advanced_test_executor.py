@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Checks for AdvancedTestExecutor scheduling and reporting
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from AdvancedTestExecutor import AdvancedTestExecutor, render_execution_report
+from EnhancedTestCaseGenerator import EnhancedTestCaseGenerator, TestCase as CaseDefinition
+
+
+def _case(test_id, *preconditions):
+    return CaseDefinition(
+        id=test_id,
+        title=f"Scheduling check {test_id}",
+        description="",
+        requirement_ids=["REQ-001"],
+        anchor_types=[],
+        preconditions=list(preconditions),
+        test_steps=[],
+        expected_results=[]
+    )
+
+
+def _executor(root, cases, max_workers=4):
+    """Executor over cases that writes everything under root"""
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        generator = EnhancedTestCaseGenerator(requirements_file="requirements.json", output_dir="TestCases")
+        generator.test_cases = {case.id: case for case in cases}
+        return AdvancedTestExecutor(generator, max_workers=max_workers, session_settle_seconds=0)
+    finally:
+        os.chdir(cwd)
+
+
+def _timed(executor, hold_seconds=0.05):
+    """Record (start, end) of every test the executor runs"""
+    spans = {}
+    execute = executor._execute_single_test
+
+    def timed_execute(test_case, uses_extp=False):
+        started = time.time()
+        time.sleep(hold_seconds)
+        execution = execute(test_case, uses_extp)
+        spans[test_case.id] = (started, time.time())
+        return execution
+
+    executor._execute_single_test = timed_execute
+    return spans
+
+
+def test_dependencies_run_first():
+    """A test waits for every test named in its preconditions; independent tests overlap"""
+    with tempfile.TemporaryDirectory() as root:
+        cases = [
+            _case("TC-REQ-report", "TC-REQ-login passed", "TC-REQ-config passed"),
+            _case("TC-REQ-login", "CUS is running"),
+            _case("TC-REQ-config", "CUS is running"),
+            _case("TC-REQ-other", "TC-REQ-unknown passed")
+        ]
+        executor = _executor(root, cases)
+        executor.results_dir = root
+        executor.execution_log_path = os.path.join(root, "execution_log.jsonl")
+        spans = _timed(executor)
+
+        executions = executor.execute_all_tests()
+
+        assert list(executions) == [case.id for case in cases]
+        assert spans["TC-REQ-report"][0] >= max(spans["TC-REQ-login"][1], spans["TC-REQ-config"][1])
+        assert spans["TC-REQ-login"][0] < spans["TC-REQ-config"][1], "independent tests should run concurrently"
+        print("✅ Dependencies run first")
+
+
+def test_extp_tests_never_overlap():
+    """Tests that drive ExtP hold it exclusively; other tests still run alongside them"""
+    with tempfile.TemporaryDirectory() as root:
+        cases = [_case(f"TC-INT-{i}", "ExtP is available") for i in range(4)]
+        cases.append(_case("TC-REQ-offline", "CUS is running"))
+        executor = _executor(root, cases)
+        executor.results_dir = root
+        executor.execution_log_path = os.path.join(root, "execution_log.jsonl")
+        spans = _timed(executor)
+
+        executions = executor.execute_all_tests()
+
+        extp_spans = sorted(spans[f"TC-INT-{i}"] for i in range(4))
+        for (_, previous_end), (next_start, _) in zip(extp_spans, extp_spans[1:]):
+            assert next_start >= previous_end, "ExtP tests overlapped"
+        assert spans["TC-REQ-offline"][0] < extp_spans[-1][0]
+        assert executions["TC-INT-0"].execution_context["extp_exclusive"]
+        assert "extp_exclusive" not in executions["TC-REQ-offline"].execution_context
+        assert not executor._extp_lock.locked()
+        print("✅ ExtP tests never overlap")
+
+
+def _execution_record(test_id, result, false_negatives=0):
+    return {
+        "type": "execution",
+        "test_case_id": test_id,
+        "start_time": "2026-01-01T10:00:00",
+        "end_time": "2026-01-01T10:00:01",
+        "result": result,
+        "logs": [f"log {i}" for i in range(8)],
+        "false_negatives": [{
+            "test_case_id": test_id, "trigger_pattern": "already configured", "expected_response": "menu",
+            "actual_response": "bypass", "confidence_level": 0.9, "detection_method": "pattern_matching",
+            "timestamp": "2026-01-01T10:00:00"
+        }] * false_negatives,
+        "execution_context": {}
+    }
+
+
+def _write_log(path, records, trailer=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(trailer)
+
+
+def test_report_renders_partial_log_in_suite_order():
+    """An interrupted run's log renders in suite order, skipping the truncated last line"""
+    with tempfile.TemporaryDirectory() as root:
+        log_path = os.path.join(root, "execution_log.jsonl")
+        _write_log(log_path, [
+            {"type": "suite_start", "timestamp": "2026-01-01T10:00:00", "total_tests": 4, "suite_size": 10,
+             "workers": 4, "test_order": ["TC-A", "TC-B", "TC-C", "TC-D"]},
+            _execution_record("TC-C", "false_negative", false_negatives=2),
+            _execution_record("TC-A", "success"),
+            _execution_record("TC-B", "failure"),
+        ], trailer='{"type": "execution", "test_case_id": "TC-D", "res')
+
+        report_path = render_execution_report(log_path, root)
+        with open(report_path, encoding="utf-8") as f:
+            report = f.read()
+        with open(os.path.join(root, "execution_results.json"), encoding="utf-8") as f:
+            results = json.load(f)
+
+        assert "Status: PARTIAL RUN - 3 of 4 tests recorded" in report
+        assert "Selection: 4 of 10 test cases" in report
+        assert "- Total Tests: 3\n- Passed: 1\n- Failed: 1\n- False Negatives Detected: 1\n" in report
+        assert "Total False Negatives Detected: 2" in report
+        detailed = report.split("## Detailed Test Results")[1]
+        assert [detailed.index(f"### {test_id}") for test_id in ("TC-A", "TC-B", "TC-C")] == \
+            sorted(detailed.index(f"### {test_id}") for test_id in ("TC-A", "TC-B", "TC-C"))
+        assert "log 2" not in detailed and "log 7" in detailed, "only the last five log lines are shown"
+
+        assert list(results["executions"]) == ["TC-A", "TC-B", "TC-C"]
+        assert results["summary"]["complete"] is False
+        assert results["executions"]["TC-C"]["false_negatives_count"] == 2
+        print("✅ Partial log renders in suite order")
+
+
+def test_report_from_completed_run():
+    """A finished run reports its wall time; the executor's own log renders the same way"""
+    with tempfile.TemporaryDirectory() as root:
+        cases = [_case("TC-REQ-b", "TC-REQ-a passed"), _case("TC-REQ-a", "CUS is running")]
+        executor = _executor(root, cases)
+        executor.results_dir = root
+        executor.execution_log_path = os.path.join(root, "execution_log.jsonl")
+        executor.execute_all_tests()
+
+        with open(os.path.join(root, "execution_report.md"), encoding="utf-8") as f:
+            report = f.read()
+        with open(os.path.join(root, "execution_results.json"), encoding="utf-8") as f:
+            results = json.load(f)
+        assert "Wall Time:" in report and "PARTIAL RUN" not in report and "Selection:" not in report
+        assert report.index("### TC-REQ-b") < report.index("### TC-REQ-a")
+        assert results["summary"] == {"total_tests": 2, "passed": 2, "failed": 0, "false_negatives": 0,
+                                      "success_rate": 100.0, "complete": True}
+        print("✅ Completed run report")
+
+
+if __name__ == "__main__":
+    print("Testing AdvancedTestExecutor...")
+    test_dependencies_run_first()
+    test_extp_tests_never_overlap()
+    test_report_renders_partial_log_in_suite_order()
+    test_report_from_completed_run()
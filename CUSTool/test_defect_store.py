@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Checks for the SQLite defect store
+"""
+
+import os
+import tempfile
+
+from DefectStore import DefectStore
+
+
+def _metadata(issue_id, run, fingerprint, severity="error", failure_type="CUS_Failure",
+              count=1, first_seen="2026-01-01T10:00:00", last_seen=None):
+    return {
+        "issue_id": issue_id,
+        "test_run_id": run,
+        "fingerprint": fingerprint,
+        "severity": severity,
+        "failure_type": failure_type,
+        "test_case_name": "Menu Navigation",
+        "test_sequence_id": "seq-1",
+        "failure_step": 2,
+        "error_details": {"error_message": f"{issue_id} failed"},
+        "occurrences": {"count": count, "first_seen": first_seen, "last_seen": last_seen or first_seen}
+    }
+
+
+def test_upsert_updates_occurrences_in_place():
+    """A repeat of an issue updates its count, last_seen and report, keeping first_seen"""
+    with tempfile.TemporaryDirectory() as root:
+        store = DefectStore(os.path.join(root, "defects.db"))
+        try:
+            store.upsert_issue(_metadata("ISSUE-1", "run-1", "fp-a"), "ISSUE-1.md")
+            store.upsert_issue(_metadata("ISSUE-1", "run-1", "fp-a", count=4, first_seen="2026-01-01T10:05:00",
+                                         last_seen="2026-01-01T10:30:00"), "ISSUE-1-v2.md")
+
+            issues = store.query()
+            assert len(issues) == 1
+            assert issues[0]["occurrence_count"] == 4
+            assert issues[0]["first_seen"] == "2026-01-01T10:00:00"
+            assert issues[0]["last_seen"] == "2026-01-01T10:30:00"
+            assert issues[0]["markdown_path"] == "ISSUE-1-v2.md"
+            assert issues[0]["error_message"] == "ISSUE-1 failed"
+        finally:
+            store.close()
+        print("✅ Upsert updates occurrences in place")
+
+
+def test_query_filters_and_counts():
+    """Filters are case-insensitive and combine with time bounds; counts group by indexed columns"""
+    with tempfile.TemporaryDirectory() as root:
+        store = DefectStore(os.path.join(root, "defects.db"))
+        try:
+            store.upsert_issue(_metadata("ISSUE-1", "run-1", "fp-a", "warning", "OCR_Mismatch", count=3,
+                                         first_seen="2026-01-01T10:00:00"))
+            store.upsert_issue(_metadata("ISSUE-2", "run-1", "fp-b", "error", "CUS_Failure",
+                                         first_seen="2026-01-01T11:00:00"))
+            store.upsert_issue(_metadata("ISSUE-3", "run-2", "fp-c", "warning", "OCR_Mismatch",
+                                         first_seen="2026-01-02T09:00:00"))
+
+            assert [issue["issue_id"] for issue in store.query(failure_type="ocr_mismatch")] == ["ISSUE-3", "ISSUE-1"]
+            assert [issue["issue_id"] for issue in store.query(test_run_id="run-1", severity="WARNING")] == ["ISSUE-1"]
+            assert [issue["issue_id"] for issue in store.query(since="2026-01-01T10:30:00",
+                                                               until="2026-01-01T23:59:59")] == ["ISSUE-2"]
+            assert len(store.query(limit=2)) == 2
+
+            counts = {row["value"]: (row["issues"], row["occurrences"]) for row in store.count_by("failure_type")}
+            assert counts == {"OCR_Mismatch": (2, 4), "CUS_Failure": (1, 1)}
+            try:
+                store.count_by("error_message")
+                assert False, "grouping by an unindexed column should fail"
+            except ValueError:
+                pass
+        finally:
+            store.close()
+        print("✅ Query filters and counts")
+
+
+def test_compare_runs():
+    """Fingerprints are classified as new, resolved or persisting between runs"""
+    with tempfile.TemporaryDirectory() as root:
+        store = DefectStore(os.path.join(root, "defects.db"))
+        try:
+            for issue_id, run, fingerprint in [("A1", "run-1", "fp-a"), ("B1", "run-1", "fp-b"),
+                                               ("B2", "run-2", "fp-b"), ("C2", "run-2", "fp-c"),
+                                               ("C3", "run-2", "fp-c")]:
+                store.upsert_issue(_metadata(issue_id, run, fingerprint))
+
+            assert store.compare_runs("run-1", "run-2") == {
+                "new": ["fp-c"], "resolved": ["fp-a"], "persisting": ["fp-b"]
+            }
+            assert {run["test_run_id"]: run["issues"] for run in store.list_runs()} == {"run-1": 2, "run-2": 3}
+        finally:
+            store.close()
+        print("✅ Run comparison")
+
+
+if __name__ == "__main__":
+    print("Testing DefectStore...")
+    test_upsert_updates_occurrences_in_place()
+    test_query_filters_and_counts()
+    test_compare_runs()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Checks for ExtPIndexer against small scratch ExtP trees
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from ExtP_Indexer import ExtPIndexer, ExtPIndexWatcher, read_index_version
+
+
+def _write_tree(root, files):
+    """Write {relative path: text} into root"""
+    for rel_path, text in files.items():
+        path = Path(root, rel_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+
+
+def test_rebuild_keeps_item_content():
+    """A second full build over unchanged files must keep their content blobs"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, {
+            'app.py': 'def greet(name):\n    return input(f"Hello {name}, choose: ")\n',
+            'docs/spec.md': '# Spec\n1.1 The app greets the user\n1.2 The app asks for a choice\n'
+        })
+        cache_path = os.path.join(root, 'index.db')
+
+        for _ in range(2):
+            indexer = ExtPIndexer(root, cache_path)
+            indexer.build_full_index(max_workers=1)
+            indexer.db_connection.close()
+
+        indexer = ExtPIndexer(root, cache_path)
+        blobs = indexer.db_connection.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0]
+        greet = [item for item in indexer.query_index(query_type='function') if item.name == 'greet']
+        requirements = indexer.query_index(query_type='requirement')
+        try:
+            assert blobs == 2, f"expected one blob per file, found {blobs}"
+            assert greet and 'return input' in greet[0].content
+            assert requirements and all(item.context.startswith('# Spec') for item in requirements)
+        finally:
+            indexer.db_connection.close()
+        print("✅ Rebuild keeps item content")
+
+
+def test_manifest_change_detection():
+    """Only new, edited and deleted files are reported; a touched file is re-stamped, not re-indexed"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, {'same.py': 'A = 1\n', 'touched.py': 'B = 2\n', 'edited.py': 'C = 3\n',
+                           'gone.py': 'D = 4\n', 'notes.bin': 'skipped\n'})
+        indexer = ExtPIndexer(root, os.path.join(root, 'index.db'))
+        try:
+            indexer.build_full_index(max_workers=1)
+            assert indexer.check_for_changes() == []
+
+            touched = Path(root, 'touched.py')
+            os.utime(touched, ns=(touched.stat().st_atime_ns, touched.stat().st_mtime_ns + 10**9))
+            _write_tree(root, {'edited.py': 'C = 30\n', 'new.py': 'E = 5\n', 'notes.bin': 'changed\n'})
+            os.remove(os.path.join(root, 'gone.py'))
+
+            assert sorted(indexer.check_for_changes()) == ['edited.py', 'gone.py', 'new.py']
+            assert indexer._load_manifest(['touched.py'])['touched.py'][1] == touched.stat().st_mtime_ns
+
+            assert indexer.incremental_update() == {'updated': 1, 'added': 1, 'deleted': 1}
+            assert indexer.check_for_changes() == []
+        finally:
+            indexer.db_connection.close()
+        print("✅ Manifest change detection")
+
+
+def test_file_deleted_after_listing_is_reported_deleted():
+    """A manifest file that vanishes before it is stat'ed is treated as deleted, not an error"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, {'app.py': 'def first():\n    pass\n', 'other.py': 'X = 1\n'})
+        indexer = ExtPIndexer(root, os.path.join(root, 'index.db'))
+        try:
+            indexer.build_full_index(max_workers=1)
+            manifest = indexer._load_manifest()
+            os.remove(os.path.join(root, 'app.py'))
+
+            assert indexer._compare_with_manifest(['app.py', 'other.py'], manifest) == ['app.py']
+            assert indexer._apply_changes(['app.py'])['deleted'] == 1
+            assert 'app.py' not in indexer._load_manifest()
+            assert not indexer.query_index(query_type='function')
+        finally:
+            indexer.db_connection.close()
+        print("✅ Files deleted after listing are reported deleted")
+
+
+def test_numbered_sections_do_not_count_as_requirement_refs():
+    """Files full of numbers must not outrank code that cites structured requirement IDs"""
+    from generate_extp_requirements import ExtPRequirementsGenerator
+
+    with tempfile.TemporaryDirectory() as root:
+        extp = os.path.join(root, 'extp')
+        _write_tree(extp, {
+            'docs/spec.md': '# Spec\n1 Overview\n2 Scope\n7497 Port\n'
+                            '3.1 APP-1 The wizard asks for the broker\n3.2 DATA-2 Prices are cached\n',
+            'wizard.py': 'def run():\n    """Implements APP-1 and DATA-2"""\n    return 1\n',
+            'tests/test_numbers.py': 'def test_numbers():\n    assert [1, 2, 3] != [7497]\n'
+        })
+        files = [os.path.join(extp, 'tests', 'test_numbers.py'), os.path.join(extp, 'wizard.py')]
+        generator = ExtPRequirementsGenerator(index_path=os.path.join(root, 'index.db'))
+        ranked = generator.rank_files_by_relevance(extp, files)
+
+        assert ranked[0].endswith('wizard.py'), ranked
+        assert generator.relevance[files[0]][1].get('requirement_refs', 0) == 0
+        assert generator.relevance[files[1]][1]['requirement_refs'] == 2
+        print("✅ Only structured requirement IDs count as references")
+
+
+def test_query_index_matches_substrings():
+    """name_pattern and content_search match inside words, with and without FTS5"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, {'app.py': 'def load_config():\n    return read_settings_file()\n\n'
+                                     'def other():\n    pass\n'})
+        indexer = ExtPIndexer(root, os.path.join(root, 'index.db'))
+        try:
+            indexer.build_full_index(max_workers=1)
+            for fts_enabled in (indexer.fts_enabled, False):
+                indexer.fts_enabled = fts_enabled
+                by_name = indexer.query_index(query_type='function', name_pattern='onfig')
+                by_content = indexer.query_index(query_type='function', content_search='ettings_fi')
+                assert [item.name for item in by_name] == ['load_config'], fts_enabled
+                assert [item.name for item in by_content] == ['load_config'], fts_enabled
+        finally:
+            indexer.db_connection.close()
+        print("✅ query_index matches substrings")
+
+
+REL_TREE = {
+    'app.py': 'from lib import helper\n\n\ndef main():\n    helper()\n    return util()\n\n\n'
+              'def util():\n    return 1\n',
+    'lib.py': 'def helper():\n    return leaf()\n\n\ndef leaf():\n    return 2\n'
+}
+
+
+def _edges(indexer):
+    """Relationships as (from name, to name, type), independent of item IDs"""
+    return set(indexer.db_connection.execute("""
+        SELECT a.source_file || ':' || a.name, b.source_file || ':' || b.name, r.relationship_type
+        FROM relationships r
+        JOIN extP_index a ON a.id = r.from_item_id JOIN extP_index b ON b.id = r.to_item_id
+    """).fetchall())
+
+
+def _item_id(indexer, name):
+    return [item.id for item in indexer.query_index(name_pattern=name) if item.name == name][0]
+
+
+def test_relationship_traversal():
+    """traverse_relationships returns hop distances both ways and honours max_depth"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, REL_TREE)
+        indexer = ExtPIndexer(root, os.path.join(root, 'index.db'))
+        try:
+            indexer.build_full_index(max_workers=1)
+            names = lambda distances: {item.name: distances[item.id] for item in indexer._load_items(list(distances))}
+            main, leaf = _item_id(indexer, 'main'), _item_id(indexer, 'leaf')
+
+            assert names(indexer.traverse_relationships(main)) == {'helper': 1, 'util': 1, 'leaf': 2}
+            assert names(indexer.traverse_relationships(main, max_depth=1)) == {'helper': 1, 'util': 1}
+            assert names(indexer.traverse_relationships(leaf, direction='in')) == {'helper': 1, 'main': 2, 'app': 2}
+            assert {item.name for item in indexer.get_impacted_items(leaf, item_types=['function'])} == {'helper', 'main'}
+        finally:
+            indexer.db_connection.close()
+        print("✅ Relationship traversal")
+
+
+def test_incremental_relationships_match_full_build():
+    """After each edit, incrementally updated edges equal those of a fresh build"""
+    edits = [
+        {'lib.py': 'def helper():\n    return 3\n\n\ndef leaf():\n    return 2\n'},
+        {'tools.py': 'def util():\n    return leaf()\n\n\ndef leaf():\n    return 4\n'},
+        {'app.py': 'from lib import helper\n\n\ndef main():\n    helper()\n    return leaf()\n'},
+    ]
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, REL_TREE)
+        indexer = ExtPIndexer(root, os.path.join(root, 'index.db'))
+        try:
+            indexer.build_full_index(max_workers=1)
+            for edit in edits:
+                _write_tree(root, edit)
+                indexer.update_files(list(edit))
+                fresh = ExtPIndexer(root, os.path.join(root, 'fresh.db'))
+                fresh.build_full_index(max_workers=1)
+                try:
+                    assert _edges(indexer) == _edges(fresh), sorted(_edges(indexer) ^ _edges(fresh))
+                finally:
+                    fresh.db_connection.close()
+                os.remove(os.path.join(root, 'fresh.db'))
+
+            os.remove(os.path.join(root, 'lib.py'))
+            indexer.update_files(['lib.py'])
+            assert not any(edge[1].startswith('lib.py:') for edge in _edges(indexer))
+        finally:
+            indexer.db_connection.close()
+        print("✅ Incremental relationships match a full build")
+
+
+def _function_names(cache_path, root):
+    indexer = ExtPIndexer(root, cache_path)
+    try:
+        return {item.name for item in indexer.query_index(query_type='function')}
+    finally:
+        indexer.db_connection.close()
+
+
+def test_watcher_catches_up_debounces_and_stops():
+    """The polling watcher indexes offline edits on start, coalesces bursts and shuts down cleanly"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, {'app.py': 'def first():\n    pass\n'})
+        cache_path = os.path.join(root, 'index.db')
+        indexer = ExtPIndexer(root, cache_path)
+        indexer.build_full_index(max_workers=1)
+        indexer.db_connection.close()
+        built_version = read_index_version(cache_path)
+
+        # Changed while nobody was watching
+        _write_tree(root, {'offline.py': 'def offline():\n    pass\n'})
+
+        watcher = ExtPIndexWatcher(root, cache_path, debounce_seconds=0.2, poll_interval=60, use_polling=True)
+        watcher.start()
+        try:
+            assert watcher.wait_until_idle(10), "initial catch-up did not finish"
+            caught_up_version = read_index_version(cache_path)
+            assert caught_up_version == built_version + 1
+            assert 'offline' in _function_names(cache_path, root)
+
+            # A burst of saves is indexed in one update
+            for i in range(5):
+                _write_tree(root, {f'burst_{i}.py': f'def burst_{i}():\n    pass\n'})
+                watcher.notify_changed(os.path.join(root, f'burst_{i}.py'))
+            assert watcher.wait_until_idle(10), "burst was not indexed"
+            assert read_index_version(cache_path) == caught_up_version + 1
+            assert {f'burst_{i}' for i in range(5)} <= _function_names(cache_path, root)
+        finally:
+            watcher.stop()
+
+        assert watcher._thread is None
+        assert watcher.wait_until_idle(0)
+        print("✅ Watcher catches up, debounces and stops")
+
+
+def test_watcher_polling_picks_up_unreported_edits():
+    """Polling finds edits nobody reported through notify_changed"""
+    import time
+
+    with tempfile.TemporaryDirectory() as root:
+        _write_tree(root, {'app.py': 'def first():\n    pass\n'})
+        cache_path = os.path.join(root, 'index.db')
+        with ExtPIndexWatcher(root, cache_path, debounce_seconds=0.05, poll_interval=0.1,
+                              use_polling=True) as watcher:
+            assert watcher.wait_until_idle(10)
+            version = read_index_version(cache_path)
+            _write_tree(root, {'app.py': 'def second():\n    pass\n'})
+            deadline = time.time() + 10
+            while read_index_version(cache_path) == version and time.time() < deadline:
+                time.sleep(0.05)
+        assert read_index_version(cache_path) > version
+        assert 'second' in _function_names(cache_path, root)
+        print("✅ Polling picks up unreported edits")
+
+
+def test_watcher_without_watchdog_falls_back_to_polling():
+    """Asking for filesystem events without watchdog installed polls instead of failing"""
+    import ExtP_Indexer
+
+    available = ExtP_Indexer.WATCHDOG_AVAILABLE
+    ExtP_Indexer.WATCHDOG_AVAILABLE = False
+    try:
+        watcher = ExtPIndexWatcher(tempfile.gettempdir(), use_polling=False)
+    finally:
+        ExtP_Indexer.WATCHDOG_AVAILABLE = available
+    assert watcher.use_polling
+    print("✅ Watcher falls back to polling")
+
+
+if __name__ == "__main__":
+    print("Testing ExtPIndexer...")
+    test_rebuild_keeps_item_content()
+    test_manifest_change_detection()
+    test_file_deleted_after_listing_is_reported_deleted()
+    test_numbered_sections_do_not_count_as_requirement_refs()
+    test_query_index_matches_substrings()
+    test_relationship_traversal()
+    test_incremental_relationships_match_full_build()
+    test_watcher_catches_up_debounces_and_stops()
+    test_watcher_polling_picks_up_unreported_edits()
+    test_watcher_without_watchdog_falls_back_to_polling()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Checks for ExtPRequirementsGenerator prompt building
+"""
+
+import json
+import os
+import tempfile
+
+from generate_extp_requirements import ExtPRequirementsGenerator
+
+
+def _generator(max_tokens=100, max_bytes=1000):
+    generator = ExtPRequirementsGenerator()
+    generator.max_prompt_tokens = max_tokens
+    generator.max_prompt_bytes = max_bytes
+    return generator
+
+
+def test_parts_keep_entry_order():
+    """Parts are filled in entry order, so a file's chunks stay contiguous and sequential"""
+    generator = _generator()
+    items = [("README.md::chunk_1", 60, 100), ("README.md::chunk_2", 10, 100),
+             ("README.md::chunk_3", 50, 100), ("main.py", 30, 100), ("README.md::chunk_4", 80, 100)]
+    parts = generator._pack_parts(items, overhead=(10, 10), first_overhead=(20, 10))
+
+    assert [key for part in parts for key in part] == [key for key, _, _ in items]
+    assert parts == [["README.md::chunk_1", "README.md::chunk_2"],
+                     ["README.md::chunk_3", "main.py"],
+                     ["README.md::chunk_4"]]
+    print("✅ Parts keep entry order")
+
+
+def test_parts_stay_within_budget():
+    """Every part fits the token and byte budgets once its template overhead is added"""
+    generator = _generator(max_tokens=100, max_bytes=300)
+    items = [(f"file_{i}.py", 15 + i * 7 % 40, 40 + i * 13 % 90) for i in range(30)]
+    parts = generator._pack_parts(items, overhead=(10, 20))
+
+    sizes = {key: (tokens, size) for key, tokens, size in items}
+    for part in parts:
+        assert sum(sizes[key][0] for key in part) + 10 <= 100
+        assert sum(sizes[key][1] for key in part) + 20 <= 300
+    print("✅ Parts stay within budget")
+
+
+def test_oversized_entry_gets_own_part():
+    """An entry larger than the budget is still included, alone in its part"""
+    generator = _generator()
+    parts = generator._pack_parts([("a.py", 10, 10), ("huge.py", 500, 10), ("b.py", 10, 10)], overhead=(0, 0))
+    assert parts == [["a.py"], ["huge.py"], ["b.py"]]
+    print("✅ Oversized entry gets its own part")
+
+
+def test_previous_boundaries_are_kept_after_an_edit():
+    """Growing an entry in part 1 does not shift the boundaries of later parts"""
+    generator = _generator()
+    items = [(f"chunk_{i}", 30, 10) for i in range(9)]
+    previous = generator._pack_parts(items, overhead=(0, 0))
+    assert previous == [["chunk_0", "chunk_1", "chunk_2"], ["chunk_3", "chunk_4", "chunk_5"],
+                        ["chunk_6", "chunk_7", "chunk_8"]]
+
+    items[0] = ("chunk_0", 50, 10)
+    parts = generator._pack_parts(items, overhead=(0, 0), previous_parts=previous)
+    assert parts == [["chunk_0", "chunk_1"], ["chunk_2"]] + previous[1:]
+    assert [key for part in parts for key in part] == [key for key, _, _ in items]
+    print("✅ Previous part boundaries are kept")
+
+
+def test_standardized_prompt_stops_reading_at_context_limit():
+    """Files past the context limit are not read"""
+    with tempfile.TemporaryDirectory() as extp:
+        for i in range(60):
+            with open(os.path.join(extp, f"menu_{i:02d}_cli.py"), "w", encoding="utf-8") as f:
+                f.write(f"def menu_{i}():\n    return input('Choose: ')\n" + "# padding\n" * 90)
+        generator = ExtPRequirementsGenerator()
+        generator.max_file_size = 4096
+        generator.total_context_limit = 3000
+        generator.read_workers = 2
+        reads = []
+        read_file_safely = generator.read_file_safely
+        generator.read_file_safely = lambda filepath: reads.append(filepath) or read_file_safely(filepath)
+
+        _, context_data = generator.generate_standardized_prompt(extp)
+
+        included = len(context_data["code_files"])
+        assert 0 < included < 60
+        assert len(reads) <= included + 1 + 2 * generator.read_workers, len(reads)
+        print("✅ Standardized prompt stops reading at the context limit")
+
+
+def _python_source():
+    parts = ["import os\nfrom typing import Dict\n\nLIMITS = {\n" + "".join(f"    'k{i}': {i},\n" for i in range(20)) + "}\n\n"]
+    for i in range(6):
+        parts.append(f"@staticmethod\ndef helper_{i}(value):\n" + f"    value += {i}\n" * 12 + "    return value\n\n")
+    parts.append('class Menu:\n    """Main menu"""\n\n')
+    for i in range(8):
+        parts.append(f"    @property\n    def option_{i}(self):\n" + f"        total = {i}\n" * 10 + "        return total\n\n")
+    return "".join(parts)
+
+
+def _chunk_body(chunk, name):
+    """Strip the continuation header from a chunk"""
+    lines = chunk.split("\n")
+    if lines[0].startswith(f"# {name} lines "):
+        lines = lines[1:]
+        if lines[0].startswith("# imports: "):
+            lines = lines[1:]
+        if lines[0].endswith("  # continued"):
+            lines = lines[1:]
+    return "\n".join(lines)
+
+
+def test_python_chunks_split_at_statement_boundaries():
+    """Chunks fit the size limit, start at a statement, keep decorators attached and rejoin to the file"""
+    with tempfile.TemporaryDirectory() as extp:
+        source = _python_source()
+        filepath = os.path.join(extp, "menus.py")
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(source)
+
+        chunks = ExtPRequirementsGenerator()._chunk_python_file(filepath, max_chunk_size=1024)
+        bodies = [_chunk_body(chunk, "menus.py") for chunk in chunks]
+
+        assert len(chunks) > 3
+        assert "".join(bodies) == source
+        assert all(len(chunk.encode("utf-8")) <= 1024 for chunk in chunks)
+        for chunk, body in zip(chunks[1:], bodies[1:]):
+            assert chunk.startswith("# menus.py lines ")
+            assert "# imports: import os; from typing import Dict" in chunk
+            first = body.lstrip("\n").split("\n")[0]
+            assert first.startswith(("@", "def ", "class ", "    @")), first
+            if first.startswith("    "):
+                assert "class Menu:  # continued" in chunk
+        assert not any(body.rstrip().split("\n")[-1].lstrip().startswith("@") for body in bodies)
+        print("✅ Python chunks split at statement boundaries")
+
+
+def test_untokenizable_python_falls_back_to_line_chunks():
+    """A file that does not tokenize is still chunked, by lines"""
+    with tempfile.TemporaryDirectory() as extp:
+        source = "def broken(:\n    x = '''\n" + "    padding line\n" * 100
+        filepath = os.path.join(extp, "broken.py")
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(source)
+
+        chunks = ExtPRequirementsGenerator()._chunk_python_file(filepath, max_chunk_size=512)
+        assert len(chunks) > 1
+        assert "".join(chunks) == source
+        assert all(len(chunk.encode("utf-8")) <= 512 for chunk in chunks)
+        print("✅ Untokenizable Python falls back to line chunks")
+
+
+def _write_extp(extp, files):
+    for name, text in files.items():
+        with open(os.path.join(extp, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _run(generator, extp, output_dir):
+    """Generate prompts; returns (prompt_manifest.json, files built rather than served from the cache)"""
+    built = []
+    read_file_safely, chunk_markdown = generator.read_file_safely, generator._chunk_markdown_file
+    generator.read_file_safely = lambda filepath: built.append(filepath) or read_file_safely(filepath)
+    generator._chunk_markdown_file = lambda filepath, **kwargs: built.append(filepath) or chunk_markdown(filepath, **kwargs)
+    prompt_files = generator.generate_multi_part_prompts(extp, output_dir=output_dir)
+    generator.read_file_safely, generator._chunk_markdown_file = read_file_safely, chunk_markdown
+    with open(os.path.join(os.path.dirname(prompt_files[0]), "prompt_manifest.json"), encoding="utf-8") as f:
+        return json.load(f), sorted(os.path.basename(path) for path in built)
+
+
+def test_cache_reuses_unchanged_files_and_reports_changed_parts():
+    """A rerun reads nothing unchanged, and only the part holding an edited file is reported changed"""
+    with tempfile.TemporaryDirectory() as extp, tempfile.TemporaryDirectory() as output_dir:
+        _write_extp(extp, {"README.md": "# App\n\n## Menu\nThe app shows a menu.\n"})
+        _write_extp(extp, {f"module_{i}.py": f"def step_{i}():\n    return {i}\n" + "# note\n" * 150
+                           for i in range(6)})
+        generator = ExtPRequirementsGenerator()
+        generator.max_prompt_tokens = 1300
+
+        first, built = _run(generator, extp, output_dir)
+        assert len(built) == 7
+        assert len(first["parts"]) > 2
+        assert {part["status"] for part in first["parts"]} == {"new"}
+
+        second, built = _run(generator, extp, output_dir)
+        assert built == []
+        assert second["changed_parts"] == []
+        assert [part["previous_part"] for part in second["parts"]] == [part["part"] for part in first["parts"]]
+
+        _write_extp(extp, {"module_3.py": "def step_3():\n    return 'changed'\n" + "# note\n" * 150})
+        third, built = _run(generator, extp, output_dir)
+        edited = [part for part in third["parts"] if "module_3.py" in part["keys"]]
+        assert built == ["module_3.py"]
+        assert third["changed_parts"] == [edited[0]["file"]]
+        assert edited[0]["changed_entries"] == ["module_3.py"]
+        assert third["removed_entries"] == []
+        print("✅ Cache reuses unchanged files and reports changed parts")
+
+
+if __name__ == "__main__":
+    print("Testing ExtPRequirementsGenerator...")
+    test_parts_keep_entry_order()
+    test_parts_stay_within_budget()
+    test_oversized_entry_gets_own_part()
+    test_previous_boundaries_are_kept_after_an_edit()
+    test_standardized_prompt_stops_reading_at_context_limit()
+    test_python_chunks_split_at_statement_boundaries()
+    test_untokenizable_python_falls_back_to_line_chunks()
+    test_cache_reuses_unchanged_files_and_reports_changed_parts()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Checks for the streaming false negative rule engine
+"""
+
+import json
+import os
+import tempfile
+
+from FalseNegativeRules import FalseNegativeRuleEngine, get_rule_engine
+
+RULES = {
+    "version": 1,
+    "rules": [
+        {"id": "OUT-1", "scope": "output", "pattern": "already configured"},
+        {"id": "OUT-2", "scope": "output", "pattern": "Menu option.*selected.*no.*change"},
+        {"id": "LOG-1", "scope": "log", "pattern": "bypass.*configuration"},
+        {"id": "BAD", "scope": "output", "pattern": "unbalanced("}
+    ]
+}
+
+OUTPUT = ("Welcome\n"
+          "Trading system is ALREADY CONFIGURED.\n"
+          "Menu option 4 selected - no screen change\n"
+          "Menu option 5 selected\n"
+          "no change\n"
+          "already configured")
+
+
+def _engine(root):
+    path = os.path.join(root, "rules.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(RULES, f)
+    return FalseNegativeRuleEngine(path)
+
+
+def _summary(matches):
+    return [(match.rule.id, match.line_number, OUTPUT[match.start:match.end]) for match in matches]
+
+
+def test_scan_matches_per_line_within_scope():
+    """Patterns match case-insensitively within one line, only for rules in the scope"""
+    with tempfile.TemporaryDirectory() as root:
+        engine = _engine(root)
+
+        assert [rule.id for rule in engine.rules] == ["OUT-1", "OUT-2", "LOG-1"], "invalid patterns are skipped"
+        assert _summary(engine.scan(OUTPUT, scope="output")) == [
+            ("OUT-1", 2, "ALREADY CONFIGURED"),
+            ("OUT-2", 3, "Menu option 4 selected - no screen change"),
+            ("OUT-1", 6, "already configured")
+        ]
+        assert engine.scan(OUTPUT, scope="log") == []
+        assert [match.rule.id for match in engine.scan("Steps to bypass the configuration", scope="log")] == ["LOG-1"]
+        print("✅ Scan matches per line within scope")
+
+
+def test_stream_matches_whole_text_scan():
+    """Feeding the text in arbitrary chunks gives the same matches and offsets as one scan"""
+    with tempfile.TemporaryDirectory() as root:
+        engine = _engine(root)
+        expected = _summary(engine.scan(OUTPUT, scope="output"))
+
+        for chunk_size in (1, 3, 7, 64):
+            stream = engine.stream("output")
+            matches = []
+            for start in range(0, len(OUTPUT), chunk_size):
+                matches += stream.feed(OUTPUT[start:start + chunk_size])
+            matches += stream.close()
+            assert _summary(matches) == expected, chunk_size
+        print("✅ Stream matches whole-text scan")
+
+
+def test_shared_engine_per_rule_file():
+    """get_rule_engine compiles each rule file once per process"""
+    with tempfile.TemporaryDirectory() as root:
+        path = _engine(root).rules_path
+        assert get_rule_engine(path) is get_rule_engine(os.path.join(root, ".", "rules.json"))
+        assert get_rule_engine(path) is not get_rule_engine()
+        print("✅ One shared engine per rule file")
+
+
+if __name__ == "__main__":
+    print("Testing FalseNegativeRules...")
+    test_scan_matches_per_line_within_scope()
+    test_stream_matches_whole_text_scan()
+    test_shared_engine_per_rule_file()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Checks for test impact selection over a scratch ExtP tree
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+from EnhancedTestCaseGenerator import EnhancedTestCaseGenerator, TestCase as CaseDefinition
+from ExtP_Indexer import ExtPIndexer
+from TestImpactAnalyzer import TestImpactAnalyzer as ImpactAnalyzer
+
+EXTP_FILES = {
+    'broker.py': 'def connect_broker(port):\n    """Implements REQ-101"""\n    return port\n',
+    'wizard.py': 'from broker import connect_broker\n\n\n'
+                 'def setup_wizard():\n    """Implements REQ-102"""\n    return connect_broker(7497)\n',
+    'reports.py': 'def export_report():\n    """Implements REQ-103"""\n    return "csv"\n',
+}
+
+REQUIREMENTS = [
+    {"id": "REQ-101", "description": "Broker connection on a configured port", "priority": "high", "category": "functional"},
+    {"id": "REQ-102", "description": "Setup wizard walks through configuration", "priority": "high", "category": "functional"},
+    {"id": "REQ-103", "description": "Report export as csv", "priority": "low", "category": "functional"},
+    {"id": "REQ-104", "description": "Status bar text", "priority": "low", "category": "ui",
+     "dependencies": ["REQ-101"]},
+]
+
+
+def _case(test_id, requirement_ids, *preconditions):
+    return CaseDefinition(id=test_id, title=test_id, description="", requirement_ids=list(requirement_ids),
+                          anchor_types=[], preconditions=list(preconditions), test_steps=[], expected_results=[])
+
+
+CASES = [
+    _case("TC-REQ-broker", ["REQ-101"], "TC-REQ-login passed"),
+    _case("TC-REQ-login", ["REQ-999"]),
+    _case("TC-REQ-wizard", ["REQ-102"]),
+    _case("TC-REQ-report", ["REQ-103"]),
+    _case("TC-REQ-status", ["REQ-104"]),
+    _case("TC-REQ-untraced", []),
+]
+
+
+def _setup(root):
+    """Index a scratch ExtP tree and load the scratch suite; returns (analyzer, ExtP path)"""
+    extp = os.path.join(root, 'extp')
+    for name, text in EXTP_FILES.items():
+        Path(extp, name).parent.mkdir(parents=True, exist_ok=True)
+        Path(extp, name).write_text(text, encoding='utf-8')
+    requirements_file = os.path.join(root, 'requirements.json')
+    with open(requirements_file, 'w', encoding='utf-8') as f:
+        json.dump({"requirements": REQUIREMENTS}, f)
+
+    indexer = ExtPIndexer(extp, os.path.join(root, 'index.db'))
+    indexer.build_full_index(max_workers=1)
+    generator = EnhancedTestCaseGenerator(requirements_file=requirements_file,
+                                          output_dir=os.path.join(root, 'TestCases'))
+    generator.test_cases = {case.id: case for case in CASES}
+    return ImpactAnalyzer(generator, indexer), extp
+
+
+def test_change_selects_dependent_tests_and_prerequisites():
+    """A change reaches tests through callers, requirement dependencies and preconditions"""
+    with tempfile.TemporaryDirectory() as root:
+        analyzer, extp = _setup(root)
+        try:
+            Path(extp, 'broker.py').write_text(
+                'def connect_broker(port, timeout=5):\n    """Implements REQ-101"""\n    return port\n',
+                encoding='utf-8')
+            selection = analyzer.select_for_files(['broker.py'])
+
+            assert not selection.full_run
+            assert set(selection.requirements) == {"REQ-101", "REQ-102", "REQ-104"}
+            assert selection.requirements["REQ-104"] == ["depends on REQ-101"]
+            assert selection.test_ids == ["TC-REQ-broker", "TC-REQ-login", "TC-REQ-wizard",
+                                          "TC-REQ-status", "TC-REQ-untraced"]
+        finally:
+            analyzer.indexer.db_connection.close()
+        print("✅ Changes select dependent tests and prerequisites")
+
+
+def test_untraceable_changes_fall_back_to_full_run():
+    """Files the index does not cover cannot be ruled out, so every test runs"""
+    with tempfile.TemporaryDirectory() as root:
+        analyzer, extp = _setup(root)
+        try:
+            Path(extp, 'settings.ini').write_text('[broker]\nport = 7497\n', encoding='utf-8')
+            selection = analyzer.select_for_files(['settings.ini', 'reports.py'])
+            assert selection.full_run
+            assert selection.unmapped_changes == ['settings.ini']
+            assert selection.test_ids == [case.id for case in CASES]
+
+            analyzer.conservative = False
+            selection = analyzer.select_for_files(['settings.ini', 'reports.py'])
+            assert not selection.full_run
+            assert selection.test_ids == ["TC-REQ-report", "TC-REQ-untraced"]
+        finally:
+            analyzer.indexer.db_connection.close()
+        print("✅ Untraceable changes fall back to a full run")
+
+
+def test_git_diff_selection_and_suite_changes():
+    """git changes are selected by impact until a suite definition file changes"""
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    with tempfile.TemporaryDirectory() as root:
+        analyzer, extp = _setup(root)
+        try:
+            subprocess.run(git + ['init', '-q', extp], check=True)
+            subprocess.run(git + ['-C', extp, 'add', '.'], check=True)
+            subprocess.run(git + ['-C', extp, 'commit', '-q', '-m', 'base'], check=True)
+
+            selection = analyzer.select_for_git_diff()
+            assert selection.full_run and "suite definition changed" in selection.reasons[0]
+
+            analyzer.record_suite_state()
+            Path(extp, 'reports.py').write_text(
+                'def export_report():\n    """Implements REQ-103"""\n    return "xlsx"\n', encoding='utf-8')
+            selection = analyzer.select_for_git_diff()
+            assert not selection.full_run
+            assert selection.changed_files == ['reports.py']
+            assert selection.test_ids == ["TC-REQ-report", "TC-REQ-untraced"]
+
+            with open(analyzer.generator.requirements_file, 'a', encoding='utf-8') as f:
+                f.write('\n')
+            selection = analyzer.select_for_git_diff()
+            assert selection.full_run and analyzer.generator.requirements_file in selection.reasons[0]
+
+            assert analyzer.select_for_git_diff(base='no-such-revision').full_run
+        finally:
+            analyzer.indexer.db_connection.close()
+        print("✅ git diff selection and suite changes")
+
+
+if __name__ == "__main__":
+    print("Testing TestImpactAnalyzer...")
+    test_change_selects_dependent_tests_and_prerequisites()
+    test_untraceable_changes_fall_back_to_full_run()
+    test_git_diff_selection_and_suite_changes()
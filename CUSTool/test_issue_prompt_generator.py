@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Checks for IssuePromptGenerator defect evidence and reporting
+"""
+
+import os
+import tempfile
+import threading
+
+from PIL import Image, ImageDraw
+
+from IssuePromptGenerator import (BackgroundRenderQueue, IssuePromptGenerator, RollingFrameBuffer,
+                                  TestCaseContext as CaseContext)
+
+
+def _generator(root, **overrides):
+    """Generator writing its DefectPrompts under root"""
+    config = IssuePromptGenerator._load_default_config(None)
+    config["external_program_path"] = root
+    screenshot_settings = overrides.pop("screenshot_settings", {})
+    config["screenshot_settings"].update(screenshot_settings)
+    config.update(overrides)
+    return IssuePromptGenerator(config)
+
+
+def test_saved_frame_is_cropped_compressed_and_content_addressed():
+    """A frame CUS saved to disk goes through the evidence pipeline like an in-memory frame"""
+    with tempfile.TemporaryDirectory() as root:
+        generator = _generator(root, screenshot_settings={"crop_region": [100, 50, 500, 350],
+                                                          "max_width": 200})
+        frame_path = os.path.join(root, "screenshot_full.png")
+        Image.new("RGB", (1280, 720), "white").save(frame_path)
+
+        first = generator.screenshot_from_frame("ISSUE-1", frame_path=frame_path)
+        second = generator.screenshot_from_frame("ISSUE-2", frame_path=frame_path)
+
+        assert first.file_path != frame_path
+        assert os.path.dirname(first.file_path) == os.path.join(generator.defect_prompts_path, "screenshots")
+        assert first.file_path == second.file_path, "identical frames must share one stored file"
+        with Image.open(first.file_path) as stored:
+            assert stored.size == (200, 150)  # cropped to 400x300, then downscaled
+            assert stored.mode == "P"  # palette-reduced PNG
+        print("✅ Saved frames are cropped, compressed and content-addressed")
+
+
+def test_region_frame_is_not_cropped_again():
+    """A frame captured with SCREEN_REGION is already the console region"""
+    with tempfile.TemporaryDirectory() as root:
+        generator = _generator(root, screenshot_settings={"crop_region": [100, 50, 500, 350]})
+        frame_path = os.path.join(root, "screenshot_region.png")
+        Image.new("RGB", (400, 300), "black").save(frame_path)
+
+        info = generator.screenshot_from_frame("ISSUE-1", frame_path=frame_path)
+        with Image.open(info.file_path) as stored:
+            assert stored.size == (400, 300)
+        print("✅ Region frames are not cropped again")
+
+
+def _context(actual_behavior, sequence_id):
+    return CaseContext(
+        test_case_name="Action Effectiveness Failure",
+        test_sequence_id=sequence_id,
+        expected_behavior="Action '4' should change screen content after trigger 'Select option'",
+        actual_behavior=actual_behavior,
+        failure_step=1,
+        reproduction_steps=[],
+        documentation_refs=[],
+        related_test_cases=[],
+        dependency_chain=[]
+    )
+
+
+def test_noisy_ocr_captures_share_one_fingerprint():
+    """Repeats of one defect with different timestamps, counters and OCR misreads collapse into one issue"""
+    with tempfile.TemporaryDirectory() as root:
+        generator = _generator(root)
+        frame = Image.new("RGB", (320, 200), "white")
+        captures = [
+            ("Transitioned to 'Balance: $1,234.56 12:03:44' instead.", 3,
+             "DeFi Huddle  12:03:44\nBalance: $1,234.56  Orders: 7\n1. Trade\n4. History\nSelect option:"),
+            ("Transitioned to 'Ba1ance: $1,240.02 12:07:19' instead.", 5,
+             "DeFi Huddle | 12:07:19\nBa1ance: $1,240.02 Orders: 9\n1. Trade\n4. Hist0ry\nSe1ect option :"),
+        ]
+        issues = []
+        for number, (actual, repeats, screen) in enumerate(captures):
+            issues.append(generator.generate_issue_prompt(
+                test_case_context=_context(actual, f"run-{number}"),
+                error_context={
+                    "error_type": "cus_simulation",
+                    "error_message": f"Action '4' repeated {repeats} times without expected result",
+                    "action": "4",
+                    "screen_content": screen
+                },
+                frame=frame
+            ))
+
+        assert issues[0].fingerprint == issues[1].fingerprint
+        assert issues[0].issue_id == issues[1].issue_id
+        assert issues[1].occurrence_count == 2
+
+        other = generator.generate_issue_prompt(
+            test_case_context=_context(captures[0][0], "run-2"),
+            error_context={"error_type": "cus_simulation", "error_message": "Action '1' repeated 3 times",
+                           "action": "1", "screen_content": captures[0][2]},
+            frame=frame
+        )
+        assert other.fingerprint != issues[0].fingerprint
+        print("✅ Noisy OCR captures share one fingerprint")
+
+
+def test_frame_buffer_round_trips_deltas():
+    """Frames decode exactly after delta encoding and after eviction rebases the oldest into a keyframe"""
+    frames = []
+    image = Image.new("RGB", (640, 360), "black")
+    for i in range(10):
+        image = image.copy()
+        if i != 4:  # frame 4 repeats frame 3 unchanged
+            ImageDraw.Draw(image).rectangle([20 * i, 10 * i, 20 * i + 30, 10 * i + 12], fill=(255, 25 * i, 0))
+        frames.append(image)
+
+    buffer = RollingFrameBuffer(max_frames=4)
+    for i, frame in enumerate(frames):
+        buffer.add(frame, ocr_text=f"screen {i}")
+        decoded = buffer.recent()
+        assert len(decoded) == min(i + 1, 4)
+        for (stored, restored), original in zip(decoded, frames[max(0, i - 3):i + 1]):
+            assert restored.tobytes() == original.tobytes()
+        assert decoded[0][0].is_keyframe
+        assert not any(stored.is_keyframe for stored, _ in decoded[1:])
+
+    assert [stored.ocr_text for stored, _ in buffer.recent(2)] == ["screen 8", "screen 9"]
+    keyframe_size = len(buffer.recent()[0][0].data)
+    assert buffer.memory_usage() < 2 * keyframe_size
+    print("✅ Frame buffer round-trips deltas")
+
+
+def test_frame_buffer_starts_keyframe_on_size_change():
+    """A frame of another size or mode cannot be a delta, so it is stored whole"""
+    buffer = RollingFrameBuffer(max_frames=4)
+    buffer.add(Image.new("RGB", (100, 50), "white"))
+    buffer.add(Image.new("RGB", (100, 50), "white"))
+    buffer.add(Image.new("RGBA", (120, 60), "blue"))
+    decoded = buffer.recent()
+
+    assert [stored.is_keyframe for stored, _ in decoded] == [True, False, True]
+    assert decoded[1][0].data == b"" and decoded[1][0].bbox is None
+    assert decoded[2][1].mode == "RGB" and decoded[2][1].size == (120, 60)
+    print("✅ Frame buffer starts a keyframe on size change")
+
+
+def test_full_render_queue_renders_inline():
+    """A full queue blocks briefly, then renders on the caller so nothing is dropped"""
+    render_queue = BackgroundRenderQueue(workers=1, max_queue=1, enqueue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+    rendered = []
+
+    def slow_render(name):
+        started.set()
+        release.wait(10)
+        rendered.append((name, threading.current_thread().name))
+
+    render_queue.submit(slow_render, "busy")
+    assert started.wait(10)
+    render_queue.submit(rendered.append, ("queued", None))
+    render_queue.submit(lambda name: rendered.append((name, threading.current_thread().name)), "overflow")
+
+    stats = render_queue.stats()
+    assert stats["blocked_submits"] == 1 and stats["inline_renders"] == 1
+    assert stats["max_depth"] == 1
+    assert rendered == [("overflow", threading.current_thread().name)]
+
+    release.set()
+    render_queue.close()
+    stats = render_queue.stats()
+    assert {name for name, _ in rendered} == {"busy", "queued", "overflow"}
+    assert stats["submitted"] == stats["completed"] == 3 and stats["depth"] == 0
+    assert not any(worker.is_alive() for worker in render_queue._workers)
+
+    render_queue.submit(rendered.append, ("after_close", None))
+    assert rendered[-1] == ("after_close", None)
+    print("✅ Full render queue renders inline")
+
+
+def test_close_writes_queued_reports():
+    """close() returns only after every background render is on disk"""
+    with tempfile.TemporaryDirectory() as root:
+        generator = _generator(root, background_rendering=True, render_workers=1)
+        issue = generator.generate_issue_prompt(
+            test_case_context=_context("Nothing happened", "run-0"),
+            error_context={"error_type": "cus_simulation", "error_message": "Action '4' had no effect",
+                           "action": "4", "screen_content": "Select option:"},
+            frame=Image.new("RGB", (320, 200), "white")
+        )
+        markdown_path = generator.save_issue_prompt(issue)
+
+        stats = generator.close()
+        assert os.path.exists(markdown_path)
+        assert os.path.exists(os.path.join(generator.defect_prompts_path, "metadata",
+                                           f"{issue.issue_id}_metadata.json"))
+        assert stats["failed"] == 0 and stats["depth"] == 0
+        print("✅ close() writes queued reports")
+
+
+if __name__ == "__main__":
+    print("Testing IssuePromptGenerator...")
+    test_saved_frame_is_cropped_compressed_and_content_addressed()
+    test_region_frame_is_not_cropped_again()
+    test_noisy_ocr_captures_share_one_fingerprint()
+    test_frame_buffer_round_trips_deltas()
+    test_frame_buffer_starts_keyframe_on_size_change()
+    test_full_render_queue_renders_inline()
+    test_close_writes_queued_reports()
@@ -4,6 +4,7 @@ Test standardized prompt generation for GitHub Copilot requirements analysis
 """
 import json
 import os
+import tempfile
 from datetime import datetime
 
 def generate_standardized_prompt(extp_path, requirements_sources=None):
@@ -178,8 +179,8 @@ def test_prompt_generation():
     print(f"✓ Structured format: JSON-based")
     print(f"✓ Reproducible: Yes (same inputs = same output)")
     
-    # Save sample prompt for inspection
-    sample_file = "sample_standardized_prompt.txt"
+    # Save sample prompt for inspection, outside the source tree
+    sample_file = os.path.join(tempfile.mkdtemp(prefix="standardized_prompt_"), "sample_standardized_prompt.txt")
     with open(sample_file, 'w', encoding='utf-8') as f:
         f.write(prompt)
     